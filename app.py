@@ -1,697 +1,754 @@
 import streamlit as st
-import requests
-import json
-import base64
 import datetime
-import pandas as pd
-import numpy as np
-from fpdf import FPDF
-import io
+import os
 import time
+import uuid
+import pandas as pd
+from eduscan.analytics import AnalyticsStore
+from eduscan.cache import EvaluationCache
+from eduscan.config import METRICS_FILE, METRICS_LOG, SMALL_BATCH, WEBHOOK_CONCURRENCY, WEBHOOK_URL
+from eduscan.export import ResultExporter
+from eduscan.ingest import UPLOAD_EXTENSIONS, ExamIngestor
+from eduscan.items import ItemAnalysis
+from eduscan.jobs import JobJournal
+from eduscan.metrics import NULL_TIMER, MetricsRegistry, configure_logging, timing_rows
+from eduscan.models import ResultSet
+from eduscan.preprocess import IMAGE_FORMATS, ImagePreprocessor
+from eduscan.report import PDFReportGenerator, ReportCache
+from eduscan.rescore import AnswerKeyRescorer, AnswerKeyStore
+from eduscan.scanner import BackgroundBatchRunner, BatchExamScanner
+from eduscan.scheduler import FairScheduler
+from eduscan.stats import BatchStatistics
+from eduscan.validate import ERROR, PreflightValidator
 
 # Configuración
 st.set_page_config(page_title="EduScan Pro", layout="wide")
 
-class BatchExamScanner:
-    def __init__(self):
-        self.n8n_webhook_url = "https://kitsu-test.app.n8n.cloud/webhook-test/upload-exam"
+def render_metrics(stats):
+    """Muestra las métricas principales del lote en tarjetas"""
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("📊 Promedio General", f"{stats.mean:.1f}%")
+    with col2:
+        st.metric("✅ Aprobados", stats.approved)
+    with col3:
+        st.metric("❌ Desaprobados", stats.failed)
+    with col4:
+        st.metric("🎯 Nota Máxima", f"{stats.format_score(stats.max)}%")
     
-    def process_batch(self, files_data, batch_name, exam_type):
-        """Envía todo el lote en un solo request"""
-        try:
-            # Preparar datos del lote
-            batch_payload = {
-                "batch_name": batch_name,
-                "exam_type": exam_type,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "total_exams": len(files_data),
-                "exams": []
-            }
-            
-            # Convertir todas las imágenes a base64
-            for file_data in files_data:
-                image_bytes = file_data['file'].getvalue()
-                image_b64 = base64.b64encode(image_bytes).decode('utf-8')
-                
-                batch_payload["exams"].append({
-                    "student_id": file_data['student_id'],
-                    "filename": file_data['filename'],
-                    "image_data": f"data:image/png;base64,{image_b64}"
-                })
-            
-            headers = {'Content-Type': 'application/json'}
-            
-            # Un solo request con timeout largo
-            response = requests.post(
-                self.n8n_webhook_url, 
-                json=batch_payload, 
-                headers=headers,
-                timeout=300  # 5 minutos para procesar todo el lote
-            )
-            
-            if response.status_code == 200:
-                return {
-                    'success': True,
-                    'data': response.json(),
-                    'batch_size': len(files_data)
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f"Error HTTP {response.status_code}",
-                    'status_code': response.status_code
-                }
-                
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e)
-            }
+    st.caption(
+        f"Desviación estándar: {stats.std:.1f} · Nota mínima: {stats.format_score(stats.min)}% · "
+        f"P25: {stats.percentiles[25]:.1f}% · Mediana: {stats.percentiles[50]:.1f}% · "
+        f"P75: {stats.percentiles[75]:.1f}% · P90: {stats.percentiles[90]:.1f}%"
+    )
+    
+    # Mostrar información del estudiante con máxima nota
+    if stats.top_students:
+        st.info(f"🏆 **Mejor desempeño:** {stats.top_students[0]} con {stats.format_score(stats.max)}%")
 
-class PDFReportGenerator:
-    def __init__(self):
-        self.colors = {
-            'primary': (41, 128, 185),
-            'secondary': (52, 152, 219),
-            'success': (39, 174, 96),
-            'warning': (241, 196, 15),
-            'danger': (231, 76, 60),
-            'dark': (44, 62, 80),
-            'light': (236, 240, 241)
+def render_results_table(result_set):
+    """Tabla con el estado y la nota de cada examen"""
+    rows = [
+        {
+            'Estudiante': record.student_name,
+            'Archivo': record.filename,
+            'Nota': record.score,
+            'Estado': record.passing_status,
+            'Correctas': record.correct_answers,
+            'Detalle': ''
         }
+        for record in result_set
+    ]
+    rows.extend(
+        {
+            'Estudiante': failure['student_id'],
+            'Archivo': failure['filename'],
+            'Nota': None,
+            'Estado': 'ERROR',
+            'Correctas': None,
+            'Detalle': failure['error']
+        }
+        for failure in result_set.failures
+    )
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+@st.cache_resource
+def get_evaluation_cache():
+    """Caché de evaluaciones compartida por todas las sesiones del proceso"""
+    return EvaluationCache()
+
+@st.cache_resource
+def get_job_journal():
+    journal = JobJournal()
+    # Un trabajo 'running' de un proceso anterior ya no tiene runner: se puede reanudar
+    journal.release_interrupted()
+    return journal
+
+@st.cache_resource
+def get_analytics_store():
+    return AnalyticsStore()
+
+@st.cache_resource
+def get_answer_key_store():
+    return AnswerKeyStore()
+
+@st.cache_resource
+def get_report_cache():
+    return ReportCache(max_entries=16)
+
+@st.cache_resource
+def get_pdf_generator(compress):
+    return PDFReportGenerator(compress=compress)
+
+@st.cache_resource
+def get_scheduler():
+    """Cola compartida por todas las sesiones: limita y reparte los requests al webhook"""
+    return FairScheduler(max_concurrency=WEBHOOK_CONCURRENCY, small_batch=SMALL_BATCH)
+
+@st.cache_resource
+def get_metrics_registry():
+    """Métricas del proceso; las líneas de log de cada etapa van a METRICS_LOG"""
+    configure_logging(path=METRICS_LOG)
+    return MetricsRegistry()
+
+@st.cache_resource
+def get_scanner(chunk_size, max_concurrency, transport, response_mode, use_cache, webhook_url, instrumented):
+    return BatchExamScanner(
+        chunk_size=chunk_size,
+        max_concurrency=max_concurrency,
+        transport=transport,
+        cache=get_evaluation_cache() if use_cache else None,
+        response_mode=response_mode,
+        webhook_url=webhook_url,
+        metrics=get_metrics_registry() if instrumented else None
+    )
+
+def get_stage_timer(batch_name, exam_type):
+    """Cronómetro para las etapas del reporte (no-op si la instrumentación está desactivada)"""
+    if not st.session_state.get('instrumentation'):
+        return NULL_TIMER
+    return get_metrics_registry().timer(batch=batch_name, exam_type=exam_type)
+
+def set_last_results(result):
+    """Guarda el lote a mostrar junto con el hash de sus datos, calculado una sola vez al llegar"""
+    st.session_state.last_results = result
+    st.session_state.last_results_key = (
+        ReportCache.make_key(result['data']) if result is not None and 'data' in result else None
+    )
+
+def get_report_entry(results_data, batch_name, exam_type, pdf_generator, batch_id=None, results_key=None):
+    """Estadísticas (y PDF, una vez renderizado) del lote, reutilizados entre reruns
     
-    def draw_header(self, pdf, title):
-        """Dibuja el encabezado del reporte"""
-        pdf.set_fill_color(*self.colors['primary'])
-        pdf.rect(0, 0, 210, 30, 'F')
-        
-        pdf.set_text_color(255, 255, 255)
-        pdf.set_font("Arial", 'B', 20)
-        pdf.cell(0, 10, title, 0, 1, 'C')
-        pdf.ln(5)
-    
-    def draw_footer(self, pdf):
-        """Dibuja el pie de página"""
-        pdf.set_y(-15)
-        pdf.set_font("Arial", 'I', 8)
-        pdf.set_text_color(128, 128, 128)
-        pdf.cell(0, 10, f"Página {pdf.page_no()} - Generado con EduScan Pro", 0, 0, 'C')
-    
-    def create_metric_box(self, pdf, x, y, width, height, title, value, color):
-        """Crea una caja de métrica con estilo usando métodos estándar de FPDF"""
-        # Dibujar rectángulo de fondo
-        pdf.set_fill_color(*color)
-        pdf.rect(x, y, width, height, 'F')
-        
-        # Dibujar borde
-        pdf.set_draw_color(200, 200, 200)
-        pdf.rect(x, y, width, height)
-        
-        # Texto del título
-        pdf.set_text_color(255, 255, 255)
-        pdf.set_font("Arial", 'B', 10)
-        pdf.set_xy(x + 5, y + 3)
-        pdf.cell(width - 10, 5, title, 0, 1)
-        
-        # Valor
-        pdf.set_font("Arial", 'B', 14)
-        pdf.set_xy(x + 5, y + 9)
-        pdf.cell(width - 10, 8, str(value), 0, 1)
-    
-    def create_student_metric_box(self, pdf, x, y, width, height, title, student_name, score, color):
-        """Crea una caja de métrica especial para estudiantes"""
-        # Dibujar rectángulo de fondo
-        pdf.set_fill_color(*color)
-        pdf.rect(x, y, width, height, 'F')
-        
-        # Dibujar borde
-        pdf.set_draw_color(200, 200, 200)
-        pdf.rect(x, y, width, height)
-        
-        # Texto del título
-        pdf.set_text_color(255, 255, 255)
-        pdf.set_font("Arial", 'B', 10)
-        pdf.set_xy(x + 5, y + 3)
-        pdf.cell(width - 10, 5, title, 0, 1)
-        
-        # Puntaje
-        pdf.set_font("Arial", 'B', 12)
-        pdf.set_xy(x + 5, y + 9)
-        pdf.cell(width - 10, 6, f"{score}%", 0, 1)
+    results_key es el hash de results_data ya calculado (ver set_last_results); sin él, se
+    serializan los resultados completos en cada llamada. batch_id identifica un lote ya registrado cuyos resultados se sustituyen (re-calificación).
+    Si no, el lote se registra en el histórico con el job_id de su trabajo o, sin trabajo, con
+    el hash de sus resultados: ni las opciones del PDF ni batch_processing lo cambian.
+    """
+    report_cache = get_report_cache()
+    key = report_cache.make_key(results_key or results_data, batch_name, exam_type, pdf_generator.compress)
+    entry = report_cache.get(key)
+    if entry is None:
+        timer = get_stage_timer(batch_name, exam_type)
+        with timer.stage('stats'):
+            result_set = ResultSet.from_payload(results_data)
+            stats = BatchStatistics(result_set)
+        entry = {
+            'result_set': result_set,
+            'stats': stats,
+            'report_path': None,
+            'bundle_path': None,
+            'exports': {},
+            'batch_id': (batch_id or results_data.get('batch_processing', {}).get('job_id')
+                         or ReportCache.make_key(results_data.get('results', []))),
+            'timer': timer
+        }
+        report_cache.put(key, entry)
+        # Registrar el lote en el histórico (idempotente por trabajo)
+        if result_set.records:
+            get_analytics_store().record_batch(entry['batch_id'], result_set, batch_name, exam_type,
+                                               replace=batch_id is not None)
+    return entry
+
+def render_item_analysis(entry):
+    """Tabla de análisis de ítems (calculada una sola vez por lote)"""
+    if entry.get('items') is None:
+        with entry['timer'].stage('item_analysis'):
+            entry['items'] = ItemAnalysis(entry['result_set'])
+    items = entry['items']
+    if not items.n_questions:
+        return
+    
+    with st.expander("🧪 Análisis de Ítems", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("KR-20", items.format_coefficient(items.kr20))
+        with col2:
+            st.metric("Alfa de Cronbach", items.format_coefficient(items.cronbach_alpha))
+        with col3:
+            st.metric("Preguntas a revisar", int((items.discrimination < 0.2).sum()),
+                      help="Discriminación menor a 0.20")
+        st.dataframe(items.to_dataframe(), use_container_width=True, hide_index=True)
+
+def render_rescore(result, entry, batch_name, exam_type):
+    """Re-califica el lote mostrado con una clave de respuestas versionada, sin reenviar imágenes"""
+    key_store = get_answer_key_store()
+    versions = key_store.versions(exam_type)
+    rescore_info = result.get('rescore')
+    
+    with st.expander("🔁 Re-calificar con clave corregida", expanded=False):
+        if rescore_info:
+            st.caption(f"Lote re-calificado con la clave v{rescore_info['version']} de {exam_type}")
         
-        # Nombre del estudiante
-        pdf.set_font("Arial", '', 8)
-        pdf.set_xy(x + 5, y + 16)
-        # Acortar nombre si es muy largo
-        display_name = student_name[:20] + "..." if len(student_name) > 20 else student_name
-        pdf.cell(width - 10, 5, display_name, 0, 1)
-    
-    def generate_pdf_report(self, results_data, batch_name, exam_type):
-        """Genera un reporte PDF profesional con los resultados"""
-        pdf = FPDF()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.add_page()
+        # Partir de la última clave guardada o de la clave presente en los resultados
+        if entry.get('items') is None:
+            entry['items'] = ItemAnalysis(entry['result_set'])
+        items = entry['items']
+        answer_key = key_store.get(exam_type) or dict(zip(items.questions, items.answer_key))
+        edited = st.data_editor(
+            pd.DataFrame({'Pregunta': list(answer_key), 'Correcta': list(answer_key.values())}),
+            use_container_width=True, hide_index=True, num_rows="dynamic", key=f"answer_key_{entry['batch_id']}"
+        )
+        note = st.text_input("Nota de la versión", placeholder="Corrige la pregunta 7", key=f"answer_key_note_{entry['batch_id']}")
+        if st.button("💾 Guardar como nueva versión"):
+            answers = {
+                str(row.Pregunta): str(row.Correcta)
+                for row in edited.dropna().itertuples(index=False)
+                if str(row.Pregunta).strip()
+            }
+            version = key_store.save(exam_type, answers, note)
+            st.success(f"Clave v{version} guardada para {exam_type}")
+            versions = key_store.versions(exam_type)
         
-        # Encabezado
-        self.draw_header(pdf, "REPORTE DE EVALUACIÓN - EDUSCAN PRO")
+        if not versions:
+            st.info("Guarda una clave para poder re-calificar el lote.")
+            return
         
-        # Información del lote - CORREGIDO: Más espacio después del header
-        pdf.ln(15)  # Aumenté el espacio aquí
+        labels = {
+            version['version']: f"v{version['version']} · "
+                                f"{datetime.datetime.fromtimestamp(version['created_at']).strftime('%d/%m %H:%M')}"
+                                f"{' · ' + version['note'] if version['note'] else ''}"
+            for version in versions
+        }
+        col_version, col_passing = st.columns(2)
+        with col_version:
+            version = st.selectbox("Versión de la clave", list(labels), format_func=labels.get)
+        with col_passing:
+            passing_score = st.number_input("Nota mínima para aprobar (%)", min_value=0.0, max_value=100.0, value=60.0)
         
-        pdf.set_text_color(0, 0, 0)  # Texto negro
-        pdf.set_font("Arial", 'B', 14)
-        pdf.cell(0, 10, "INFORMACIÓN DEL LOTE", 0, 1)
+        if st.button("🔁 Re-calificar lote", type="primary", use_container_width=True):
+            rescored = AnswerKeyRescorer(passing_score).rescore(result['data'], key_store.get(exam_type, version))
+            set_last_results({
+                **result,
+                'data': rescored,
+                'rescore': {'version': version, 'batch_id': entry['batch_id']}
+            })
+            st.session_state.pdf_generated = True
+            st.rerun()
+
+def render_student_bundle(entry, batch_name, exam_type, pdf_generator):
+    """ZIP con un PDF por estudiante, generado a pedido y servido desde un archivo temporal"""
+    try:
+        if entry['bundle_path'] is None or not os.path.exists(entry['bundle_path']):
+            if not st.button("📦 Generar un PDF por estudiante (ZIP)", use_container_width=True):
+                return
+            with st.spinner(f"📦 Generando {len(entry['result_set'].records)} reportes individuales..."):
+                with entry['timer'].stage('student_bundle'):
+                    entry['bundle_path'] = pdf_generator.spool_student_bundle(entry['result_set'], batch_name, exam_type)
         
-        pdf.set_font("Arial", '', 10)
-        pdf.cell(0, 6, f"Nombre del lote: {batch_name}", 0, 1)
-        pdf.cell(0, 6, f"Tipo de examen: {exam_type}", 0, 1)
-        pdf.cell(0, 6, f"Fecha de generación: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}", 0, 1)
-        pdf.ln(10)
+        with open(entry['bundle_path'], 'rb') as bundle_file:
+            st.download_button(
+                label="⬇️ Descargar PDF por estudiante (ZIP)",
+                data=bundle_file,
+                file_name=f"reportes_eduscan_{batch_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
+    except Exception as e:
+        st.error(f"❌ Error al generar los PDF individuales: {str(e)}")
+
+EXPORT_FORMATS = [
+    ('xlsx', "⬇️ Excel (XLSX)", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    # CSV y Parquet: ZIP con detalle, resumen y ranking
+    ('csv', "⬇️ CSV (ZIP)", "application/zip"),
+    ('parquet', "⬇️ Parquet (ZIP)", "application/zip")
+]
+
+def render_exports(entry, batch_name, exam_type):
+    """Botones de descarga de Excel, CSV y Parquet (generados una sola vez por lote)"""
+    st.subheader("📊 Exportar Resultados")
+    exporter = ResultExporter(batch_name, exam_type)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M')
+    
+    for column, (export_format, label, mime) in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS):
+        with column:
+            try:
+                path = entry['exports'].get(export_format)
+                if path is None or not os.path.exists(path):
+                    with entry['timer'].stage(f"export_{export_format}"):
+                        path = exporter.export(export_format, entry['result_set'], entry['stats'])
+                    entry['exports'][export_format] = path
+                suffix = ".xlsx" if export_format == 'xlsx' else f"_{export_format}.zip"
+                with open(path, 'rb') as export_file:
+                    st.download_button(
+                        label=label,
+                        data=export_file,
+                        file_name=f"resultados_eduscan_{batch_name}_{timestamp}{suffix}",
+                        mime=mime,
+                        use_container_width=True
+                    )
+            except Exception as e:
+                st.error(f"❌ Error al exportar {export_format.upper()}: {str(e)}")
+
+def render_timings(result, entry):
+    """Desglose del tiempo por etapa del lote y del reporte; actualiza el archivo de métricas"""
+    if not st.session_state.get('instrumentation'):
+        return
+    rows = timing_rows(result.get('timings'), entry['timer'].summary())
+    if not rows:
+        return
+    
+    with st.expander("⏱️ Tiempos por etapa", expanded=False):
+        counts = (result.get('timings') or {}).get('counts', {})
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Exámenes", counts.get('exams', 0))
+        with col2:
+            st.metric("Con error", counts.get('exam_failures', 0))
+        with col3:
+            st.metric("Enviado", f"{counts.get('upload_bytes', 0) / 1024 / 1024:.1f} MB")
+        st.dataframe(
+            pd.DataFrame([
+                {'Etapa': label, 'Segundos': round(seconds, 3), 'Veces': count,
+                 'Media (ms)': round(seconds / count * 1000, 1) if count else 0.0}
+                for label, seconds, count in rows
+            ]),
+            use_container_width=True, hide_index=True
+        )
+        st.caption("Las etapas de bloques en paralelo se solapan: su suma puede superar el total del lote.")
+        try:
+            get_metrics_registry().write(METRICS_FILE)
+            st.caption(f"Métricas: {METRICS_FILE} · Log de etapas: {METRICS_LOG}")
+        except OSError as e:
+            st.warning(f"⚠️ No se pudo escribir el archivo de métricas: {e}")
+
+def render_results(result, batch_name, exam_type, pdf_generator):
+    """Muestra métricas, reporte PDF y opciones para un lote procesado"""
+    st.session_state.last_batch = {'batch_name': batch_name, 'exam_type': exam_type}
+    
+    if result['success']:
+        st.success(f"✅ Lote procesado exitosamente!")
+        if result.get('cache', {}).get('hits'):
+            st.info(f"🗄️ {result['cache']['hits']} exámenes recuperados de la caché, "
+                    f"{result['cache']['misses']} enviados a evaluar")
         
-        batch_processing = results_data.get('batch_processing', {})
-        results = results_data.get('results', [])
-        successful_results = [r for r in results if r.get('success')]
+        # Mostrar resumen visual
+        entry = get_report_entry(result['data'], batch_name, exam_type, pdf_generator,
+                                 batch_id=result.get('rescore', {}).get('batch_id'),
+                                 results_key=st.session_state.get('last_results_key')
+                                 if result is st.session_state.get('last_results') else None)
+        result_set = entry['result_set']
         
-        if successful_results:
-            # Calcular estadísticas
-            scores = []
-            approved = 0
-            failed = 0
-            student_scores = []
-            
-            for result in successful_results:
-                data = result.get('data', {})
-                evaluation = data.get('evaluation', {})
-                score_percentage = evaluation.get('score_percentage', 0)
-                scores.append(score_percentage)
-                
-                student_name = data.get('student_info', {}).get('student_name', result.get('student_id', 'Desconocido'))
-                student_scores.append({
-                    'name': student_name,
-                    'score': score_percentage,
-                    'status': evaluation.get('passing_status', 'REPROBADO')
-                })
-                
-                if evaluation.get('passing_status') == 'APROBADO':
-                    approved += 1
-                else:
-                    failed += 1
-            
-            # Estadísticas
-            avg_score = sum(scores) / len(scores) if scores else 0
-            max_score = max(scores) if scores else 0
-            min_score = min(scores) if scores else 0
-            
-            # Encontrar estudiantes con máxima y mínima nota
-            max_students = [s for s in student_scores if s['score'] == max_score]
-            min_students = [s for s in student_scores if s['score'] == min_score]
-            
-            # Métricas principales
-            pdf.set_font("Arial", 'B', 14)
-            pdf.cell(0, 10, "ESTADÍSTICAS GENERALES", 0, 1)
-            pdf.ln(5)
-            
-            # Crear cuadrícula de métricas mejorada
-            metrics_row1 = [
-                {"title": "PROMEDIO", "value": f"{avg_score:.1f}%", "color": self.colors['primary']},
-                {"title": "APROBADOS", "value": f"{approved}", "color": self.colors['success']},
-                {"title": "DESAPROBADOS", "value": f"{failed}", "color": self.colors['danger']}
-            ]
-            
-            # Dibujar primera fila de métricas
-            for i, metric in enumerate(metrics_row1):
-                x = 10 + i * 63
-                y = pdf.get_y()
-                self.create_metric_box(pdf, x, y, 60, 20, metric["title"], metric["value"], metric["color"])
-            
-            pdf.ln(25)
-            
-            # Segunda fila con información de estudiantes destacados
-            current_y = pdf.get_y()
-            
-            if max_students:
-                max_student = max_students[0]
-                x_max = 10
-                self.create_student_metric_box(
-                    pdf, x_max, current_y, 90, 25, 
-                    "MEJOR NOTA", 
-                    max_student['name'], 
-                    max_score, 
-                    self.colors['warning']
-                )
-            
-            if min_students:
-                min_student = min_students[0]
-                x_min = 110
-                self.create_student_metric_box(
-                    pdf, x_min, current_y, 90, 25, 
-                    "NOTA MÁS BAJA", 
-                    min_student['name'], 
-                    min_score, 
-                    self.colors['secondary']
-                )
-            
-            pdf.ln(35)
-            
-            # Distribución de notas - CORREGIDO: Texto negro en encabezados
-            pdf.set_text_color(0, 0, 0)  # ✅ TEXTO NEGRO
-            pdf.set_font("Arial", 'B', 14)
-            pdf.cell(0, 10, "DISTRIBUCIÓN DE NOTAS", 0, 1)
-            pdf.ln(5)
-            
-            # Crear tabla de distribución CORREGIDA
-            header_fill = self.colors['light']
-            pdf.set_fill_color(*header_fill)
-            pdf.set_font("Arial", 'B', 10)
-            pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para encabezados
-            
-            # Encabezado de tabla
-            pdf.cell(70, 8, "Rango de Notas", 1, 0, 'C', True)
-            pdf.cell(40, 8, "Cantidad", 1, 0, 'C', True)
-            pdf.cell(40, 8, "Porcentaje", 1, 1, 'C', True)
-            
-            ranges = [
-                ("90-100% (Excelente)", 90, 100),
-                ("80-89% (Muy Bueno)", 80, 89),
-                ("70-79% (Bueno)", 70, 79),
-                ("60-69% (Suficiente)", 60, 69),
-                ("0-59% (Insuficiente)", 0, 59)
-            ]
-            
-            pdf.set_font("Arial", '', 9)
-            pdf.set_fill_color(255, 255, 255)  # Fondo blanco para las filas
-            pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para datos
-            
-            for i, (range_name, min_val, max_val) in enumerate(ranges):
-                count = len([s for s in scores if min_val <= s <= max_val])
-                percentage = (count / len(scores)) * 100 if scores else 0
-                
-                # Alternar colores de fondo para mejor legibilidad
-                fill = i % 2 == 0
-                if fill:
-                    pdf.set_fill_color(245, 245, 245)  # Gris muy claro
-                else:
-                    pdf.set_fill_color(255, 255, 255)  # Blanco
-                
-                pdf.cell(70, 7, range_name, 1, 0, 'L', fill)
-                pdf.cell(40, 7, str(count), 1, 0, 'C', fill)
-                pdf.cell(40, 7, f"{percentage:.1f}%", 1, 1, 'C', fill)
-            
-            pdf.ln(10)
-            
-            # Ranking de estudiantes - CORREGIDO: Texto negro en encabezados
-            pdf.set_font("Arial", 'B', 14)
-            pdf.cell(0, 10, "RANKING DE ESTUDIANTES", 0, 1)
-            pdf.ln(5)
-            
-            # Ordenar estudiantes por puntaje
-            student_scores.sort(key=lambda x: x['score'], reverse=True)
-            
-            col_widths = [80, 30, 30, 30]
-            
-            # Encabezado de tabla - CORREGIDO: Texto negro
-            pdf.set_fill_color(*self.colors['light'])
-            pdf.set_font("Arial", 'B', 10)
-            pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para encabezados
-            
-            pdf.cell(col_widths[0], 8, "Estudiante", 1, 0, 'C', True)
-            pdf.cell(col_widths[1], 8, "Nota", 1, 0, 'C', True)
-            pdf.cell(col_widths[2], 8, "Estado", 1, 0, 'C', True)
-            pdf.cell(col_widths[3], 8, "Correctas", 1, 1, 'C', True)
-            
-            pdf.set_font("Arial", '', 9)
-            pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para datos de estudiantes
-            
-            for i, student in enumerate(student_scores):
-                # Buscar datos completos del estudiante
-                student_data = next((r for r in successful_results 
-                                  if r.get('data', {}).get('student_info', {}).get('student_name') == student['name']), None)
-                
-                correct_answers = "N/A"
-                if student_data:
-                    correct_answers = student_data.get('data', {}).get('evaluation', {}).get('correct_answers', 'N/A')
-                
-                # Color según estado - PERO texto negro para nombres y datos
-                if student['status'] == 'APROBADO':
-                    status_color = (39, 174, 96)  # Verde para estado
-                else:
-                    status_color = (231, 76, 60)  # Rojo para estado
-                
-                # Fondo alternado para mejor legibilidad
-                fill = i % 2 == 0
-                if fill:
-                    pdf.set_fill_color(245, 245, 245)  # Gris muy claro
-                else:
-                    pdf.set_fill_color(255, 255, 255)  # Blanco
-                
-                # Resaltar estudiantes con máxima y mínima nota
-                if student['score'] == max_score:
-                    pdf.set_fill_color(255, 255, 150)  # Amarillo claro para mejor nota
-                elif student['score'] == min_score:
-                    pdf.set_fill_color(255, 200, 200)  # Rojo claro para peor nota
-                
-                # Nombre del estudiante - TEXTO NEGRO
-                pdf.set_text_color(0, 0, 0)
-                pdf.cell(col_widths[0], 7, student['name'][:25], 1, 0, 'L', True)
+        if result_set.records:
+            render_metrics(entry['stats'])
+            render_results_table(result_set)
+            render_item_analysis(entry)
+            render_rescore(result, entry, batch_name, exam_type)
+            
+            # Generar PDF automáticamente (solo la primera vez para estos resultados)
+            st.subheader("📄 Reporte PDF Generado")
+
+            try:
+                if entry['report_path'] is None or not os.path.exists(entry['report_path']):
+                    with entry['timer'].stage('pdf_render'):
+                        pdf = pdf_generator.generate_pdf_report(result_set, batch_name, exam_type)
+                    # Escribir el PDF directamente a un archivo temporal
+                    with entry['timer'].stage('pdf_write'):
+                        entry['report_path'] = pdf_generator.spool_pdf(pdf)
+                    del pdf
                 
-                # Nota - TEXTO NEGRO
-                pdf.cell(col_widths[1], 7, f"{student['score']}%", 1, 0, 'C', True)
+                # Botón de descarga servido desde el archivo
+                with open(entry['report_path'], 'rb') as report_file:
+                    st.download_button(
+                        label="⬇️ Descargar Reporte PDF",
+                        data=report_file,
+                        file_name=f"reporte_eduscan_{batch_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
+                        mime="application/pdf",
+                        use_container_width=True
+                    )
                 
-                # Estado - Color según aprobado/reprobado
-                pdf.set_text_color(*status_color)
-                pdf.cell(col_widths[2], 7, student['status'], 1, 0, 'C', True)
+                st.session_state.pdf_generated = True
                 
-                # Correctas - TEXTO NEGRO
-                pdf.set_text_color(0, 0, 0)
-                pdf.cell(col_widths[3], 7, str(correct_answers), 1, 1, 'C', True)
-            
-            pdf.ln(15)
+            except Exception as e:
+                st.error(f"❌ Error al generar PDF: {str(e)}")
             
-            # Resultados detallados por estudiante - CORREGIDO: Texto negro
-            pdf.set_font("Arial", 'B', 14)
-            pdf.cell(0, 10, "RESULTADOS DETALLADOS POR ESTUDIANTE", 0, 1)
-            pdf.ln(5)
+            render_student_bundle(entry, batch_name, exam_type, pdf_generator)
+            render_exports(entry, batch_name, exam_type)
+            render_timings(result, entry)
             
-            for i, result in enumerate(successful_results):
-                if i > 0:
-                    pdf.add_page()
-                    self.draw_header(pdf, "REPORTE DE EVALUACIÓN - EDUSCAN PRO")
-                    pdf.ln(10)
-                
-                data = result.get('data', {})
-                student_info = data.get('student_info', {})
-                evaluation = data.get('evaluation', {})
-                detailed_results = data.get('detailed_results', [])
-                
-                student_name = student_info.get('student_name', result.get('student_id', 'Desconocido'))
-                student_score = evaluation.get('score_percentage', 0)
-                
-                # Información del estudiante - CORREGIDO: Texto negro
-                pdf.set_fill_color(*self.colors['light'])
-                pdf.set_font("Arial", 'B', 12)
-                pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO
-                pdf.cell(0, 8, f"ESTUDIANTE: {student_name}", 1, 1, 'L', True)
-                
-                pdf.set_font("Arial", '', 10)
-                pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO
-                pdf.cell(0, 6, f"Tipo de examen: {student_info.get('exam_type', 'N/A')}", 0, 1)
-                pdf.cell(0, 6, f"Total de preguntas: {student_info.get('total_questions', 0)}", 0, 1)
-                
-                # Resumen de evaluación - CORREGIDO: Texto negro en encabezados
-                col_width = 47.5
-                pdf.ln(5)
-                
-                # Encabezado de resumen - TEXTO NEGRO
-                pdf.set_fill_color(*self.colors['light'])
-                pdf.set_font("Arial", 'B', 10)
-                pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para encabezados
-                pdf.cell(col_width, 8, "Correctas:", 1, 0, 'C', True)
-                pdf.cell(col_width, 8, "Incorrectas:", 1, 0, 'C', True)
-                pdf.cell(col_width, 8, "Puntaje:", 1, 0, 'C', True)
-                pdf.cell(col_width, 8, "Estado:", 1, 1, 'C', True)
-                
-                # Datos del resumen - TEXTO NEGRO para valores
-                pdf.set_font("Arial", '', 10)
-                pdf.set_fill_color(255, 255, 255)  # Fondo blanco
-                
-                # Correctas - TEXTO NEGRO
-                pdf.set_text_color(0, 0, 0)
-                pdf.cell(col_width, 8, str(evaluation.get('correct_answers', 0)), 1, 0, 'C', True)
-                
-                # Incorrectas - TEXTO NEGRO
-                pdf.cell(col_width, 8, str(evaluation.get('incorrect_answers', 0)), 1, 0, 'C', True)
-                
-                # Puntaje - TEXTO NEGRO
-                pdf.cell(col_width, 8, f"{student_score}%", 1, 0, 'C', True)
-                
-                # Estado - Color según aprobado/reprobado
-                status_color = (39, 174, 96) if evaluation.get('passing_status') == 'APROBADO' else (231, 76, 60)
-                pdf.set_text_color(*status_color)
-                pdf.cell(col_width, 8, evaluation.get('passing_status', 'N/A'), 1, 1, 'C', True)
-                pdf.set_text_color(0, 0, 0)  # Reset a negro
-                
-                pdf.ln(8)
-                
-                # Resultados detallados
-                if detailed_results:
-                    pdf.set_font("Arial", 'B', 11)
-                    pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO
-                    pdf.cell(0, 8, "DETALLE DE RESPUESTAS:", 0, 1)
-                    pdf.ln(3)
-                    
-                    # Encabezado de tabla detallada - TEXTO NEGRO
-                    header_fill = self.colors['light']
-                    pdf.set_fill_color(*header_fill)
-                    pdf.set_font("Arial", 'B', 8)
-                    pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para encabezados
-                    
-                    pdf.cell(15, 8, "Preg.", 1, 0, 'C', True)
-                    pdf.cell(20, 8, "Selección", 1, 0, 'C', True)
-                    pdf.cell(20, 8, "Correcta", 1, 0, 'C', True)
-                    pdf.cell(15, 8, "Estado", 1, 0, 'C', True)
-                    pdf.cell(120, 8, "Explicación", 1, 1, 'C', True)
-                    
-                    pdf.set_font("Arial", '', 7)
-                    
-                    for j, detail in enumerate(detailed_results):
-                        is_correct = detail.get('is_correct', False)
-                        
-                        # Fondo alternado para mejor legibilidad
-                        fill = j % 2 == 0
-                        if fill:
-                            pdf.set_fill_color(245, 245, 245)  # Gris muy claro
-                        else:
-                            pdf.set_fill_color(255, 255, 255)  # Blanco
-                        
-                        # Pregunta - TEXTO NEGRO
-                        pdf.set_text_color(0, 0, 0)
-                        pdf.cell(15, 6, str(detail.get('question_number', '')), 1, 0, 'C', fill)
-                        # Selección - TEXTO NEGRO
-                        pdf.cell(20, 6, detail.get('selected_option', 'N/A'), 1, 0, 'C', fill)
-                        # Correcta - TEXTO NEGRO
-                        pdf.cell(20, 6, detail.get('correct_option', 'N/A'), 1, 0, 'C', fill)
-                        
-                        # Estado - Color según correcto/incorrecto
-                        if is_correct:
-                            pdf.set_text_color(39, 174, 96)
-                            status = "OK"
-                        else:
-                            pdf.set_text_color(231, 76, 60)
-                            status = "X"
-                        pdf.cell(15, 6, status, 1, 0, 'C', fill)
-                        
-                        # Explicación - TEXTO NEGRO
-                        pdf.set_text_color(0, 0, 0)
-                        explanation = detail.get('explanation', 'Sin explicación')
-                        safe_explanation = self.clean_text(explanation)
-                        display_explanation = safe_explanation[:75] + ("..." if len(safe_explanation) > 75 else "")
-                        pdf.cell(120, 6, display_explanation, 1, 1, 'L', fill)
-                    
-                    pdf.ln(10)
-        
-        # Pie de página en cada página
-        self.draw_footer(pdf)
-        
-        return pdf
+            # Botón para procesar nuevo lote
+            if st.button("🔄 Procesar Nuevo Lote", use_container_width=True):
+                set_last_results(None)
+                st.session_state.processing = False
+                st.session_state.pdf_generated = False
+                st.rerun()
+    else:
+        st.error(f"❌ Error al procesar lote: {result['error']}")
 
-    def clean_text(self, text):
-        """Limpia el texto de caracteres Unicode problemáticos"""
-        if not text:
-            return ""
-        
-        # Reemplazar caracteres Unicode problemáticos
-        replacements = {
-            '✓': '(OK)',
-            '✗': '(X)',
-            '✅': '(OK)',
-            '❌': '(X)',
-            '→': '->',
-            '←': '<-',
-            '—': '-',
-            '–': '-',
-            '“': '"',
-            '”': '"',
-            '‘': "'",
-            '’': "'",
-            '…': '...'
+def expand_uploads(uploaded_files):
+    """Exámenes de la selección, con los ZIP y PDF expandidos página a página en disco (una vez por selección)"""
+    selection = tuple((uploaded_file.name, uploaded_file.size) for uploaded_file in uploaded_files)
+    expansion = st.session_state.get('expansion')
+    if expansion is None or expansion['selection'] != selection:
+        if expansion is not None:
+            expansion['ingestor'].cleanup()
+        ingestor = ExamIngestor()
+        with st.spinner("📦 Preparando exámenes..."):
+            files_data = [
+                file_data
+                for uploaded_file in uploaded_files
+                for file_data in ingestor.iter_exams(uploaded_file, uploaded_file.name)
+            ]
+        expansion = {'selection': selection, 'files_data': files_data, 'ingestor': ingestor}
+        st.session_state.expansion = expansion
+    
+    if len(expansion['files_data']) != len(uploaded_files):
+        st.info(f"📦 {len(expansion['files_data'])} exámenes tras expandir los archivos ZIP y PDF")
+    for skipped in expansion['ingestor'].skipped:
+        st.warning(f"⚠️ Se omitió {skipped['filename']}: {skipped['error']}")
+    return expansion
+
+def render_preflight(uploaded_files, files_data):
+    """Revisión previa de los archivos elegidos (una vez por selección); devuelve los índices que no se enviarán"""
+    selection = tuple((uploaded_file.name, uploaded_file.size) for uploaded_file in uploaded_files)
+    preflight = st.session_state.get('preflight')
+    if preflight is None or preflight['selection'] != selection:
+        with st.spinner("🔎 Revisando archivos antes de enviarlos..."):
+            preflight = {'selection': selection, 'report': PreflightValidator().validate(files_data)}
+        st.session_state.preflight = preflight
+    report = preflight['report']
+    
+    if not report['issues']:
+        st.success(f"🔎 Revisión previa: los {len(files_data)} archivos están listos para enviar")
+        return set()
+    
+    flagged = sorted({issue['index'] for issue in report['issues']})
+    warned = len(set(flagged) - set(report['rejected']))
+    with st.expander(f"🔎 Revisión previa: {len(report['rejected'])} descartados · {warned} con advertencias",
+                     expanded=True):
+        st.dataframe(pd.DataFrame([
+            {
+                'Archivo': issue['filename'],
+                'Tipo': "❌ Error" if issue['severity'] == ERROR else "⚠️ Advertencia",
+                'Detalle': issue['message']
+            }
+            for issue in report['issues']
+        ]), use_container_width=True, hide_index=True)
+        labels = {f"{index + 1}. {files_data[index]['filename']}": index for index in flagged}
+        excluded = st.multiselect(
+            "No enviar", list(labels),
+            default=[label for label, index in labels.items() if index in report['rejected']],
+            help="Por defecto se descartan los errores; las advertencias se envían salvo que las agregues aquí"
+        )
+    return {labels[label] for label in excluded}
+
+def render_progress(runner, pdf_generator, poll_interval=1.0):
+    """Muestra el avance de un lote en segundo plano y los resultados parciales"""
+    snapshot = runner.snapshot()
+    
+    if snapshot['finished']:
+        st.session_state.batch_runner = None
+        st.session_state.processing = False
+        set_last_results(snapshot['result'])
+        render_results(snapshot['result'], runner.batch_name, runner.exam_type, pdf_generator)
+        return
+    
+    total = max(snapshot['total'], 1)
+    schedule = snapshot['schedule']
+    remaining = f" · ~{schedule['eta']:.0f} s restantes" if schedule and schedule['eta'] is not None else ""
+    if schedule and schedule['state'] == 'queued':
+        st.info(f"⏳ En cola: posición {schedule['position']} · {schedule['jobs']} lotes en el servidor{remaining}")
+    st.progress(
+        min(snapshot['completed'] / total, 1.0),
+        text=f"🔄 {snapshot['completed']}/{snapshot['total']} exámenes evaluados · {snapshot['elapsed']:.0f} s{remaining}"
+    )
+    
+    result_set = ResultSet.from_results(snapshot['results'])
+    if result_set.records:
+        render_metrics(BatchStatistics(result_set))
+    if snapshot['results']:
+        render_results_table(result_set)
+    
+    time.sleep(poll_interval)
+    st.rerun()
+
+def render_analytics_page(store):
+    """Consultas agregadas sobre todos los lotes registrados"""
+    st.subheader("📈 Analítica entre Lotes")
+    
+    exam_types = store.exam_types()
+    if not exam_types:
+        st.info("Aún no hay lotes registrados. Procesa un lote para empezar a acumular histórico.")
+        return
+    
+    selected_types = st.multiselect("Tipos de examen", exam_types, default=exam_types)
+    
+    st.markdown("#### Promedios por tipo de examen")
+    by_exam_type = store.averages_by_exam_type(selected_types)
+    st.dataframe(by_exam_type, use_container_width=True, hide_index=True)
+    
+    st.markdown("#### Evolución por lote")
+    batches = store.batch_averages(selected_types)
+    if not batches.empty:
+        batches['fecha'] = pd.to_datetime(batches['processed_at'], unit='s')
+        st.line_chart(batches.pivot_table(index='fecha', columns='exam_type', values='promedio'))
+        st.dataframe(
+            batches[['fecha', 'batch_name', 'exam_type', 'student_count', 'promedio', 'aprobados_pct']],
+            use_container_width=True, hide_index=True
+        )
+    
+    st.markdown("#### Seguimiento por estudiante")
+    students = store.students(selected_types)
+    if not students.empty:
+        labels = {
+            row.student_id: f"{row.student_name} ({row.student_id}) · {row.examenes} exámenes"
+            for row in students.itertuples()
         }
-        
-        cleaned_text = text
-        for char, replacement in replacements.items():
-            cleaned_text = cleaned_text.replace(char, replacement)
-        
-        return cleaned_text
+        student_id = st.selectbox("Estudiante", list(labels), format_func=labels.get)
+        history = store.student_history(student_id)
+        history['fecha'] = pd.to_datetime(history['processed_at'], unit='s')
+        st.line_chart(history.set_index('fecha')['score'])
+        st.dataframe(history.drop(columns=['processed_at']), use_container_width=True, hide_index=True)
+    
+    st.markdown("#### Aciertos por pregunta")
+    question_exam_type = st.selectbox("Tipo de examen", selected_types or exam_types, key="analytics_question_type")
+    questions = store.question_stats(question_exam_type)
+    if not questions.empty:
+        st.bar_chart(questions.set_index('question_number')['aciertos_pct'])
+        st.dataframe(questions, use_container_width=True, hide_index=True)
 
 def main():
     st.title("🎓 EduScan Pro - Evaluación por Lotes")
     
-    scanner = BatchExamScanner()
-    pdf_generator = PDFReportGenerator()
-    
     # Inicializar estado de sesión
     if 'processing' not in st.session_state:
         st.session_state.processing = False
     if 'last_results' not in st.session_state:
-        st.session_state.last_results = None
+        set_last_results(None)
     if 'pdf_generated' not in st.session_state:
         st.session_state.pdf_generated = False
+    if 'batch_runner' not in st.session_state:
+        st.session_state.batch_runner = None
+    if 'session_id' not in st.session_state:
+        # Clave de reparto en la cola compartida: los lotes de una sesión comparten su parte
+        st.session_state.session_id = uuid.uuid4().hex
     
     # Sidebar
+    with st.sidebar:
+        view = st.radio("Vista", ["📤 Evaluación", "📈 Analítica"], horizontal=True)
+    
+    if view == "📈 Analítica":
+        render_analytics_page(get_analytics_store())
+        return
+    
     with st.sidebar:
         st.header("Configuración del Lote")
         batch_name = st.text_input("Nombre del Lote", placeholder="Grupo A - Matemáticas")
         exam_type = st.selectbox("Tipo de Examen", ["Matemáticas", "Ciencias", "Historia", "Inglés"])
         
+        st.markdown("---")
+        st.markdown("**⚙️ Envío**")
+        webhook_url = st.text_input("URL del webhook", value=WEBHOOK_URL,
+                                    help="Se puede apuntar a un servidor de evaluación local para pruebas")
+        chunked_mode = st.checkbox("Enviar por bloques en paralelo", value=False,
+                                   help="Divide el lote en bloques y los envía de forma concurrente")
+        transport_label = st.selectbox("Formato de envío", ["JSON (base64)", "Multipart (streaming)"],
+                                       help="Multipart envía las imágenes sin codificar, leyendo cada archivo por bloques")
+        transport = 'multipart' if transport_label.startswith("Multipart") else 'json'
+        streaming_response = st.checkbox("Recibir resultados en streaming (NDJSON)", value=False,
+                                         help="El webhook devuelve una línea JSON por examen evaluado")
+        chunk_size = None
+        max_concurrency = 1
+        if chunked_mode:
+            chunk_size = st.number_input("Exámenes por bloque", min_value=1, max_value=100, value=10)
+            max_concurrency = st.number_input("Bloques simultáneos (máximo)", min_value=1, max_value=16, value=4,
+                                              help="La concurrencia se reduce sola si el webhook responde 429 o se vuelve lento")
+        
+        st.markdown("---")
+        st.markdown("**🖼️ Imágenes**")
+        validate_uploads = st.checkbox("Revisar archivos antes de enviar", value=True,
+                                       help="Descarta archivos ilegibles, páginas en blanco y duplicados, "
+                                            "y avisa de student_id repetidos")
+        optimize_images = st.checkbox("Optimizar imágenes antes de enviar", value=True,
+                                      help="Escala de grises, recorte de márgenes y reducción de tamaño")
+        preprocessor = None
+        if optimize_images:
+            max_dimension = st.number_input("Dimensión máxima (px)", min_value=400, max_value=6000, value=1600, step=100)
+            output_format = st.selectbox("Formato", list(IMAGE_FORMATS.keys()))
+            preprocessor = ImagePreprocessor(max_dimension=max_dimension, output_format=output_format)
+        
+        st.markdown("---")
+        st.markdown("**📄 Reporte**")
+        compress_pdf = st.checkbox("Comprimir páginas del PDF", value=True,
+                                   help="Reduce el tamaño del archivo a cambio de algo más de CPU")
+        pdf_generator = get_pdf_generator(compress_pdf)
+        st.checkbox("Medir tiempos por etapa", value=False, key="instrumentation",
+                    help="Muestra el desglose de tiempos y escribe métricas en formato Prometheus")
+        
+        st.markdown("---")
+        st.markdown("**🗄️ Caché de evaluaciones**")
+        evaluation_cache = get_evaluation_cache()
+        use_cache = st.checkbox("Reutilizar evaluaciones previas", value=True,
+                                help="Las imágenes ya evaluadas no se vuelven a enviar")
+        cache_stats = evaluation_cache.stats()
+        st.caption(f"Entradas: {cache_stats['entries']} · Aciertos: {cache_stats['hits']} · Fallos: {cache_stats['misses']}")
+        if st.button("Vaciar caché"):
+            evaluation_cache.clear()
+        
+        st.markdown("---")
+        st.markdown("**📚 Trabajos**")
+        journal = get_job_journal()
+        job_action = None
+        jobs = journal.list_jobs()
+        if not jobs:
+            st.caption("Aún no hay trabajos registrados")
+        status_labels = {'running': "🔄 En curso", 'completed': "✅ Completo", 'incomplete': "⚠️ Incompleto"}
+        for job in jobs:
+            created = datetime.datetime.fromtimestamp(job['created_at']).strftime('%d/%m %H:%M')
+            with st.expander(f"{job['batch_name']} · {created}"):
+                st.caption(f"{job['exam_type']} · {status_labels.get(job['status'], job['status'])} · "
+                           f"{job['done'] or 0}/{job['total_exams']} evaluados")
+                col_view, col_resume = st.columns(2)
+                with col_view:
+                    if st.button("Ver", key=f"view_{job['job_id']}"):
+                        job_action = ('view', job['job_id'])
+                with col_resume:
+                    if (job['status'] == 'incomplete' and not st.session_state.processing
+                            and st.button("Reanudar", key=f"resume_{job['job_id']}")):
+                        job_action = ('resume', job['job_id'])
+        
         st.markdown("---")
         st.markdown("**💡 Instrucciones:**")
         st.markdown("1. Sube todos los exámenes a la vez")
-        st.markdown("2. El sistema procesará todo el lote")
-        st.markdown("3. Los resultados llegarán juntos")
+        st.markdown("2. El sistema procesará todo el lote en segundo plano")
+        st.markdown("3. Los resultados aparecerán a medida que se evalúan")
+    
+    scanner = get_scanner(chunk_size, max_concurrency, transport,
+                          'ndjson' if streaming_response else 'json', use_cache, webhook_url,
+                          st.session_state.instrumentation)
+    
+    # Trabajo seleccionado desde la barra lateral
+    if job_action is not None:
+        action, job_id = job_action
+        job = journal.get_job(job_id)
+        pending = journal.reopen(job_id) if action == 'resume' else []
+        if pending is None:
+            st.warning("⚠️ Este trabajo ya se está procesando en otra sesión")
+        elif pending:
+            # Reanudar en segundo plano, igual que un lote nuevo; al terminar se muestra el trabajo completo
+            def finish_resume(result):
+                journal.finish_job(job_id)
+                return journal.job_results(job_id)
+            st.session_state.processing = True
+            st.session_state.preprocess_report = None
+            st.session_state.batch_runner = BackgroundBatchRunner(
+                scanner, pending, job['batch_name'], job['exam_type'],
+                on_result=lambda result_item: journal.record_result(job_id, result_item),
+                on_finish=finish_resume,
+                scheduler=get_scheduler(),
+                flow=st.session_state.session_id
+            ).start()
+            st.rerun()
+        st.subheader(f"📚 Trabajo: {job['batch_name']}")
+        result = journal.job_results(job_id)
+        set_last_results(result)
+        render_results(result, job['batch_name'], job['exam_type'], pdf_generator)
+        return
     
     # Área principal
     st.subheader("📤 Subida de Exámenes")
     
     uploaded_files = st.file_uploader(
         "Selecciona todos los exámenes del lote",
-        type=['png', 'jpg', 'jpeg'],
+        type=[extension.lstrip('.') for extension in UPLOAD_EXTENSIONS],
         accept_multiple_files=True,
-        help="Puedes seleccionar múltiples archivos a la vez"
+        help="Puedes seleccionar múltiples imágenes, un ZIP con las imágenes o un PDF escaneado con una hoja por página"
     )
     
     # Mostrar archivos seleccionados
+    excluded = set()
+    expansion = None
     if uploaded_files:
-        st.write(f"📁 **Archivos seleccionados:** {len(uploaded_files)} exámenes")
+        st.write(f"📁 **Archivos seleccionados:** {len(uploaded_files)} archivos")
         for i, file in enumerate(uploaded_files):
             st.write(f"{i+1}. {file.name}")
+        if not st.session_state.processing and not st.session_state.pdf_generated:
+            expansion = expand_uploads(uploaded_files)
+            if validate_uploads and expansion['files_data']:
+                excluded = render_preflight(uploaded_files, expansion['files_data'])
     
     # Procesar lote completo
-    if uploaded_files and batch_name and not st.session_state.processing and not st.session_state.pdf_generated:
+    if expansion is not None and batch_name:
         if st.button("🚀 Procesar Lote Completo", type="primary", use_container_width=True):
-            if len(uploaded_files) > 10:
+            # Preparar datos, sin los archivos descartados en la revisión previa
+            files_data = [
+                file_data for index, file_data in enumerate(expansion['files_data'])
+                if index not in excluded
+            ]
+            if not expansion['files_data']:
+                st.error("❌ No se encontraron exámenes en los archivos seleccionados")
+                st.stop()
+            if not files_data:
+                st.error("❌ Todos los archivos fueron descartados en la revisión previa")
+                st.stop()
+            if len(files_data) > 10:
                 st.warning("⚠️ Tienes muchos exámenes. El procesamiento puede tomar varios minutos.")
             
             st.session_state.processing = True
             
-            # Preparar datos
-            files_data = []
-            for uploaded_file in uploaded_files:
-                student_id = uploaded_file.name.split('.')[0]
-                files_data.append({
-                    'file': uploaded_file,
-                    'student_id': student_id,
-                    'filename': uploaded_file.name
-                })
-            
-            # Procesar lote
-            with st.spinner(f"🔄 Procesando {len(uploaded_files)} exámenes. Esto puede tomar varios minutos..."):
-                result = scanner.process_batch(files_data, batch_name, exam_type)
-                st.session_state.last_results = result
-                st.session_state.processing = False
-            
-            # Mostrar resultados
-            if result['success']:
-                st.success(f"✅ Lote procesado exitosamente!")
-                
-                # Mostrar resumen visual
-                results_data = result['data']
-                batch_processing = results_data.get('batch_processing', {})
-                results = results_data.get('results', [])
-                successful_results = [r for r in results if r.get('success')]
-                
-                if successful_results:
-                    # Calcular estadísticas para mostrar en Streamlit
-                    scores = []
-                    approved = 0
-                    student_scores = []
-                    
-                    for result_item in successful_results:
-                        data = result_item.get('data', {})
-                        evaluation = data.get('evaluation', {})
-                        score = evaluation.get('score_percentage', 0)
-                        scores.append(score)
-                        
-                        student_name = data.get('student_info', {}).get('student_name', result_item.get('student_id', 'Desconocido'))
-                        student_scores.append({
-                            'name': student_name,
-                            'score': score
-                        })
-                        
-                        if evaluation.get('passing_status') == 'APROBADO':
-                            approved += 1
-                    
-                    avg_score = sum(scores) / len(scores) if scores else 0
-                    max_score = max(scores) if scores else 0
-                    min_score = min(scores) if scores else 0
-                    
-                    # Encontrar estudiantes con máxima nota
-                    max_students = [s for s in student_scores if s['score'] == max_score]
-                    
-                    # Mostrar métricas
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.metric("📊 Promedio General", f"{avg_score:.1f}%")
-                    with col2:
-                        st.metric("✅ Aprobados", approved)
-                    with col3:
-                        st.metric("❌ Desaprobados", len(successful_results) - approved)
-                    with col4:
-                        st.metric("🎯 Nota Máxima", f"{max_score}%")
-                    
-                    # Mostrar información del estudiante con máxima nota
-                    if max_students:
-                        st.info(f"🏆 **Mejor desempeño:** {max_students[0]['name']} con {max_score}%")
-                    
-                    # Generar PDF automáticamente
-                    st.subheader("📄 Reporte PDF Generado")
-
-                    try:
-                        pdf = pdf_generator.generate_pdf_report(results_data, batch_name, exam_type)
-                        
-                        # Guardar PDF en buffer
-                        pdf_buffer = io.BytesIO()
-                        pdf_output = pdf.output(dest='S')
-
-                        # ✅ Corregir compatibilidad según el tipo devuelto
-                        if isinstance(pdf_output, str):
-                            pdf_output = pdf_output.encode('latin-1')
-                        elif isinstance(pdf_output, bytearray):
-                            pdf_output = bytes(pdf_output)
-
-                        pdf_buffer.write(pdf_output)
-                        pdf_buffer.seek(0)
-                        
-                        # Botón de descarga
-                        st.download_button(
-                            label="⬇️ Descargar Reporte PDF",
-                            data=pdf_buffer,
-                            file_name=f"reporte_eduscan_{batch_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
-                            mime="application/pdf",
-                            use_container_width=True
-                        )
-                        
-                        st.session_state.pdf_generated = True
-                        
-                    except Exception as e:
-                        st.error(f"❌ Error al generar PDF: {str(e)}")
-
-                    
-                    # Botón para procesar nuevo lote
-                    if st.button("🔄 Procesar Nuevo Lote", use_container_width=True):
-                        st.session_state.last_results = None
-                        st.session_state.processing = False
-                        st.session_state.pdf_generated = False
-                        st.rerun()
-            else:
-                st.error(f"❌ Error al procesar lote: {result['error']}")
-    
-    # Si ya se generó PDF, mostrar opción para nuevo lote
-    elif st.session_state.pdf_generated:
-        st.info("📄 El reporte PDF ha sido generado. Puedes descargarlo arriba.")
-        if st.button("🔄 Procesar Nuevo Lote", use_container_width=True):
-            st.session_state.last_results = None
-            st.session_state.processing = False
-            st.session_state.pdf_generated = False
+            # Normalizar imágenes antes de subirlas
+            st.session_state.preprocess_report = None
+            if preprocessor is not None:
+                with st.spinner("🖼️ Optimizando imágenes..."):
+                    files_data, st.session_state.preprocess_report = preprocessor.preprocess_batch(
+                        files_data, spool_dir=st.session_state.expansion['ingestor'].spool_dir
+                    )
+            
+            # Procesar lote en segundo plano; la UI consulta el progreso en cada rerun
+            job_id = journal.create_job(batch_name, exam_type, files_data)
+            # Las páginas expandidas pertenecen ahora al lote y se borran cuando termina
+            ingestor = st.session_state.pop('expansion')['ingestor']
+            def finish_job(result):
+                journal.finish_job(job_id)
+                ingestor.cleanup()
+                # Mismo batch_id en el histórico al verlo después desde el diario
+                if 'batch_processing' in result.get('data', {}):
+                    result['data']['batch_processing']['job_id'] = job_id
+            st.session_state.batch_runner = BackgroundBatchRunner(
+                scanner, files_data, batch_name, exam_type,
+                on_result=lambda result_item: journal.record_result(job_id, result_item),
+                on_finish=finish_job,
+                scheduler=get_scheduler(),
+                flow=st.session_state.session_id
+            ).start()
             st.rerun()
+    
+    # Progreso del lote en curso
+    if st.session_state.batch_runner is not None:
+        preprocess_report = st.session_state.get('preprocess_report')
+        if preprocess_report:
+            st.info(
+                f"🖼️ Imágenes optimizadas: {preprocess_report['original_bytes'] / 1024 / 1024:.1f} MB → "
+                f"{preprocess_report['processed_bytes'] / 1024 / 1024:.1f} MB "
+                f"({preprocess_report['savings_percentage']:.0f}% ahorrado)"
+            )
+            for failure in preprocess_report['failed']:
+                st.warning(f"⚠️ No se pudo optimizar {failure['filename']}: {failure['error']}")
+        render_progress(st.session_state.batch_runner, pdf_generator)
+    
+    # Si ya se generó PDF, volver a mostrar el lote desde la caché (sin re-renderizar)
+    elif st.session_state.pdf_generated and st.session_state.last_results is not None:
+        last_batch = st.session_state.last_batch
+        render_results(st.session_state.last_results, last_batch['batch_name'], last_batch['exam_type'], pdf_generator)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
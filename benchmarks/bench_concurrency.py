@@ -0,0 +1,72 @@
+"""Rendimiento sostenido contra un webhook con límite de lotes simultáneos
+
+El servidor simulado responde 429 (con Retry-After) cuando hay más de
+--max-in-flight lotes en curso. Compara el envío sin reintentos (el
+comportamiento anterior: un 429 hace fallar el bloque) con el cliente
+con reintentos y concurrencia adaptativa, para varios techos de
+concurrencia.
+
+Uso: python benchmarks/bench_concurrency.py [--exams 400] [--max-in-flight 4] [--concurrency 2 4 8 16]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_webhook import start_server  # noqa: E402
+from eduscan.client import RetryPolicy  # noqa: E402
+from eduscan.scanner import BatchExamScanner  # noqa: E402
+
+MODES = {
+    'sin reintentos': dict(retry=RetryPolicy(max_attempts=1), failover_rounds=0),
+    'adaptativo': dict(),
+}
+
+def run(args, concurrency, options):
+    server = start_server(latency=args.latency, max_in_flight=args.max_in_flight, retry_after=args.retry_after)
+    files_data = [
+        {'file': io.BytesIO(os.urandom(args.image_kb * 1024)), 'student_id': f"alumno_{i:05d}",
+         'filename': f"alumno_{i:05d}.jpg", 'mime_type': 'image/jpeg'}
+        for i in range(args.exams)
+    ]
+    scanner = BatchExamScanner(chunk_size=args.chunk_size, max_concurrency=concurrency,
+                               webhook_url=server.url, **options)
+    start = time.perf_counter()
+    result = scanner.process_batch(files_data, "Benchmark", "Matemáticas")
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    
+    evaluated = sum(1 for r in result['data']['results'] if r['success']) if result['success'] else 0
+    return {
+        'evaluated': evaluated,
+        'seconds': elapsed,
+        'throughput': evaluated / elapsed,
+        'throttled': server.throttled,
+        'limit': scanner.client.limiter.snapshot()['limit']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exams', type=int, default=400)
+    parser.add_argument('--chunk-size', type=int, default=10)
+    parser.add_argument('--image-kb', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.005, help="Segundos de evaluación por examen")
+    parser.add_argument('--max-in-flight', type=int, default=4, help="Lotes simultáneos que admite el servidor")
+    parser.add_argument('--retry-after', type=int, default=0, help="Retry-After (s) de las respuestas 429")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[2, 4, 8, 16])
+    args = parser.parse_args()
+    
+    print(f"{args.exams} exámenes en bloques de {args.chunk_size}, servidor con máximo {args.max_in_flight} lotes simultáneos")
+    print(f"{'modo':>15} {'techo':>6} {'evaluados':>10} {'tiempo (s)':>11} {'exámenes/s':>11} {'429':>5} {'límite final':>13}")
+    for concurrency in args.concurrency:
+        for mode, options in MODES.items():
+            sample = run(args, concurrency, options)
+            print(f"{mode:>15} {concurrency:>6} {sample['evaluated']:>10} {sample['seconds']:>11.2f} "
+                  f"{sample['throughput']:>11.1f} {sample['throttled']:>5} {sample['limit']:>13}")
+
+if __name__ == '__main__':
+    main()
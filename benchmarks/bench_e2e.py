@@ -0,0 +1,164 @@
+"""Benchmark de extremo a extremo contra el webhook simulado
+
+Para cada tamaño de lote mide, en un proceso aparte: codificación del
+cuerpo, tiempo de pared del envío, estadísticas, renderizado del PDF y
+pico de memoria (RSS). Con --output guarda los resultados en JSON para
+seguir su evolución entre commits.
+
+Uso: python benchmarks/bench_e2e.py [--sizes 10 100 1000] [--latency 0.002] [--output e2e.json]
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_webhook import start_server  # noqa: E402
+
+# (clave, encabezado, formato); el ancho de cada columna es el de su encabezado
+COLUMNS = [
+    ('exams', 'exámenes', 'd'),
+    ('body_mb', 'cuerpo (MB)', '.1f'),
+    ('encode_s', 'codificar (s)', '.3f'),
+    ('request_s', 'envío (s)', '.3f'),
+    ('stats_s', 'estadísticas (s)', '.3f'),
+    ('pdf_s', 'PDF (s)', '.3f'),
+    ('pdf_pages', 'páginas', 'd'),
+    ('peak_rss_mb', 'pico RSS (MB)', '.0f'),
+]
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    value = function(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+def run_child(args):
+    """Un lote completo: envío, estadísticas y PDF; imprime las métricas en JSON"""
+    from eduscan import BatchExamScanner, BatchStatistics, ItemAnalysis, PDFReportGenerator, ResultSet
+    
+    files_data = [
+        {
+            'file': io.BytesIO(os.urandom(args.image_kb * 1024)),
+            'student_id': f"alumno_{i:05d}",
+            'filename': f"alumno_{i:05d}.jpg",
+            'mime_type': 'image/jpeg'
+        }
+        for i in range(args.child)
+    ]
+    scanner = BatchExamScanner(
+        chunk_size=args.chunk_size,
+        max_concurrency=args.concurrency,
+        transport=args.transport,
+        response_mode=args.response_mode,
+        webhook_url=args.url
+    )
+    
+    body = scanner._request_kwargs(files_data, "Benchmark", "Matemáticas")['data']
+    body_bytes, encode_s = timed(lambda: sum(len(block) for block in body))
+    
+    result, request_s = timed(scanner.process_batch, files_data, "Benchmark", "Matemáticas")
+    if not result['success']:
+        raise SystemExit(f"El envío falló: {result['error']}")
+    
+    def compute_stats():
+        result_set = ResultSet.from_payload(result['data'])
+        return result_set, BatchStatistics(result_set), ItemAnalysis(result_set)
+    (result_set, stats, _), stats_s = timed(compute_stats)
+    
+    generator = PDFReportGenerator()
+    def render_pdf():
+        pdf = generator.generate_pdf_report(result_set, "Benchmark", "Matemáticas")
+        path = generator.spool_pdf(pdf)
+        os.remove(path)
+        return pdf.page
+    pdf_pages, pdf_s = timed(render_pdf)
+    
+    print(json.dumps({
+        'exams': args.child,
+        'evaluated': stats.count,
+        'failed': len(result_set.failures),
+        'body_mb': body_bytes / 1024 / 1024,
+        'encode_s': encode_s,
+        'request_s': request_s,
+        'stats_s': stats_s,
+        'pdf_s': pdf_s,
+        'pdf_pages': pdf_pages,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }))
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--image-kb', type=int, default=100, help="Tamaño de cada imagen sintética")
+    parser.add_argument('--latency', type=float, default=0.002, help="Segundos de evaluación por examen en el servidor")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--transport', choices=['json', 'multipart'], default='json')
+    parser.add_argument('--response-mode', choices=['json', 'ndjson'], default='json')
+    parser.add_argument('--chunk-size', type=int, default=None)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--output', help="Ruta del JSON con los resultados")
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child is not None:
+        run_child(args)
+        return
+    
+    server = start_server(latency=args.latency, error_rate=args.error_rate)
+    config = {
+        'image_kb': args.image_kb,
+        'latency': args.latency,
+        'error_rate': args.error_rate,
+        'transport': args.transport,
+        'response_mode': args.response_mode,
+        'chunk_size': args.chunk_size,
+        'concurrency': args.concurrency
+    }
+    child_args = [f"--{key.replace('_', '-')}={value}" for key, value in config.items()
+                  if key not in ('latency', 'error_rate') and value is not None]
+    
+    print(' '.join(f"{key}={value}" for key, value in config.items()))
+    print(' '.join(header for _, header, _ in COLUMNS))
+    results = []
+    for size in args.sizes:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', str(size), '--url', server.url, *child_args],
+            capture_output=True, text=True, check=True
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        results.append(sample)
+        print(' '.join(f"{sample[key]:>{len(header)}{spec}}" for key, header, spec in COLUMNS))
+    server.shutdown()
+    
+    if args.output:
+        report = {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'config': config,
+            'results': results
+        }
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Compara el pico de memoria (RSS) al enviar un lote en JSON materializado y en streaming
+
+Cada modo se ejecuta en un proceso aparte contra un servidor local que
+descarta el cuerpo; se informa el pico de RSS por encima del que ya
+ocupan las imágenes cargadas.
+
+Uso: python benchmarks/bench_payload_memory.py [--exams 100] [--image-kb 1024]
+"""
+import argparse
+import base64
+import datetime
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ('materializado', 'streaming')
+
+class SinkHandler(BaseHTTPRequestHandler):
+    """Lee y descarta el cuerpo del request por bloques"""
+    
+    def do_POST(self):
+        remaining = int(self.headers.get('Content-Length', 0))
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1024 * 1024)))
+        body = json.dumps({'batch_processing': {}, 'results': []}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def materialized_submit(url, files_data):
+    """Camino anterior: lista completa de imágenes en base64 y json= de requests"""
+    import requests
+    payload = {
+        "batch_name": "Benchmark",
+        "exam_type": "Matemáticas",
+        "timestamp": datetime.datetime.now().isoformat(),
+        "total_exams": len(files_data),
+        "exams": []
+    }
+    for file_data in files_data:
+        image_b64 = base64.b64encode(file_data['file'].getvalue()).decode('utf-8')
+        payload["exams"].append({
+            "student_id": file_data['student_id'],
+            "filename": file_data['filename'],
+            "image_data": f"data:image/jpeg;base64,{image_b64}"
+        })
+    return requests.post(url, json=payload, timeout=300).status_code == 200
+
+def streaming_submit(url, files_data):
+    from eduscan.scanner import BatchExamScanner
+    scanner = BatchExamScanner()
+    scanner.n8n_webhook_url = url
+    return scanner._submit(files_data, "Benchmark", "Matemáticas")['success']
+
+def run_child(mode, url, exams, image_kb):
+    files_data = [
+        {'file': io.BytesIO(os.urandom(image_kb * 1024)), 'student_id': f"alumno_{i:05d}", 'filename': f"alumno_{i:05d}.jpg"}
+        for i in range(exams)
+    ]
+    baseline = peak_rss_mb()
+    submit = materialized_submit if mode == 'materializado' else streaming_submit
+    start = time.perf_counter()
+    ok = submit(url, files_data)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'ok': ok, 'baseline': baseline, 'peak': peak_rss_mb(), 'elapsed': elapsed}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--exams', type=int, default=100)
+    parser.add_argument('--image-kb', type=int, default=1024)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        run_child(args.child, args.url, args.exams, args.image_kb)
+        return
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SinkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    
+    batch_mb = args.exams * args.image_kb / 1024
+    print(f"Lote: {args.exams} imágenes de {args.image_kb} KB ({batch_mb:.0f} MB)")
+    print(f"{'modo':>14} {'base RSS (MB)':>14} {'pico RSS (MB)':>14} {'extra (MB)':>11} {'tiempo (s)':>11}")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', mode, '--url', url,
+             '--exams', str(args.exams), '--image-kb', str(args.image_kb)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        if not sample['ok']:
+            raise SystemExit(f"El envío en modo {mode} falló")
+        print(f"{mode:>14} {sample['baseline']:>14.0f} {sample['peak']:>14.0f} {sample['peak'] - sample['baseline']:>11.0f} {sample['elapsed']:>11.2f}")
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Memoria pico al escribir el PDF: copia en memoria (output('S') + BytesIO) frente a archivo
+
+Uso: python benchmarks/bench_pdf_output.py [--sizes 100 1000 3000]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eduscan import PDFReportGenerator, ResultSet  # noqa: E402
+from benchmarks.synthetic import make_results  # noqa: E402
+
+def in_memory(generator, pdf):
+    pdf.set_compression(generator.compress)
+    pdf_output = pdf.output(dest='S').encode('latin-1')
+    buffer = io.BytesIO()
+    buffer.write(pdf_output)
+    return buffer.getbuffer().nbytes
+
+def spooled(generator, pdf):
+    path = generator.spool_pdf(pdf)
+    size = os.path.getsize(path)
+    os.remove(path)
+    return size
+
+def measure(method, generator, result_set):
+    pdf = generator.generate_pdf_report(result_set, "Benchmark", "Matemáticas")
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = method(generator, pdf)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 3000])
+    args = parser.parse_args()
+    
+    generator = PDFReportGenerator(parallel_threshold=float('inf'))
+    print(f"{'estudiantes':>12} {'tamaño (MB)':>12} {'memoria (MB)':>13} {'archivo (MB)':>13} "
+          f"{'memoria (s)':>12} {'archivo (s)':>12}")
+    for size in args.sizes:
+        result_set = ResultSet.from_payload(make_results(size))
+        pdf_size, mem_time, mem_peak = measure(in_memory, generator, result_set)
+        _, spool_time, spool_peak = measure(spooled, generator, result_set)
+        print(f"{size:>12} {pdf_size / 2**20:>12.1f} {mem_peak / 2**20:>13.1f} {spool_peak / 2**20:>13.1f} "
+              f"{mem_time:>12.2f} {spool_time:>12.2f}")
+
+if __name__ == '__main__':
+    main()
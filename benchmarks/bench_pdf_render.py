@@ -0,0 +1,38 @@
+"""Compara el renderizado secuencial y por fragmentos paralelos del reporte PDF
+
+Uso: python benchmarks/bench_pdf_render.py [--sizes 50 500 5000] [--workers N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eduscan import PDFReportGenerator, ResultSet  # noqa: E402
+from benchmarks.synthetic import make_results  # noqa: E402
+
+def time_render(generator, result_set):
+    start = time.perf_counter()
+    pdf = generator.generate_pdf_report(result_set, "Benchmark", "Matemáticas")
+    return time.perf_counter() - start, pdf.page_no()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--shard-size', type=int, default=50)
+    args = parser.parse_args()
+    
+    sequential = PDFReportGenerator(parallel_threshold=float('inf'))
+    parallel = PDFReportGenerator(max_workers=args.workers, shard_size=args.shard_size, parallel_threshold=0)
+    
+    print(f"{'estudiantes':>12} {'páginas':>8} {'secuencial (s)':>15} {'paralelo (s)':>13} {'speedup':>8}")
+    for size in args.sizes:
+        result_set = ResultSet.from_payload(make_results(size))
+        seq_time, pages = time_render(sequential, result_set)
+        par_time, _ = time_render(parallel, result_set)
+        print(f"{size:>12} {pages:>8} {seq_time:>15.2f} {par_time:>13.2f} {seq_time / par_time:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Mide el tiempo desde el arranque del proceso hasta el primer request al webhook
+
+Compara la CLI (`python -m eduscan grade`) con cargar antes la app de
+Streamlit, y lista qué módulos pesados ya estaban importados en ese momento.
+
+Uso: python benchmarks/bench_startup.py [--runs 7]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['streamlit', 'pandas', 'numpy', 'fpdf', 'pyarrow', 'xlsxwriter', 'PIL']
+
+# El proceso hijo sustituye requests.Session.post y termina en cuanto se intenta el primer envío
+CHILD = """
+import json, os, sys, time
+import requests
+
+def first_request(*args, **kwargs):
+    heavy = [name for name in {heavy!r} if name in sys.modules]
+    print(json.dumps({{'at': time.time(), 'heavy': heavy}}), flush=True)
+    os._exit(0)
+
+requests.Session.post = first_request
+{preload}
+from eduscan.cli import main
+main(['grade', {directory!r}, '--batch', 'bench', '--exam-type', 'bench', '--no-cache', '--no-optimize', '--no-validate'])
+"""
+
+MODES = {
+    'eduscan grade': "",
+    'app.py + grade': "import app",
+}
+
+def measure(preload, directory):
+    code = CHILD.format(heavy=HEAVY_MODULES, preload=preload, directory=directory)
+    env = dict(os.environ, PYTHONPATH=ROOT, EDUSCAN_DATA_DIR=os.path.join(directory, '.eduscan'))
+    started = time.time()
+    output = subprocess.run([sys.executable, '-c', code], env=env, cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    sample = json.loads(output.strip().splitlines()[-1])
+    return sample['at'] - started, sample['heavy']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'alumno_001.png'), 'wb') as image:
+            image.write(b'\x89PNG\r\n\x1a\n')
+        
+        print(f"{'modo':>16} {'mediana (s)':>12} {'mín (s)':>9}  módulos pesados cargados")
+        for mode, preload in MODES.items():
+            samples = [measure(preload, directory) for _ in range(args.runs)]
+            times = [elapsed for elapsed, _ in samples]
+            heavy = samples[-1][1]
+            print(f"{mode:>16} {statistics.median(times):>12.3f} {min(times):>9.3f}  {', '.join(heavy) or '-'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Tiempo y memoria del ZIP de PDF individuales, secuencial y en paralelo
+
+La memoria es el pico de Python en el proceso principal (tracemalloc) sin
+contar los resultados: debería mantenerse plana al crecer el lote.
+
+Uso: python benchmarks/bench_student_bundle.py [--sizes 100 1000 5000] [--workers N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eduscan import PDFReportGenerator, ResultSet  # noqa: E402
+from benchmarks.synthetic import make_results  # noqa: E402
+
+def time_bundle(generator, result_set):
+    with tempfile.TemporaryFile() as bundle_file:
+        start = time.perf_counter()
+        count = generator.write_student_bundle(result_set, "Benchmark", "Matemáticas", bundle_file)
+        elapsed = time.perf_counter() - start
+        # tracemalloc ralentiza el proceso principal: el pico se mide en una segunda pasada
+        bundle_file.seek(0)
+        bundle_file.truncate()
+        tracemalloc.start()
+        generator.write_student_bundle(result_set, "Benchmark", "Matemáticas", bundle_file)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, count, bundle_file.tell(), peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--shard-size', type=int, default=50)
+    args = parser.parse_args()
+    
+    sequential = PDFReportGenerator(parallel_threshold=float('inf'), shard_size=args.shard_size)
+    parallel = PDFReportGenerator(max_workers=args.workers, shard_size=args.shard_size, parallel_threshold=0)
+    
+    print(f"{'estudiantes':>12} {'ZIP (MB)':>9} {'secuencial (s)':>15} {'paralelo (s)':>13} {'speedup':>8} "
+          f"{'pico sec. (MB)':>15} {'pico par. (MB)':>15}")
+    for size in args.sizes:
+        result_set = ResultSet.from_payload(make_results(size))
+        seq_time, count, size_bytes, seq_peak = time_bundle(sequential, result_set)
+        par_time, _, _, par_peak = time_bundle(parallel, result_set)
+        print(f"{count:>12} {size_bytes / 1024 / 1024:>9.1f} {seq_time:>15.2f} {par_time:>13.2f} "
+              f"{seq_time / par_time:>7.2f}x {seq_peak / 1024 / 1024:>15.1f} {par_peak / 1024 / 1024:>15.1f}")
+
+if __name__ == '__main__':
+    main()
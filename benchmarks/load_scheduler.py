@@ -0,0 +1,115 @@
+"""Carga mixta de varias sesiones contra un webhook con pocos workers
+
+Varias sesiones envían a la vez un lote grande y, mientras tanto, llegan
+lotes pequeños a intervalos aleatorios. Todas las sesiones comparten un
+mismo scanner, como en app.py (get_scanner está en caché por
+configuración). Compara enviar solo con el limitador del scanner con el
+FairScheduler compartido, y muestra la latencia de los lotes pequeños (p50/p95) y el
+tiempo de los grandes. Por defecto el planificador admite un request más
+que los workers del servidor, para que ninguno quede ocioso entre dos
+requests.
+
+Uso: python benchmarks/load_scheduler.py [--large 4] [--large-exams 400] [--small-exams 10] [--workers 4]
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_webhook import start_server  # noqa: E402
+from eduscan.scanner import BackgroundBatchRunner, BatchExamScanner  # noqa: E402
+from eduscan.scheduler import FairScheduler  # noqa: E402
+
+def make_files(prefix, count, image_kb):
+    return [
+        {'file': io.BytesIO(os.urandom(image_kb * 1024)), 'student_id': f"{prefix}_{i:05d}",
+         'filename': f"{prefix}_{i:05d}.jpg", 'mime_type': 'image/jpeg'}
+        for i in range(count)
+    ]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run(args, scheduler):
+    server = start_server(latency=args.latency, workers=args.workers)
+    # Un solo scanner para todas las sesiones, como el de get_scanner() en app.py
+    scanner = BatchExamScanner(chunk_size=args.chunk_size, max_concurrency=args.concurrency,
+                               webhook_url=server.url)
+    runners = {'large': [], 'small': []}
+    lock = threading.Lock()
+    
+    def submit(kind, session, count):
+        runner = BackgroundBatchRunner(scanner, make_files(session, count, args.image_kb), session, "Carga",
+                                       scheduler=scheduler, flow=session).start()
+        with lock:
+            runners[kind].append(runner)
+    
+    start = time.perf_counter()
+    for index in range(args.large):
+        submit('large', f"grande_{index}", args.large_exams)
+    
+    rng = random.Random(args.seed)
+    small_index = 0
+    while any(not runner.finished for runner in runners['large']):
+        time.sleep(rng.expovariate(1 / args.small_interval))
+        submit('small', f"pequeño_{small_index}", args.small_exams)
+        small_index += 1
+    for runner in runners['large'] + runners['small']:
+        while not runner.finished:
+            time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    
+    def latency(runner):
+        return runner.finished_at - runner.started_at
+    
+    small = [latency(runner) for runner in runners['small']]
+    large = [latency(runner) for runner in runners['large']]
+    evaluated = sum(runner.snapshot()['completed'] for runner in runners['large'] + runners['small'])
+    return {
+        'small': len(small),
+        'p50': statistics.median(small) if small else 0.0,
+        'p95': percentile(small, 0.95) if small else 0.0,
+        'large': max(large),
+        'throughput': evaluated / elapsed,
+        'peak': server.peak_in_flight
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--large', type=int, default=4, help="Sesiones con un lote grande")
+    parser.add_argument('--large-exams', type=int, default=400)
+    parser.add_argument('--small-exams', type=int, default=10)
+    parser.add_argument('--small-interval', type=float, default=0.3, help="Segundos medios entre lotes pequeños")
+    parser.add_argument('--chunk-size', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=8, help="Bloques simultáneos por lote (y límite del scanner compartido)")
+    parser.add_argument('--workers', type=int, default=4, help="Lotes que el servidor evalúa a la vez")
+    parser.add_argument('--scheduler-concurrency', type=int, help="Límite del planificador (por defecto, workers + 1)")
+    parser.add_argument('--latency', type=float, default=0.01, help="Segundos de evaluación por examen")
+    parser.add_argument('--image-kb', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    cap = args.scheduler_concurrency or args.workers + 1
+    
+    modes = {
+        'sin planificador': lambda: None,
+        'planificador': lambda: FairScheduler(max_concurrency=cap, small_batch=args.small_exams * 5),
+    }
+    print(f"{args.large} sesiones × {args.large_exams} exámenes + lotes de {args.small_exams} cada ~{args.small_interval} s, "
+          f"servidor con {args.workers} workers")
+    print(f"{'modo':>17} {'pequeños':>9} {'p50 (s)':>8} {'p95 (s)':>8} {'grandes (s)':>12} {'exámenes/s':>11} {'en vuelo máx.':>14}")
+    for mode, make_scheduler in modes.items():
+        sample = run(args, make_scheduler())
+        print(f"{mode:>17} {sample['small']:>9} {sample['p50']:>8.2f} {sample['p95']:>8.2f} {sample['large']:>12.2f} "
+              f"{sample['throughput']:>11.1f} {sample['peak']:>14}")
+
+if __name__ == '__main__':
+    main()
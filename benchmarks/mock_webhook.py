@@ -0,0 +1,262 @@
+"""Servidor local que imita el webhook /upload-exam de evaluación
+
+Acepta el lote en JSON (base64) o multipart, tarda `latency` segundos por
+examen, falla una fracción `error_rate` de los exámenes y responde con
+detailed_results sintéticos coherentes con una clave fija (y el
+processing_time de cada examen y del lote). Si el cliente
+pide application/x-ndjson envía una línea por examen a medida que lo evalúa.
+Con --max-in-flight responde 429 con Retry-After a los requests que
+superan ese número de lotes simultáneos, como un servicio con rate limit.
+Con --workers evalúa como mucho ese número de lotes a la vez y el resto
+espera su turno en el servidor, como un n8n con pocos workers.
+Con --fail-requests los primeros N requests responden 500 y con
+--cut-stream las respuestas NDJSON se cortan a mitad de línea tras N
+exámenes, para probar la recuperación del cliente.
+
+Uso: python benchmarks/mock_webhook.py [--port 8765] [--latency 0.05] [--error-rate 0.1] [--max-in-flight 4] [--workers 4]
+     EDUSCAN_WEBHOOK_URL=http://127.0.0.1:8765/upload-exam streamlit run app.py
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_answer_key, make_result_item  # noqa: E402
+
+class MockWebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, address, latency=0.0, error_rate=0.0, http_error_rate=0.0, n_questions=20, seed=0,
+                 max_in_flight=None, retry_after=1, workers=None, fail_requests=0, cut_stream=None):
+        super().__init__(address, MockWebhookHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.seed = seed
+        self.answer_key = make_answer_key(n_questions, seed)
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self._workers = threading.Semaphore(workers) if workers else None
+        self.fail_requests = fail_requests
+        self.cut_stream = cut_stream
+        self.requests = 0
+        self.exams = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/upload-exam"
+    
+    def chance(self, rate):
+        with self._lock:
+            return self._rng.random() < rate
+    
+    def should_fail(self):
+        """True para los primeros fail_requests requests (500 simulado) o según http_error_rate"""
+        with self._lock:
+            if self.fail_requests > 0:
+                self.fail_requests -= 1
+                return True
+        return self.chance(self.http_error_rate)
+    
+    def count(self, exams):
+        with self._lock:
+            self.requests += 1
+            self.exams += exams
+    
+    def enter(self):
+        """Ocupa un hueco de evaluación; False si se supera max_in_flight (con workers, espera uno libre)"""
+        with self._lock:
+            if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+                self.throttled += 1
+                return False
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        if self._workers is not None:
+            self._workers.acquire()
+        return True
+    
+    def leave(self):
+        if self._workers is not None:
+            self._workers.release()
+        with self._lock:
+            self.in_flight -= 1
+
+class MockWebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('upload-exam'):
+            return self._send_json(404, {'error': f"Ruta desconocida: {self.path}"})
+        if 'Content-Length' not in self.headers:
+            return self._send_json(411, {'error': "Se requiere Content-Length"})
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        
+        if self.server.should_fail():
+            return self._send_json(500, {'error': "Error simulado del webhook"})
+        try:
+            batch = self._parse_batch(body)
+        except (ValueError, KeyError) as e:
+            return self._send_json(400, {'error': f"Lote inválido: {e}"})
+        
+        if not self.server.enter():
+            return self._send_json(429, {'error': "Demasiados lotes simultáneos"},
+                                   {'Retry-After': str(self.server.retry_after)})
+        try:
+            exams = batch.get('exams', [])
+            self.server.count(len(exams))
+            if 'application/x-ndjson' in self.headers.get('Accept', ''):
+                return self._stream_results(batch, exams)
+            
+            started = time.perf_counter()
+            results = [self._grade(batch, exam) for exam in exams]
+        finally:
+            self.server.leave()
+        self._send_json(200, {
+            'batch_processing': self._summary(results, started),
+            'results': results
+        })
+    
+    def _parse_batch(self, body):
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            return self._parse_multipart(content_type, body)
+        batch = json.loads(body)
+        for exam in batch['exams']:
+            exam['has_image'] = str(exam.get('image_data', '')).startswith('data:image/')
+            exam.pop('image_data', None)
+        return batch
+    
+    @staticmethod
+    def _parse_multipart(content_type, body):
+        message = BytesParser(policy=policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + body
+        )
+        metadata = None
+        fields = set()
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if name == 'metadata':
+                metadata = json.loads(part.get_payload(decode=True))
+            elif part.get_payload(decode=True):
+                fields.add(name)
+        if metadata is None:
+            raise ValueError("falta la parte 'metadata'")
+        for exam in metadata['exams']:
+            exam['has_image'] = exam.get('field') in fields
+        return metadata
+    
+    def _grade(self, batch, exam):
+        started = time.perf_counter()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        student_id = exam.get('student_id')
+        filename = exam.get('filename', '')
+        if not exam.get('has_image'):
+            result = {'student_id': student_id, 'filename': filename, 'success': False, 'error': "Examen sin imagen"}
+        elif self.server.chance(self.server.error_rate):
+            result = {'student_id': student_id, 'filename': filename, 'success': False,
+                      'error': "No se pudo leer la hoja de respuestas (simulado)"}
+        else:
+            # Mismo alumno, mismo resultado: el contenido depende solo de la semilla y el student_id
+            rng = random.Random(f"{self.server.seed}:{student_id}")
+            result = make_result_item(student_id, filename, self.server.answer_key, rng,
+                                      exam_type=batch.get('exam_type', 'N/A'))
+        result['processing_time'] = round(time.perf_counter() - started, 4)
+        return result
+    
+    @staticmethod
+    def _summary(results, started):
+        successful = sum(1 for result in results if result['success'])
+        return {
+            'total_exams': len(results),
+            'successful': successful,
+            'failed': len(results) - successful,
+            'processing_time': round(time.perf_counter() - started, 3)
+        }
+    
+    def _stream_results(self, batch, exams):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        
+        started = time.perf_counter()
+        results = []
+        for exam in exams:
+            result = self._grade(batch, exam)
+            line = json.dumps(result).encode('utf-8')
+            if self.server.cut_stream is not None and len(results) >= self.server.cut_stream:
+                # Conexión caída a mitad de la respuesta: media línea y cierre
+                self.wfile.write(line[:len(line) // 2])
+                return
+            results.append(result)
+            self.wfile.write(line + b"\n")
+            self.wfile.flush()
+        self.wfile.write(json.dumps({'batch_processing': self._summary(results, started)}).encode('utf-8') + b"\n")
+    
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+def start_server(host='127.0.0.1', port=0, **options):
+    """Arranca el servidor en un hilo y lo devuelve (server.url, server.shutdown())"""
+    server = MockWebhookServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="mock-webhook", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Segundos de evaluación por examen")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fracción de exámenes que fallan")
+    parser.add_argument('--http-error-rate', type=float, default=0.0, help="Fracción de requests que devuelven HTTP 500")
+    parser.add_argument('--max-in-flight', type=int, help="Lotes simultáneos antes de responder 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="Segundos de Retry-After en las respuestas 429")
+    parser.add_argument('--workers', type=int, help="Lotes evaluados a la vez; el resto espera en el servidor")
+    parser.add_argument('--fail-requests', type=int, default=0, help="Primeros requests que devuelven HTTP 500")
+    parser.add_argument('--cut-stream', type=int, help="Exámenes tras los que se corta cada respuesta NDJSON")
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    server = MockWebhookServer(
+        (args.host, args.port), latency=args.latency, error_rate=args.error_rate,
+        http_error_rate=args.http_error_rate, n_questions=args.questions, seed=args.seed,
+        max_in_flight=args.max_in_flight, retry_after=args.retry_after, workers=args.workers,
+        fail_requests=args.fail_requests, cut_stream=args.cut_stream
+    )
+    print(f"Webhook simulado en {server.url}  (EDUSCAN_WEBHOOK_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Resultados sintéticos con la forma de la respuesta del webhook, para benchmarks"""
+import random
+
+OPTIONS = "ABCD"
+
+def make_answer_key(n_questions=20, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(OPTIONS) for _ in range(n_questions)]
+
+def make_result_item(student_id, filename, answer_key, rng, exam_type="Matemáticas", student_name=None):
+    """Un examen evaluado con éxito, con detailed_results coherentes con answer_key"""
+    ability = rng.random()
+    detailed_results = []
+    for q, correct_option in enumerate(answer_key, start=1):
+        selected = correct_option if rng.random() < 0.35 + 0.6 * ability else rng.choice(OPTIONS)
+        detailed_results.append({
+            'question_number': q,
+            'selected_option': selected,
+            'correct_option': correct_option,
+            'is_correct': selected == correct_option,
+            'explanation': f"La opción {correct_option} es la correcta para la pregunta {q}."
+        })
+    
+    n_questions = len(answer_key)
+    correct = sum(d['is_correct'] for d in detailed_results)
+    score = round(correct / n_questions * 100, 1) if n_questions else 0.0
+    return {
+        'student_id': student_id,
+        'filename': filename,
+        'success': True,
+        'data': {
+            'student_info': {
+                'student_name': student_name or student_id,
+                'exam_type': exam_type,
+                'total_questions': n_questions
+            },
+            'evaluation': {
+                'score_percentage': score,
+                'correct_answers': correct,
+                'incorrect_answers': n_questions - correct,
+                'passing_status': 'APROBADO' if score >= 60 else 'REPROBADO'
+            },
+            'detailed_results': detailed_results
+        }
+    }
+
+def make_results(n_students, n_questions=20, seed=0):
+    """Genera un dict {'batch_processing', 'results'} con n_students exámenes evaluados"""
+    rng = random.Random(seed)
+    answer_key = [rng.choice(OPTIONS) for _ in range(n_questions)]
+    results = [
+        make_result_item(f"alumno_{i:05d}", f"alumno_{i:05d}.jpg", answer_key, rng,
+                         student_name=f"Estudiante {i:05d}")
+        for i in range(n_students)
+    ]
+    
+    return {
+        'batch_processing': {'total_exams': n_students, 'successful': n_students, 'failed': 0},
+        'results': results
+    }
@@ -0,0 +1,50 @@
+"""EduScan Pro: evaluación de exámenes por lotes
+
+Los símbolos públicos se importan bajo demanda: `import eduscan` no carga
+requests, numpy, pandas, fpdf ni pyarrow hasta que se usa la clase que
+los necesita.
+"""
+import importlib
+
+__version__ = "1.0.0"
+
+_EXPORTS = {
+    'IMAGE_FORMATS': 'preprocess',
+    'ImagePreprocessor': 'preprocess',
+    'normalize_exam_image': 'preprocess',
+    'ExamIngestor': 'ingest',
+    'PreflightValidator': 'validate',
+    'MultipartStreamEncoder': 'transport',
+    'EvaluationCache': 'cache',
+    'JobJournal': 'jobs',
+    'MetricsRegistry': 'metrics',
+    'WebhookError': 'client',
+    'WebhookClient': 'client',
+    'BatchExamScanner': 'scanner',
+    'BackgroundBatchRunner': 'scanner',
+    'FairScheduler': 'scheduler',
+    'QuestionResult': 'models',
+    'StudentResult': 'models',
+    'ResultSet': 'models',
+    'BatchStatistics': 'stats',
+    'ItemAnalysis': 'items',
+    'AnswerKeyRescorer': 'rescore',
+    'AnswerKeyStore': 'rescore',
+    'ResultExporter': 'export',
+    'AnalyticsStore': 'analytics',
+    'ReportCache': 'report',
+    'PDFReportGenerator': 'report',
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
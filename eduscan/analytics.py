@@ -0,0 +1,180 @@
+"""Histórico de lotes en SQLite para consultas entre lotes"""
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from .config import DATA_DIR
+
+class AnalyticsStore:
+    """Histórico de lotes procesados en SQLite indexado para consultas entre lotes"""
+    
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DATA_DIR, "analytics.db")
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS batches (
+                    batch_id TEXT PRIMARY KEY,
+                    batch_name TEXT NOT NULL,
+                    exam_type TEXT NOT NULL,
+                    processed_at REAL NOT NULL,
+                    student_count INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS student_results (
+                    batch_id TEXT NOT NULL,
+                    student_id TEXT NOT NULL,
+                    student_name TEXT,
+                    exam_type TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    passing_status TEXT,
+                    correct_answers INTEGER,
+                    incorrect_answers INTEGER,
+                    processed_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS question_results (
+                    batch_id TEXT NOT NULL,
+                    student_id TEXT NOT NULL,
+                    exam_type TEXT NOT NULL,
+                    question_number TEXT NOT NULL,
+                    selected_option TEXT,
+                    correct_option TEXT,
+                    is_correct INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_batches_exam_type ON batches (exam_type, processed_at);
+                CREATE INDEX IF NOT EXISTS idx_student_results_student ON student_results (student_id, processed_at);
+                CREATE INDEX IF NOT EXISTS idx_student_results_batch ON student_results (batch_id);
+                CREATE INDEX IF NOT EXISTS idx_student_results_exam_type ON student_results (exam_type, processed_at);
+                CREATE INDEX IF NOT EXISTS idx_question_results_question ON question_results (exam_type, question_number);
+                CREATE INDEX IF NOT EXISTS idx_question_results_batch ON question_results (batch_id);
+            """)
+    
+    @contextlib.contextmanager
+    def _connect(self):
+        """Conexión que confirma (o deshace) la transacción y se cierra al salir del bloque with"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _as_int(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    
+    def record_batch(self, batch_id, result_set, batch_name, exam_type, processed_at=None, replace=False):
+        """Guarda los resultados normalizados de un lote; ignora lotes ya registrados
+        
+        Con replace=True sustituye los resultados del lote (p. ej. tras re-calificarlo).
+        """
+        processed_at = processed_at or time.time()
+        with self._lock, self._connect() as conn:
+            existing = conn.execute("SELECT processed_at FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+            if existing and not replace:
+                return False
+            if existing:
+                # Conservar la fecha original del lote en el histórico
+                processed_at = existing[0]
+                for table in ('batches', 'student_results', 'question_results'):
+                    conn.execute(f"DELETE FROM {table} WHERE batch_id = ?", (batch_id,))
+            conn.execute(
+                "INSERT INTO batches (batch_id, batch_name, exam_type, processed_at, student_count) VALUES (?, ?, ?, ?, ?)",
+                (batch_id, batch_name, exam_type, processed_at, len(result_set))
+            )
+            conn.executemany(
+                "INSERT INTO student_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (batch_id, str(student.student_id), student.student_name, exam_type, student.score,
+                     student.passing_status, self._as_int(student.correct_answers),
+                     self._as_int(student.incorrect_answers), processed_at)
+                    for student in result_set
+                )
+            )
+            conn.executemany(
+                "INSERT INTO question_results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (batch_id, str(student.student_id), exam_type, str(detail.question_number),
+                     str(detail.selected_option), str(detail.correct_option), int(detail.is_correct))
+                    for student in result_set
+                    for detail in student.details
+                )
+            )
+        return True
+    
+    def _query(self, sql, params=()):
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+    
+    @staticmethod
+    def _exam_type_filter(exam_types, column='exam_type'):
+        if not exam_types:
+            return "", ()
+        return f" WHERE {column} IN ({', '.join('?' * len(exam_types))})", tuple(exam_types)
+    
+    def exam_types(self):
+        return self._query("SELECT DISTINCT exam_type FROM batches ORDER BY exam_type")['exam_type'].tolist()
+    
+    def averages_by_exam_type(self, exam_types=None):
+        where, params = self._exam_type_filter(exam_types)
+        return self._query(f"""
+            SELECT exam_type,
+                   COUNT(DISTINCT batch_id) AS lotes,
+                   COUNT(*) AS estudiantes,
+                   AVG(score) AS promedio,
+                   MIN(score) AS minimo,
+                   MAX(score) AS maximo,
+                   100.0 * SUM(passing_status = 'APROBADO') / COUNT(*) AS aprobados_pct
+            FROM student_results{where}
+            GROUP BY exam_type
+            ORDER BY exam_type
+        """, params)
+    
+    def batch_averages(self, exam_types=None):
+        where, params = self._exam_type_filter(exam_types, 'b.exam_type')
+        return self._query(f"""
+            SELECT b.batch_id, b.batch_name, b.exam_type, b.processed_at, b.student_count,
+                   AVG(s.score) AS promedio,
+                   100.0 * SUM(s.passing_status = 'APROBADO') / COUNT(*) AS aprobados_pct
+            FROM batches b JOIN student_results s ON s.batch_id = b.batch_id{where}
+            GROUP BY b.batch_id
+            ORDER BY b.processed_at
+        """, params)
+    
+    def students(self, exam_types=None):
+        where, params = self._exam_type_filter(exam_types)
+        return self._query(f"""
+            SELECT student_id, MAX(student_name) AS student_name, COUNT(*) AS examenes, AVG(score) AS promedio
+            FROM student_results{where}
+            GROUP BY student_id
+            ORDER BY student_id
+        """, params)
+    
+    def student_history(self, student_id):
+        return self._query("""
+            SELECT s.processed_at, b.batch_name, s.exam_type, s.score, s.passing_status,
+                   s.correct_answers, s.incorrect_answers
+            FROM student_results s JOIN batches b ON b.batch_id = s.batch_id
+            WHERE s.student_id = ?
+            ORDER BY s.processed_at
+        """, (str(student_id),))
+    
+    def question_stats(self, exam_type):
+        return self._query("""
+            SELECT question_number,
+                   COUNT(*) AS respuestas,
+                   100.0 * AVG(is_correct) AS aciertos_pct,
+                   COUNT(DISTINCT batch_id) AS lotes
+            FROM question_results
+            WHERE exam_type = ?
+            GROUP BY question_number
+            ORDER BY CAST(question_number AS INTEGER), question_number
+        """, (exam_type,))
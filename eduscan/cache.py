@@ -0,0 +1,106 @@
+"""Caché persistente de evaluaciones del webhook"""
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .config import DATA_DIR
+
+class EvaluationCache:
+    """Caché persistente de evaluaciones indexada por hash de imagen y tipo de examen"""
+    
+    def __init__(self, path=None, max_entries=5000, max_age_days=30, enabled=True):
+        self.path = path or os.path.join(DATA_DIR, "evaluations.db")
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS evaluations (
+                    cache_key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_evaluations_access ON evaluations (last_access)")
+    
+    @contextlib.contextmanager
+    def _connect(self):
+        """Conexión que confirma (o deshace) la transacción y se cierra al salir del bloque with"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def content_hash(file_data):
+        """Hash SHA-256 del contenido de la imagen"""
+        buffer = file_data['file']
+        digest = hashlib.sha256()
+        buffer.seek(0)
+        for block in iter(lambda: buffer.read(1024 * 1024), b""):
+            digest.update(block)
+        buffer.seek(0)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def make_key(image_hash, exam_type):
+        return f"{exam_type}:{image_hash}"
+    
+    def get(self, image_hash, exam_type):
+        """Devuelve el bloque 'data' guardado o None"""
+        key = self.make_key(image_hash, exam_type)
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT data, created_at FROM evaluations WHERE cache_key = ?", (key,)).fetchone()
+            if row and time.time() - row[1] <= self.max_age_days * 86400:
+                conn.execute("UPDATE evaluations SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+                self.hits += 1
+                return json.loads(row[0])
+            self.misses += 1
+            return None
+    
+    def put(self, image_hash, exam_type, data):
+        """Guarda el bloque 'data' (student_info, evaluation, detailed_results)"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO evaluations (cache_key, data, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (self.make_key(image_hash, exam_type), json.dumps(data), now, now)
+            )
+    
+    def evict(self):
+        """Elimina entradas vencidas y las menos usadas por encima del límite"""
+        cutoff = time.time() - self.max_age_days * 86400
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM evaluations WHERE created_at < ?", (cutoff,))
+            conn.execute("""
+                DELETE FROM evaluations WHERE cache_key IN (
+                    SELECT cache_key FROM evaluations ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+    
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM evaluations")
+    
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total) * 100 if total else 0,
+            'entries': entries
+        }
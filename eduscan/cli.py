@@ -0,0 +1,206 @@
+"""Línea de comandos: evalúa una carpeta de exámenes sin arrancar Streamlit
+
+    eduscan grade <carpeta|archivo.zip|archivo.pdf> --batch "Grupo A" --exam-type Matemáticas --out reporte.pdf
+
+Los módulos pesados (numpy, fpdf, pyarrow...) se importan solo después de
+enviar el lote y solo si la salida pedida los necesita.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from .ingest import UPLOAD_EXTENSIONS, ExamIngestor
+
+EXPORT_FORMATS = ('xlsx', 'csv', 'parquet')
+
+def iter_sources(sources):
+    """Rutas de los archivos a evaluar: los indicados y los de cada carpeta, ordenados por nombre"""
+    for source in sources:
+        if not os.path.isdir(source):
+            yield source
+            continue
+        for filename in sorted(os.listdir(source)):
+            path = os.path.join(source, filename)
+            if filename.lower().endswith(UPLOAD_EXTENSIONS) and os.path.isfile(path):
+                yield path
+
+def load_exams(sources, ingestor):
+    """files_data de las imágenes, ZIP y PDF indicados; el contenido queda en disco y se lee al enviarlo"""
+    return [file_data for path in iter_sources(sources) for file_data in ingestor.iter_exams(path, path)]
+
+def log(message):
+    print(message, file=sys.stderr)
+
+def grade(args):
+    ingestor = ExamIngestor()
+    try:
+        return grade_exams(args, ingestor)
+    finally:
+        ingestor.cleanup()
+
+def grade_exams(args, ingestor):
+    started = time.perf_counter()
+    files_data = load_exams(args.sources, ingestor)
+    for skipped in ingestor.skipped:
+        log(f"[omitido] {skipped['filename']}: {skipped['error']}")
+    if not files_data:
+        log(f"No se encontraron exámenes ({', '.join(UPLOAD_EXTENSIONS)}) en {', '.join(args.sources)}")
+        return 2
+    
+    if args.validate:
+        from .validate import PreflightValidator
+        report = PreflightValidator().validate(files_data)
+        for issue in report['issues']:
+            marker = "descartado" if issue['severity'] == 'error' else "aviso"
+            log(f"[{marker}] {issue['filename']}: {issue['message']}")
+        rejected = set(report['rejected'])
+        files_data = [file_data for index, file_data in enumerate(files_data) if index not in rejected]
+        if not files_data:
+            log("Ningún archivo pasó la revisión previa")
+            return 2
+    
+    if args.optimize:
+        from .preprocess import ImagePreprocessor
+        preprocessor = ImagePreprocessor(max_dimension=args.max_dimension)
+        files_data, report = preprocessor.preprocess_batch(files_data, spool_dir=ingestor.spool_dir)
+        log(f"Imágenes optimizadas: {report['original_bytes'] / 1024 / 1024:.1f} MB → "
+            f"{report['processed_bytes'] / 1024 / 1024:.1f} MB")
+    
+    from .metrics import NULL_TIMER, MetricsRegistry, configure_logging, timing_rows
+    registry = None
+    if args.timings or args.metrics_file:
+        registry = MetricsRegistry()
+        if args.timings:
+            configure_logging(stream=sys.stderr)
+    timer = registry.timer(batch=args.batch, exam_type=args.exam_type) if registry else NULL_TIMER
+    
+    from .client import RetryPolicy
+    from .scanner import BatchExamScanner
+    cache = None
+    if args.cache:
+        from .cache import EvaluationCache
+        cache = EvaluationCache()
+    scanner = BatchExamScanner(
+        chunk_size=args.chunk_size,
+        max_concurrency=args.concurrency,
+        transport=args.transport,
+        cache=cache,
+        response_mode='ndjson' if args.ndjson else 'json',
+        webhook_url=args.webhook_url,
+        metrics=registry,
+        retry=RetryPolicy(max_attempts=args.max_attempts)
+    )
+    
+    total = len(files_data)
+    completed = []
+    def on_result(result_item):
+        completed.append(result_item)
+        if args.verbose:
+            status = "ok" if result_item.get('success') else result_item.get('error', 'error')
+            log(f"[{len(completed)}/{total}] {result_item.get('filename') or result_item.get('student_id')}: {status}")
+    
+    log(f"Enviando {total} exámenes de '{args.batch}' ({args.exam_type})...")
+    result = scanner.process_batch(files_data, args.batch, args.exam_type, on_result=on_result)
+    del files_data
+    if not result['success']:
+        log(f"Error al procesar lote: {result['error']}")
+        return 1
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as json_file:
+            json.dump(result['data'], json_file, ensure_ascii=False)
+    
+    from .models import ResultSet
+    from .stats import BatchStatistics
+    with timer.stage('stats'):
+        result_set = ResultSet.from_payload(result['data'])
+        stats = BatchStatistics(result_set)
+    print(f"Evaluados: {stats.count} · Errores: {len(result_set.failures)} · "
+          f"Aprobados: {stats.approved} · Desaprobados: {stats.failed} · Promedio: {stats.mean:.1f}%")
+    
+    if args.out and result_set.records:
+        from .report import PDFReportGenerator
+        generator = PDFReportGenerator(compress=args.compress)
+        with timer.stage('pdf_render'):
+            pdf = generator.generate_pdf_report(result_set, args.batch, args.exam_type)
+        with timer.stage('pdf_write'), open(args.out, 'wb') as report_file:
+            generator.write_pdf(pdf, report_file)
+        log(f"Reporte PDF: {args.out}")
+    
+    if args.student_pdfs and result_set.records:
+        from .report import PDFReportGenerator
+        generator = PDFReportGenerator(compress=args.compress)
+        with timer.stage('student_bundle'), open(args.student_pdfs, 'wb') as bundle_file:
+            count = generator.write_student_bundle(result_set, args.batch, args.exam_type, bundle_file)
+        log(f"PDF por estudiante: {args.student_pdfs} ({count} archivos)")
+    
+    for path in args.export:
+        from .export import ResultExporter
+        export_format = os.path.splitext(path)[1].lstrip('.').lower()
+        exporter = ResultExporter(args.batch, args.exam_type)
+        with timer.stage(f"export_{export_format}"):
+            exporter.write(export_format, result_set, stats, path)
+        log(f"Exportado: {path}")
+        if export_format != 'xlsx':
+            log(f"Resumen y ranking: {', '.join(exporter.companion_paths(path))}")
+    
+    if args.timings:
+        for label, seconds, count in timing_rows(result.get('timings'), timer.summary()):
+            log(f"  {label:<32} {seconds:9.3f} s  ({count}x)")
+    if args.metrics_file:
+        registry.write(args.metrics_file)
+        log(f"Métricas: {args.metrics_file}")
+    log(f"Tiempo total: {time.perf_counter() - started:.1f} s")
+    return 0
+
+def export_path(value):
+    export_format = os.path.splitext(value)[1].lstrip('.').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise argparse.ArgumentTypeError(f"la extensión debe ser una de: {', '.join(EXPORT_FORMATS)}")
+    return value
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="eduscan", description="EduScan Pro - evaluación de exámenes por lotes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    grade_parser = subparsers.add_parser("grade", help="Evalúa todas las imágenes de una carpeta, un ZIP o un PDF")
+    grade_parser.add_argument("sources", nargs="+", metavar="RUTA",
+                              help="Carpetas, imágenes (.png, .jpg), ZIP con imágenes o PDF con una hoja por página")
+    grade_parser.add_argument("--batch", required=True, help="Nombre del lote")
+    grade_parser.add_argument("--exam-type", required=True, help="Tipo de examen")
+    grade_parser.add_argument("--out", help="Ruta del reporte PDF")
+    grade_parser.add_argument("--student-pdfs", metavar="RUTA",
+                              help="ZIP con un PDF por estudiante (en paralelo, escrito a medida que se generan)")
+    grade_parser.add_argument("--export", action="append", default=[], type=export_path, metavar="RUTA",
+                              help="Exporta los resultados (.xlsx, .csv o .parquet; en CSV y Parquet el resumen y el "
+                                   "ranking van en RUTA_resumen y RUTA_ranking); se puede repetir")
+    grade_parser.add_argument("--json", metavar="RUTA", help="Guarda la respuesta del webhook en JSON")
+    grade_parser.add_argument("--webhook-url", help="URL del webhook (por defecto, EDUSCAN_WEBHOOK_URL)")
+    grade_parser.add_argument("--chunk-size", type=int, help="Exámenes por bloque (por defecto, un solo request)")
+    grade_parser.add_argument("--concurrency", type=int, default=4,
+                              help="Máximo de bloques simultáneos (se reduce solo ante 429 o latencia alta)")
+    grade_parser.add_argument("--max-attempts", type=int, default=4,
+                              help="Intentos por request ante errores transitorios (429, 5xx, conexión)")
+    grade_parser.add_argument("--transport", choices=["json", "multipart"], default="json")
+    grade_parser.add_argument("--ndjson", action="store_true", help="Recibe los resultados en streaming (NDJSON)")
+    grade_parser.add_argument("--no-cache", dest="cache", action="store_false",
+                              help="No reutiliza evaluaciones previas")
+    grade_parser.add_argument("--no-validate", dest="validate", action="store_false",
+                              help="Envía también archivos ilegibles, en blanco o duplicados")
+    grade_parser.add_argument("--no-optimize", dest="optimize", action="store_false",
+                              help="Envía las imágenes sin normalizar")
+    grade_parser.add_argument("--max-dimension", type=int, default=1600, help="Dimensión máxima de las imágenes (px)")
+    grade_parser.add_argument("--no-compress", dest="compress", action="store_false",
+                              help="No comprime las páginas del PDF")
+    grade_parser.add_argument("--timings", action="store_true",
+                              help="Muestra el tiempo de cada etapa y escribe el log de etapas en stderr")
+    grade_parser.add_argument("--metrics-file", metavar="RUTA", help="Escribe las métricas en formato Prometheus")
+    grade_parser.add_argument("-v", "--verbose", action="store_true", help="Muestra cada examen evaluado")
+    grade_parser.set_defaults(handler=grade)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
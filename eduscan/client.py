@@ -0,0 +1,204 @@
+"""Cliente HTTP del webhook: conexiones persistentes, reintentos y concurrencia adaptativa
+
+Todas las peticiones de un BatchExamScanner comparten una requests.Session
+(keep-alive) y un AdaptiveLimiter que ajusta cuántas peticiones hay en
+vuelo: suma uno por ventana mientras la latencia por examen se mantiene
+cerca de la mejor observada y reduce a la mitad ante un 429/503, un
+timeout o una latencia disparada.
+"""
+import contextlib
+import email.utils
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import NULL_TIMER
+
+# Respuestas que indican un fallo transitorio y justifican reintentar
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Respuestas con las que el webhook pide explícitamente bajar el ritmo
+THROTTLE_STATUSES = frozenset({429, 503})
+
+class WebhookError(Exception):
+    """Respuesta no exitosa del webhook de evaluación"""
+    
+    def __init__(self, message, status_code=None, retryable=False):
+        super().__init__(message)
+        self.status_code = status_code
+        # True si el fallo fue transitorio (se agotaron los reintentos) y otro envío podría funcionar
+        self.retryable = retryable
+
+def parse_retry_after(value):
+    """Segundos indicados por una cabecera Retry-After (número o fecha HTTP), o None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+class RetryPolicy:
+    """Reintentos con espera exponencial y jitter, o la que indique Retry-After si el webhook la envía"""
+    
+    def __init__(self, max_attempts=4, backoff=0.5, max_backoff=30.0, max_wait=120.0, jitter=0.25,
+                 statuses=RETRY_STATUSES):
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # Si el webhook pide esperar más que esto, no se reintenta
+        self.max_wait = max_wait
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+    
+    def retryable(self, status_code):
+        return status_code in self.statuses
+    
+    def delay(self, attempt, retry_after=None):
+        """Espera antes del intento attempt + 1"""
+        if retry_after is not None:
+            # El limitador ya redujo la concurrencia: no hace falta esperar más de lo pedido
+            return retry_after
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+class AdaptiveLimiter:
+    """Límite AIMD de peticiones simultáneas
+    
+    La latencia se mide por examen (units) para que bloques de distinto
+    tamaño sean comparables. Solo las peticiones iniciadas después de la
+    última reducción pueden volver a reducir el límite, así una ráfaga de
+    429 cuenta como una sola señal de congestión.
+    """
+    
+    def __init__(self, initial=4, minimum=1, maximum=16, decrease_ratio=0.5, latency_tolerance=2.0):
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.decrease_ratio = decrease_ratio
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.baseline = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+    
+    def acquire(self):
+        """Espera un hueco libre; devuelve el instante de inicio para release()"""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+    
+    def release(self, started, latency=None, congested=False):
+        """Libera el hueco y ajusta el límite con la latencia por examen o la señal de congestión"""
+        with self._condition:
+            self.in_flight -= 1
+            if congested:
+                self._decrease(started)
+            elif latency is not None:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    # La referencia sube despacio para no quedar anclada a un mínimo excepcional
+                    self.baseline += (latency - self.baseline) * 0.05
+                if latency > self.baseline * self.latency_tolerance:
+                    self._decrease(started)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+    
+    def _decrease(self, started):
+        if started < self._last_decrease:
+            return
+        self.limit = max(self.minimum, self.limit * self.decrease_ratio)
+        self._last_decrease = time.monotonic()
+    
+    def snapshot(self):
+        with self._condition:
+            return {'limit': int(self.limit), 'in_flight': self.in_flight, 'baseline': self.baseline}
+
+class WebhookClient:
+    """POST al webhook con sesión compartida, reintentos y límite adaptativo de concurrencia"""
+    
+    def __init__(self, url, retry=None, limiter=None, timeout=300, pool_size=16):
+        self.url = url
+        self.retry = retry or RetryPolicy()
+        self.limiter = limiter or AdaptiveLimiter()
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, self.limiter.maximum))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    @contextlib.contextmanager
+    def request(self, make_kwargs, units=1, stream=False, timer=NULL_TIMER, limiter=None):
+        """POST con reintentos; entrega la respuesta 200 y mantiene ocupado el hueco mientras se lee
+        
+        make_kwargs() devuelve data y headers nuevos en cada intento. Los
+        errores transitorios se reintentan antes de entregar la respuesta;
+        si se agotan, se lanza WebhookError con retryable=True. limiter
+        sustituye al limitador propio (p. ej. el hueco de un planificador);
+        el hueco se libera durante las esperas entre reintentos.
+        """
+        limiter = limiter or self.limiter
+        attempt = 0
+        while True:
+            attempt += 1
+            started = limiter.acquire()
+            request_start = time.perf_counter()
+            try:
+                with timer.stage('request'):
+                    response = self.session.post(self.url, timeout=self.timeout, stream=stream, **make_kwargs())
+            except (requests.ConnectionError, requests.Timeout) as e:
+                limiter.release(started, congested=True)
+                error = WebhookError(str(e), retryable=True)
+                retry_after = None
+            except Exception:
+                limiter.release(started)
+                raise
+            else:
+                if response.status_code == 200:
+                    break
+                retryable = self.retry.retryable(response.status_code)
+                congested = retryable or response.status_code in THROTTLE_STATUSES
+                limiter.release(started, congested=congested)
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                # Leer el cuerpo (breve) del error devuelve la conexión al pool en vez de cerrarla
+                response.content
+                response.close()
+                error = WebhookError(f"Error HTTP {response.status_code}", response.status_code, retryable)
+                if response.status_code in THROTTLE_STATUSES:
+                    timer.count('throttled')
+            
+            if not error.retryable or attempt >= self.retry.max_attempts:
+                raise error
+            delay = self.retry.delay(attempt, retry_after)
+            if delay > self.retry.max_wait:
+                raise error
+            timer.count('retries')
+            with timer.stage('retry_wait'):
+                time.sleep(delay)
+        
+        try:
+            with response:
+                yield response
+        except Exception:
+            # Conexión cortada o cuerpo ilegible a mitad de la lectura
+            limiter.release(started, congested=True)
+            raise
+        except BaseException:
+            # El consumidor cerró el generador antes de tiempo: no es una señal de carga
+            limiter.release(started)
+            raise
+        limiter.release(started, latency=(time.perf_counter() - request_start) / max(1, units))
+    
+    def close(self):
+        self.session.close()
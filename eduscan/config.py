@@ -0,0 +1,17 @@
+"""Configuración compartida del paquete"""
+import os
+
+# Directorio local para cachés y datos persistentes
+DATA_DIR = os.environ.get("EDUSCAN_DATA_DIR", ".eduscan")
+
+# Webhook de evaluación (se puede apuntar a un servidor local para pruebas)
+WEBHOOK_URL = os.environ.get("EDUSCAN_WEBHOOK_URL", "https://kitsu-test.app.n8n.cloud/webhook-test/upload-exam")
+
+# Requests simultáneos al webhook entre todas las sesiones del servidor (planificador compartido)
+WEBHOOK_CONCURRENCY = int(os.environ.get("EDUSCAN_WEBHOOK_CONCURRENCY", "8"))
+# Lotes de hasta este número de exámenes tienen prioridad en la cola compartida
+SMALL_BATCH = int(os.environ.get("EDUSCAN_SMALL_BATCH", "50"))
+
+# Instrumentación: métricas en formato de texto de Prometheus y log de etapas en JSON
+METRICS_FILE = os.environ.get("EDUSCAN_METRICS_FILE", os.path.join(DATA_DIR, "metrics.prom"))
+METRICS_LOG = os.environ.get("EDUSCAN_METRICS_LOG", os.path.join(DATA_DIR, "eduscan.log"))
@@ -0,0 +1,187 @@
+"""Exportación de resultados a XLSX, CSV y Parquet"""
+import csv
+import os
+import tempfile
+import zipfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+
+class ResultExporter:
+    """Exporta los resultados del lote a XLSX, CSV y Parquet escribiendo fila a fila
+    
+    XLSX guarda Resumen, Ranking y Detalle como hojas de un libro; CSV y
+    Parquet escriben el detalle en la ruta pedida y el resumen y el ranking
+    en archivos hermanos (<nombre>_resumen y <nombre>_ranking).
+    """
+    
+    SUMMARY_HEADERS = ["Métrica", "Valor"]
+    RANKING_HEADERS = ["Posición", "Código", "Estudiante", "Nota", "Estado", "Correctas", "Incorrectas"]
+    DETAIL_HEADERS = ["student_id", "student_name", "score_percentage", "passing_status",
+                      "question_number", "selected_option", "correct_option", "is_correct", "explanation"]
+    DETAIL_SCHEMA = pa.schema([
+        ("student_id", pa.string()),
+        ("student_name", pa.string()),
+        ("score_percentage", pa.float64()),
+        ("passing_status", pa.string()),
+        ("question_number", pa.string()),
+        ("selected_option", pa.string()),
+        ("correct_option", pa.string()),
+        ("is_correct", pa.bool_()),
+        ("explanation", pa.string())
+    ])
+    SUMMARY_SCHEMA = pa.schema([("Métrica", pa.string()), ("Valor", pa.string())])
+    RANKING_SCHEMA = pa.schema([
+        ("Posición", pa.int64()),
+        ("Código", pa.string()),
+        ("Estudiante", pa.string()),
+        ("Nota", pa.float64()),
+        ("Estado", pa.string()),
+        ("Correctas", pa.int64()),
+        ("Incorrectas", pa.int64())
+    ])
+    
+    def __init__(self, batch_name, exam_type, row_group_size=10000):
+        self.batch_name = batch_name
+        self.exam_type = exam_type
+        self.row_group_size = row_group_size
+    
+    def summary_rows(self, stats):
+        rows = [
+            ("Lote", self.batch_name),
+            ("Tipo de examen", self.exam_type),
+            ("Estudiantes evaluados", stats.count),
+            ("Promedio", round(stats.mean, 2)),
+            ("Desviación estándar", round(stats.std, 2)),
+            ("Nota máxima", stats.max),
+            ("Nota mínima", stats.min),
+            ("Aprobados", stats.approved),
+            ("Desaprobados", stats.failed)
+        ]
+        rows.extend((f"Percentil {p}", round(value, 2)) for p, value in stats.percentiles.items())
+        rows.extend((f"Rango {bucket['label']}", bucket['count']) for bucket in stats.distribution)
+        return rows
+    
+    def iter_ranking_rows(self, stats):
+        for position, student in enumerate(stats.ranking, start=1):
+            yield (position, str(student.student_id), student.student_name, student.score,
+                   student.passing_status, student.correct_answers, student.incorrect_answers)
+    
+    def iter_detail_rows(self, result_set):
+        """Una fila por estudiante y pregunta"""
+        for student in result_set:
+            for detail in student.details:
+                yield (str(student.student_id), student.student_name, student.score, student.passing_status,
+                       str(detail.question_number), str(detail.selected_option), str(detail.correct_option),
+                       detail.is_correct, detail.explanation)
+    
+    def write_xlsx(self, result_set, stats, path):
+        """Libro con hojas Resumen, Ranking y Detalle en modo constant_memory"""
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        header_format = workbook.add_format({'bold': True, 'bg_color': '#ECF0F1'})
+        
+        for sheet_name, headers, rows in (
+            ("Resumen", self.SUMMARY_HEADERS, self.summary_rows(stats)),
+            ("Ranking", self.RANKING_HEADERS, self.iter_ranking_rows(stats)),
+            ("Detalle", self.DETAIL_HEADERS, self.iter_detail_rows(result_set))
+        ):
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, headers, header_format)
+            # En modo constant_memory cada fila se vuelca a disco al pasar a la siguiente
+            for row_number, row in enumerate(rows, start=1):
+                worksheet.write_row(row_number, 0, row)
+        
+        workbook.close()
+        return path
+    
+    @staticmethod
+    def companion_paths(path):
+        """Rutas del resumen y del ranking que acompañan al detalle en CSV y Parquet"""
+        stem, extension = os.path.splitext(path)
+        return f"{stem}_resumen{extension}", f"{stem}_ranking{extension}"
+    
+    def write_csv(self, result_set, stats, path):
+        """CSV del detalle (estudiante × pregunta), con el resumen y el ranking en archivos hermanos"""
+        summary_path, ranking_path = self.companion_paths(path)
+        for table_path, headers, rows in (
+            (summary_path, self.SUMMARY_HEADERS, self.summary_rows(stats)),
+            (ranking_path, self.RANKING_HEADERS, self.iter_ranking_rows(stats)),
+            (path, self.DETAIL_HEADERS, self.iter_detail_rows(result_set))
+        ):
+            with open(table_path, 'w', newline='', encoding='utf-8-sig') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(headers)
+                writer.writerows(rows)
+        return path
+    
+    def write_parquet(self, result_set, stats, path):
+        """Parquet del detalle, escrito en grupos de filas acotados, con el resumen y el ranking en archivos hermanos"""
+        summary_path, ranking_path = self.companion_paths(path)
+        summary = [(metric, str(value)) for metric, value in self.summary_rows(stats)]
+        pq.write_table(pa.Table.from_batches([self._record_batch(summary, self.SUMMARY_SCHEMA)]), summary_path)
+        ranking = [
+            (position, student_id, name, score, status, self._as_int(correct), self._as_int(incorrect))
+            for position, student_id, name, score, status, correct, incorrect in self.iter_ranking_rows(stats)
+        ]
+        pq.write_table(pa.Table.from_batches([self._record_batch(ranking, self.RANKING_SCHEMA)]), ranking_path)
+        
+        with pq.ParquetWriter(path, self.DETAIL_SCHEMA) as writer:
+            batch = []
+            for row in self.iter_detail_rows(result_set):
+                batch.append(row)
+                if len(batch) >= self.row_group_size:
+                    writer.write_batch(self._record_batch(batch))
+                    batch = []
+            if batch:
+                writer.write_batch(self._record_batch(batch))
+        return path
+    
+    def _record_batch(self, rows, schema=None):
+        schema = schema or self.DETAIL_SCHEMA
+        columns = list(zip(*rows)) or [()] * len(schema)
+        return pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        )
+    
+    @staticmethod
+    def _as_int(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    
+    def write(self, export_format, result_set, stats, path):
+        """Escribe el formato pedido ('xlsx', 'csv' o 'parquet') en path"""
+        if export_format == 'xlsx':
+            return self.write_xlsx(result_set, stats, path)
+        if export_format == 'csv':
+            return self.write_csv(result_set, stats, path)
+        if export_format == 'parquet':
+            return self.write_parquet(result_set, stats, path)
+        raise ValueError(f"Formato de exportación no soportado: {export_format}")
+    
+    def export(self, export_format, result_set, stats, directory=None):
+        """Escribe el formato pedido en un archivo temporal y devuelve su ruta
+        
+        CSV y Parquet se entregan como un ZIP con detalle, resumen y ranking
+        para poder descargarlos en un solo archivo.
+        """
+        suffix = ".xlsx" if export_format == 'xlsx' else f"_{export_format}.zip"
+        with tempfile.NamedTemporaryFile(prefix="eduscan_", suffix=suffix, dir=directory, delete=False) as tmp:
+            path = tmp.name
+        try:
+            if export_format == 'xlsx':
+                return self.write(export_format, result_set, stats, path)
+            with tempfile.TemporaryDirectory(prefix="eduscan_export_", dir=directory) as tables_dir:
+                detail_path = self.write(export_format, result_set, stats,
+                                         os.path.join(tables_dir, f"detalle.{export_format}"))
+                summary_path, ranking_path = self.companion_paths(detail_path)
+                with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+                    for table_path, name in ((detail_path, "detalle"), (summary_path, "resumen"), (ranking_path, "ranking")):
+                        bundle.write(table_path, f"{name}.{export_format}")
+            return path
+        except Exception:
+            os.remove(path)
+            raise
@@ -0,0 +1,169 @@
+"""Expansión perezosa de archivos ZIP y PDF multipágina en exámenes individuales
+
+ExamIngestor.iter_exams() genera un examen a la vez: cada imagen de un ZIP
+se extrae por separado y cada página de un PDF se renderiza, se codifica
+en JPEG y se guarda en disco antes de pasar a la siguiente. Los files_data
+resultantes apuntan a archivos en disco (SpooledImage), así que la memoria
+queda acotada por una página y no por el tamaño del archivo.
+"""
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+from .models import student_id_for
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+ARCHIVE_EXTENSIONS = ('.zip', '.pdf')
+UPLOAD_EXTENSIONS = IMAGE_EXTENSIONS + ARCHIVE_EXTENSIONS
+
+class SpooledImage:
+    """Imagen en disco con la interfaz de BytesIO que usa el pipeline (read, seek, tell, getvalue)
+    
+    Abre el archivo en cada lectura en vez de mantenerlo abierto: un lote
+    de miles de páginas no agota los descriptores de archivo.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.size = os.path.getsize(path)
+        self.position = 0
+    
+    @classmethod
+    def create(cls, directory, data=None, source=None, suffix=""):
+        """Guarda data (bytes) o el contenido de source (archivo abierto) en un archivo nuevo de directory"""
+        fd, path = tempfile.mkstemp(dir=directory, suffix=suffix)
+        with os.fdopen(fd, 'wb') as spool_file:
+            if source is not None:
+                shutil.copyfileobj(source, spool_file, 1024 * 1024)
+            else:
+                spool_file.write(data)
+        return cls(path)
+    
+    def read(self, size=-1):
+        with open(self.path, 'rb') as spool_file:
+            spool_file.seek(self.position)
+            data = spool_file.read(size)
+        self.position += len(data)
+        return data
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+    
+    def tell(self):
+        return self.position
+    
+    def getvalue(self):
+        with open(self.path, 'rb') as spool_file:
+            return spool_file.read()
+
+class ExamIngestor:
+    """Convierte imágenes, ZIP y PDF en files_data, un examen a la vez"""
+    
+    def __init__(self, spool_dir=None, dpi=150, quality=85, max_entry_bytes=50 * 1024 * 1024, reopen_every=25):
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix="eduscan_ingest_")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.dpi = dpi
+        self.quality = quality
+        self.max_entry_bytes = max_entry_bytes
+        self.reopen_every = max(1, int(reopen_every))
+        # Archivos o entradas que no se pudieron expandir: [{'filename', 'error'}]
+        self.skipped = []
+    
+    def iter_exams(self, source, name):
+        """files_data de un archivo subido o una ruta: la imagen misma, cada imagen del ZIP o cada página del PDF"""
+        extension = os.path.splitext(name)[1].lower()
+        if extension == '.zip':
+            yield from self.iter_zip(source, name)
+        elif extension == '.pdf':
+            yield from self.iter_pdf(source, name)
+        elif extension in IMAGE_EXTENSIONS:
+            if isinstance(source, (str, os.PathLike)):
+                try:
+                    source = SpooledImage(source)
+                except OSError as e:
+                    self.skipped.append({'filename': name, 'error': str(e)})
+                    return
+            yield {'file': source, 'student_id': student_id_for(name), 'filename': os.path.basename(name)}
+        else:
+            self.skipped.append({'filename': name, 'error': "tipo de archivo no admitido"})
+    
+    def iter_zip(self, source, name):
+        """Imágenes del ZIP (también en subcarpetas) en orden de nombre; student_id = nombre de la entrada"""
+        try:
+            archive = zipfile.ZipFile(source)
+        except (zipfile.BadZipFile, OSError) as e:
+            self.skipped.append({'filename': name, 'error': f"ZIP inválido: {e}"})
+            return
+        with archive:
+            entries = sorted(
+                (info for info in archive.infolist()
+                 if not info.is_dir()
+                 and not os.path.basename(info.filename).startswith('.')
+                 and '__MACOSX/' not in info.filename
+                 and info.filename.lower().endswith(IMAGE_EXTENSIONS)),
+                key=lambda info: info.filename
+            )
+            for info in entries:
+                entry_name = f"{name}/{info.filename}"
+                if info.file_size > self.max_entry_bytes:
+                    self.skipped.append({'filename': entry_name,
+                                         'error': f"entrada demasiado grande ({info.file_size / 1024 / 1024:.0f} MB)"})
+                    continue
+                try:
+                    with archive.open(info) as entry:
+                        spooled = SpooledImage.create(self.spool_dir, source=entry,
+                                                      suffix=os.path.splitext(info.filename)[1].lower())
+                except (zipfile.BadZipFile, OSError, RuntimeError) as e:
+                    # Entrada dañada o cifrada: se omite y se sigue con las demás
+                    self.skipped.append({'filename': entry_name, 'error': str(e)})
+                    continue
+                filename = os.path.basename(info.filename)
+                yield {'file': spooled, 'student_id': student_id_for(filename), 'filename': filename}
+    
+    def iter_pdf(self, source, name):
+        """Cada página del PDF como JPEG en escala de grises; student_id = nombre del PDF y número de página
+        
+        PDFium conserva en caché los objetos de cada página cargada hasta
+        cerrar el documento: se reabre cada reopen_every páginas para que la
+        memoria no crezca con el número de páginas.
+        """
+        import pypdfium2 as pdfium
+        
+        try:
+            document = pdfium.PdfDocument(source)
+        except pdfium.PdfiumError as e:
+            self.skipped.append({'filename': name, 'error': f"PDF inválido: {e}"})
+            return
+        stem = student_id_for(name)
+        try:
+            page_count = len(document)
+            for index in range(page_count):
+                if index and index % self.reopen_every == 0:
+                    document.close()
+                    document = pdfium.PdfDocument(source)
+                page = document[index]
+                try:
+                    image = page.render(scale=self.dpi / 72, grayscale=True).to_pil()
+                finally:
+                    page.close()
+                output = io.BytesIO()
+                image.save(output, format='JPEG', quality=self.quality)
+                del image
+                student_id = f"{stem}_p{index + 1:03d}"
+                yield {
+                    'file': SpooledImage.create(self.spool_dir, output.getvalue(), suffix=".jpg"),
+                    'student_id': student_id,
+                    'filename': f"{student_id}.jpg",
+                    'mime_type': 'image/jpeg'
+                }
+        finally:
+            document.close()
+    
+    def cleanup(self):
+        """Borra las páginas e imágenes extraídas"""
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
@@ -0,0 +1,125 @@
+"""Análisis de ítems (dificultad, discriminación y fiabilidad) del lote"""
+import numpy as np
+
+class ItemAnalysis:
+    """Análisis de ítems del lote sobre una matriz estudiantes × preguntas"""
+    
+    # Fracción de estudiantes en los grupos superior e inferior del índice de discriminación
+    GROUP_FRACTION = 0.27
+    
+    def __init__(self, result_set):
+        records = result_set.records
+        
+        # Aplanar (fila, pregunta, acierto, opción) una sola vez
+        rows, question_labels, correct_flags, selected, correct_options = [], [], [], [], []
+        for row, student in enumerate(records):
+            for detail in student.details:
+                rows.append(row)
+                question_labels.append(str(detail.question_number))
+                correct_flags.append(detail.is_correct)
+                selected.append(str(detail.selected_option))
+                correct_options.append(str(detail.correct_option))
+        
+        self.n_students = len(records)
+        questions, columns = np.unique(np.array(question_labels, dtype=str), return_inverse=True)
+        # Orden natural de preguntas (2 antes que 10)
+        natural_order = sorted(range(len(questions)), key=lambda i: self._question_sort_key(questions[i]))
+        rank = np.empty(len(questions), dtype=int)
+        rank[natural_order] = np.arange(len(questions))
+        self.questions = questions[natural_order].tolist()
+        columns = rank[columns]
+        rows = np.asarray(rows, dtype=int)
+        self.n_questions = len(self.questions)
+        
+        # Una pregunta repetida en el detalle de un estudiante cuenta una sola vez (la última entrada)
+        cells = rows * self.n_questions + columns
+        _, last_reversed = np.unique(cells[::-1], return_index=True)
+        keep = np.sort(len(cells) - 1 - last_reversed)
+        rows, columns = rows[keep], columns[keep]
+        correct_flags = np.asarray(correct_flags, dtype=float)[keep]
+        selected = np.array(selected, dtype=str)[keep]
+        correct_options = np.array(correct_options, dtype=str)[keep]
+        
+        self.matrix = np.full((self.n_students, self.n_questions), np.nan)
+        self.matrix[rows, columns] = correct_flags
+        answered = ~np.isnan(self.matrix)
+        scores = np.nan_to_num(self.matrix)
+        self.answered = answered.sum(axis=0)
+        
+        # Dificultad: proporción de aciertos por pregunta
+        self.difficulty = self._column_mean(scores, answered)
+        
+        # Discriminación: grupo superior menos grupo inferior (27%) según el puntaje total
+        totals = scores.sum(axis=1)
+        group_size = max(1, int(round(self.n_students * self.GROUP_FRACTION))) if self.n_students else 0
+        order = np.argsort(totals, kind='stable')
+        lower, upper = order[:group_size], order[len(order) - group_size:]
+        self.discrimination = (
+            self._column_mean(scores[upper], answered[upper]) - self._column_mean(scores[lower], answered[lower])
+        )
+        
+        # Frecuencia de cada opción por pregunta (distractores)
+        self.options, option_codes = np.unique(selected, return_inverse=True)
+        counts = np.bincount(
+            columns * len(self.options) + option_codes,
+            minlength=self.n_questions * len(self.options)
+        ).reshape(self.n_questions, len(self.options))
+        self.option_frequency = np.divide(
+            counts, self.answered[:, None], out=np.zeros(counts.shape), where=self.answered[:, None] > 0
+        )
+        
+        # Respuesta correcta más frecuente en el detalle de cada pregunta
+        key_values, key_codes = np.unique(correct_options, return_inverse=True)
+        key_counts = np.zeros((self.n_questions, max(len(key_values), 1)), dtype=int)
+        np.add.at(key_counts, (columns, key_codes), 1)
+        self.answer_key = [key_values[i] if len(key_values) else 'N/A' for i in key_counts.argmax(axis=1)]
+        
+        # Fiabilidad (las preguntas sin respuesta cuentan como incorrectas)
+        self.kr20 = self._kr20(scores)
+        self.cronbach_alpha = self._cronbach_alpha(scores)
+    
+    @staticmethod
+    def _question_sort_key(question):
+        return (0, int(question), question) if question.isdigit() else (1, 0, question)
+    
+    @staticmethod
+    def _column_mean(values, mask):
+        counts = mask.sum(axis=0)
+        return np.divide(values.sum(axis=0), counts, out=np.full(values.shape[1], np.nan), where=counts > 0)
+    
+    def _kr20(self, scores):
+        k = self.n_questions
+        if k < 2 or self.n_students < 2:
+            return float('nan')
+        total_variance = scores.sum(axis=1).var()
+        if total_variance == 0:
+            return float('nan')
+        p = scores.mean(axis=0)
+        return float(k / (k - 1) * (1 - (p * (1 - p)).sum() / total_variance))
+    
+    def _cronbach_alpha(self, scores):
+        k = self.n_questions
+        if k < 2 or self.n_students < 2:
+            return float('nan')
+        total_variance = scores.sum(axis=1).var(ddof=1)
+        if total_variance == 0:
+            return float('nan')
+        return float(k / (k - 1) * (1 - scores.var(axis=0, ddof=1).sum() / total_variance))
+    
+    def to_dataframe(self):
+        """Tabla por pregunta: dificultad, discriminación y frecuencia de cada opción (%)"""
+        import pandas as pd
+        table = pd.DataFrame({
+            'Pregunta': self.questions,
+            'Correcta': self.answer_key,
+            'Respuestas': self.answered,
+            'Dificultad': np.round(self.difficulty, 3),
+            'Discriminación': np.round(self.discrimination, 3)
+        })
+        for index, option in enumerate(self.options):
+            table[f"% {option}"] = np.round(self.option_frequency[:, index] * 100, 1)
+        return table
+    
+    @staticmethod
+    def format_coefficient(value):
+        return "N/A" if np.isnan(value) else f"{value:.3f}"
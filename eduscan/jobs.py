@@ -0,0 +1,238 @@
+"""Diario de trabajos para reanudar lotes interrumpidos"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from .config import DATA_DIR
+
+class JobJournal:
+    """Diario de trabajos en SQLite para reanudar lotes interrumpidos"""
+    
+    def __init__(self, path=None, spool_dir=None):
+        self.path = path or os.path.join(DATA_DIR, "jobs.db")
+        self.spool_dir = spool_dir or os.path.join(DATA_DIR, "jobs")
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    batch_name TEXT NOT NULL,
+                    exam_type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    total_exams INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_exams (
+                    job_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    student_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    mime_type TEXT,
+                    spool_path TEXT,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    PRIMARY KEY (job_id, position)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_job_exams_status ON job_exams (job_id, status, student_id)")
+    
+    @contextlib.contextmanager
+    def _connect(self):
+        """Conexión que confirma (o deshace) la transacción y se cierra al salir del bloque with"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def create_job(self, batch_name, exam_type, files_data):
+        """Registra un lote nuevo y guarda sus imágenes para poder reanudarlo"""
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        now = time.time()
+        rows = []
+        
+        for position, file_data in enumerate(files_data):
+            spool_path = os.path.join(job_dir, f"{position:05d}")
+            buffer = file_data['file']
+            buffer.seek(0)
+            with open(spool_path, 'wb') as spool_file:
+                shutil.copyfileobj(buffer, spool_file)
+            buffer.seek(0)
+            rows.append((job_id, position, file_data['student_id'], file_data['filename'],
+                         file_data.get('mime_type'), spool_path, 'pending'))
+        
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, batch_name, exam_type, status, total_exams, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'running', ?, ?, ?)",
+                (job_id, batch_name, exam_type, len(rows), now, now)
+            )
+            conn.executemany(
+                "INSERT INTO job_exams (job_id, position, student_id, filename, mime_type, spool_path, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return job_id
+    
+    def record_result(self, job_id, result_item):
+        """Guarda el resultado de un examen en cuanto llega"""
+        status = 'done' if result_item.get('success') else 'failed'
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT position, spool_path FROM job_exams WHERE job_id = ? AND student_id = ? AND status != 'done' "
+                "ORDER BY status = 'failed', position LIMIT 1",
+                (job_id, str(result_item.get('student_id')))
+            ).fetchone()
+            if row is None:
+                return
+            conn.execute(
+                "UPDATE job_exams SET status = ?, result = ? WHERE job_id = ? AND position = ?",
+                (status, json.dumps(result_item), job_id, row['position'])
+            )
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+        
+        # Las imágenes ya evaluadas no se necesitan para reanudar
+        if status == 'done' and row['spool_path'] and os.path.exists(row['spool_path']):
+            os.remove(row['spool_path'])
+    
+    def finish_job(self, job_id):
+        """Marca el trabajo como completado o incompleto según sus exámenes"""
+        with self._lock, self._connect() as conn:
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM job_exams WHERE job_id = ? AND status != 'done'", (job_id,)
+            ).fetchone()[0]
+            status = 'completed' if remaining == 0 else 'incomplete'
+            conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?", (status, time.time(), job_id))
+        if status == 'completed':
+            shutil.rmtree(os.path.join(self.spool_dir, job_id), ignore_errors=True)
+        return status
+    
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def list_jobs(self, limit=20):
+        """Trabajos recientes con su progreso"""
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT j.*,
+                       SUM(e.status = 'done') AS done,
+                       SUM(e.status = 'failed') AS failed
+                FROM jobs j LEFT JOIN job_exams e ON e.job_id = j.job_id
+                GROUP BY j.job_id
+                ORDER BY j.created_at DESC
+                LIMIT ?
+            """, (limit,)).fetchall()
+        return [dict(row) for row in rows]
+    
+    def pending_files(self, job_id):
+        """Reconstruye files_data con los exámenes que faltan por evaluar"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM job_exams WHERE job_id = ? AND status != 'done' ORDER BY position", (job_id,)
+            ).fetchall()
+        
+        files_data = []
+        for row in rows:
+            if not row['spool_path'] or not os.path.exists(row['spool_path']):
+                continue
+            with open(row['spool_path'], 'rb') as spool_file:
+                buffer = io.BytesIO(spool_file.read())
+            file_data = {'file': buffer, 'student_id': row['student_id'], 'filename': row['filename']}
+            if row['mime_type']:
+                file_data['mime_type'] = row['mime_type']
+            files_data.append(file_data)
+        return files_data
+    
+    def job_results(self, job_id):
+        """Resultado del trabajo con la misma forma que process_batch"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT student_id, filename, status, result FROM job_exams WHERE job_id = ? ORDER BY position", (job_id,)
+            ).fetchall()
+        
+        results = []
+        for row in rows:
+            if row['result']:
+                results.append(json.loads(row['result']))
+            else:
+                results.append({
+                    'student_id': row['student_id'],
+                    'filename': row['filename'],
+                    'success': False,
+                    'error': "Pendiente de evaluación"
+                })
+        
+        successful = sum(1 for r in results if r.get('success'))
+        return {
+            'success': successful > 0,
+            'data': {
+                'batch_processing': {
+                    'total_exams': len(results),
+                    'successful': successful,
+                    'failed': len(results) - successful,
+                    'job_id': job_id
+                },
+                'results': results
+            },
+            'batch_size': len(results),
+            'error': "Ningún examen del trabajo fue evaluado"
+        }
+    
+    def reopen(self, job_id):
+        """Reclama el trabajo para reanudarlo y devuelve los files_data que faltan por evaluar
+        
+        El paso a 'running' es atómico: si otra sesión ya lo está procesando
+        devuelve None, así ningún examen se envía dos veces.
+        """
+        with self._lock, self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE job_id = ? AND status != 'running'",
+                (time.time(), job_id)
+            ).rowcount
+        if not claimed:
+            return None
+        pending = self.pending_files(job_id)
+        if not pending:
+            # Nada que reenviar: el trabajo vuelve a su estado final
+            self.finish_job(job_id)
+        return pending
+    
+    def release_interrupted(self):
+        """Marca como incompletos los trabajos que quedaron en curso al detenerse el proceso anterior"""
+        with self._lock, self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'incomplete', updated_at = ? WHERE status = 'running'", (time.time(),)
+            ).rowcount
+    
+    def resume(self, job_id, scanner, scheduler=None, flow=None):
+        """Reenvía solo los exámenes pendientes o fallidos de un trabajo (por el planificador compartido, si se indica)"""
+        job = self.get_job(job_id)
+        pending = self.reopen(job_id)
+        if pending:
+            scheduled = scheduler.job(len(pending), flow=flow, name=job['batch_name']) if scheduler else contextlib.nullcontext()
+            with scheduled as ticket:
+                scanner.process_batch(
+                    pending, job['batch_name'], job['exam_type'],
+                    on_result=lambda result_item: self.record_result(job_id, result_item),
+                    ticket=ticket
+                )
+            self.finish_job(job_id)
+        return self.job_results(job_id)
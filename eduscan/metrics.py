@@ -0,0 +1,310 @@
+"""Tiempos por etapa, contadores e histogramas exportables en formato Prometheus
+
+Con la instrumentación desactivada se usa NULL_TIMER, cuyos métodos no
+hacen nada: el coste en el camino caliente es una llamada vacía por etapa.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger("eduscan.metrics")
+
+# Límites superiores (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+METRIC_HELP = {
+    'eduscan_batches_total': ('counter', "Lotes enviados al webhook"),
+    'eduscan_exams_total': ('counter', "Exámenes procesados"),
+    'eduscan_exam_failures_total': ('counter', "Exámenes con error"),
+    'eduscan_cache_hits_total': ('counter', "Exámenes recuperados de la caché de evaluaciones"),
+    'eduscan_upload_bytes_total': ('counter', "Bytes de cuerpo enviados al webhook"),
+    'eduscan_retries_total': ('counter', "Reintentos de requests tras un fallo transitorio"),
+    'eduscan_throttled_total': ('counter', "Respuestas 429/503 del webhook"),
+    'eduscan_resubmitted_total': ('counter', "Exámenes reenviados porque su envío falló"),
+    'eduscan_stage_duration_seconds': ('histogram', "Duración de cada etapa del lote y del reporte"),
+    'eduscan_exam_processing_seconds': ('histogram', "Tiempo de evaluación por examen informado por el webhook"),
+}
+
+# Nombre legible de cada etapa, en el orden en que se muestran
+STAGE_LABELS = {
+    'cache_lookup': "Búsqueda en caché",
+    'queue': "Espera en la cola compartida",
+    'encode': "Codificación del cuerpo",
+    'request': "Envío y espera de la respuesta",
+    'retry_wait': "Espera entre reintentos",
+    'receive': "Recepción en streaming",
+    'parse': "Parseo de la respuesta",
+    'remote': "Evaluación remota (informada)",
+    'cache_store': "Guardado en caché",
+    'total': "Total del lote",
+    'exam_processing': "Evaluación por examen (suma)",
+    'stats': "Estadísticas",
+    'item_analysis': "Análisis de ítems",
+    'pdf_render': "Renderizado del PDF",
+    'pdf_write': "Escritura del PDF",
+    'student_bundle': "PDF por estudiante (ZIP)",
+    'export_xlsx': "Exportación Excel",
+    'export_csv': "Exportación CSV",
+    'export_parquet': "Exportación Parquet",
+}
+
+def timing_rows(*summaries):
+    """Filas (etapa, segundos, veces) de uno o más StageTimer.summary(), en el orden de STAGE_LABELS"""
+    stages = {}
+    for summary in summaries:
+        for name, totals in ((summary or {}).get('stages') or {}).items():
+            seconds, count = stages.get(name, (0.0, 0))
+            stages[name] = (seconds + totals['seconds'], count + totals['count'])
+    order = {name: index for index, name in enumerate(STAGE_LABELS)}
+    return [
+        (STAGE_LABELS.get(name, name), seconds, count)
+        for name, (seconds, count) in sorted(stages.items(), key=lambda item: order.get(item[0], len(order)))
+    ]
+
+def configure_logging(path=None, stream=None):
+    """Escribe las líneas JSON de eduscan.metrics en un archivo o stream (una sola vez por destino)"""
+    target = os.path.abspath(path) if path else stream
+    for handler in logger.handlers:
+        if getattr(handler, 'eduscan_target', None) == target:
+            return logger
+    if path:
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        handler = logging.FileHandler(target, encoding='utf-8')
+    else:
+        handler = logging.StreamHandler(stream)
+    handler.eduscan_target = target
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return logger
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+    
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Contadores e histogramas del proceso, compartidos por todos los lotes"""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+    
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+    
+    def timer(self, **context):
+        """Cronómetro de etapas para un lote; context se añade a cada línea de log"""
+        return StageTimer(self, **context)
+    
+    @staticmethod
+    def _labels(labels, **extra):
+        pairs = list(labels) + list(extra.items())
+        if not pairs:
+            return ""
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+    
+    def render(self):
+        """Métricas en el formato de texto de Prometheus"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count)) for key, h in self._histograms.items()
+            )
+        
+        lines = []
+        described = set()
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                metric_type, help_text = METRIC_HELP.get(name, ('untyped', name))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+        
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{self._labels(labels)} {value:g}")
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{self._labels(labels, le=f'{bound:g}')} {cumulative}")
+            lines.append(f"{name}_bucket{self._labels(labels, le='+Inf')} {count}")
+            lines.append(f"{name}_sum{self._labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{self._labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+    
+    def write(self, path):
+        """Escribe el archivo de métricas de forma atómica (para el textfile collector)"""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=directory, prefix=".metrics_", delete=False, encoding='utf-8') as tmp:
+            tmp.write(self.render())
+        os.replace(tmp.name, path)
+        return path
+
+class StageTimer:
+    """Acumula la duración de cada etapa de un lote y la publica en el registro"""
+    
+    enabled = True
+    
+    def __init__(self, registry, **context):
+        self.registry = registry
+        self.context = context
+        self.stages = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+    
+    def stage(self, name):
+        return _Stage(self, name)
+    
+    def add(self, name, seconds):
+        """Registra una duración medida (o informada por el webhook) para la etapa"""
+        with self._lock:
+            totals = self.stages.setdefault(name, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+        self.registry.observe('eduscan_stage_duration_seconds', seconds, stage=name)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({'ts': round(time.time(), 3), 'event': 'stage', 'stage': name,
+                                    'seconds': round(seconds, 6), **self.context}, ensure_ascii=False))
+    
+    def count(self, name, value=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+        self.registry.inc(f"eduscan_{name}_total", value)
+    
+    def body(self, body):
+        return TimedBody(body, self)
+    
+    def record_results(self, results):
+        """Cuenta exámenes y errores y guarda el tiempo por examen si el webhook lo informa"""
+        for result_item in results:
+            self.count('exams')
+            if not result_item.get('success'):
+                self.count('exam_failures')
+            elif result_item.get('cached'):
+                self.count('cache_hits')
+            seconds = result_item.get('processing_time', result_item.get('data', {}).get('processing_time'))
+            if isinstance(seconds, (int, float)):
+                self.registry.observe('eduscan_exam_processing_seconds', float(seconds))
+                with self._lock:
+                    totals = self.stages.setdefault('exam_processing', [0.0, 0])
+                    totals[0] += seconds
+                    totals[1] += 1
+    
+    def summary(self):
+        """{'stages': {etapa: {'seconds', 'count'}}, 'counts': {...}} de este lote"""
+        with self._lock:
+            return {
+                'stages': {name: {'seconds': seconds, 'count': count} for name, (seconds, count) in self.stages.items()},
+                'counts': dict(self.counts)
+            }
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'start')
+    
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+class TimedBody:
+    """Envuelve un cuerpo en streaming midiendo el tiempo de codificación y los bytes enviados"""
+    
+    def __init__(self, body, timer):
+        self.body = body
+        self.timer = timer
+    
+    def __len__(self):
+        return len(self.body)
+    
+    def __iter__(self):
+        iterator = iter(self.body)
+        elapsed = 0.0
+        sent = 0
+        while True:
+            start = time.perf_counter()
+            block = next(iterator, None)
+            elapsed += time.perf_counter() - start
+            if block is None:
+                break
+            sent += len(block)
+            yield block
+        self.timer.add('encode', elapsed)
+        self.timer.count('upload_bytes', sent)
+
+class NullTimer:
+    """Cronómetro desactivado: todas las operaciones son no-ops"""
+    
+    enabled = False
+    
+    def stage(self, name):
+        return _NULL_STAGE
+    
+    def add(self, name, seconds):
+        pass
+    
+    def count(self, name, value=1):
+        pass
+    
+    def body(self, body):
+        return body
+    
+    def record_results(self, results):
+        pass
+    
+    def summary(self):
+        return None
+
+class _NullStage:
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_STAGE = _NullStage()
+NULL_TIMER = NullTimer()
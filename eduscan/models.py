@@ -0,0 +1,114 @@
+"""Resultados del webhook parseados en registros compactos"""
+import os
+
+def student_id_for(filename):
+    """student_id a partir del nombre del archivo (sin la última extensión: 'ana.perez.jpg' -> 'ana.perez')"""
+    return os.path.splitext(os.path.basename(filename))[0]
+
+class QuestionResult:
+    """Respuesta de un estudiante a una pregunta"""
+    __slots__ = ('question_number', 'selected_option', 'correct_option', 'is_correct', 'explanation')
+    
+    def __init__(self, question_number, selected_option, correct_option, is_correct, explanation):
+        self.question_number = question_number
+        self.selected_option = selected_option
+        self.correct_option = correct_option
+        self.is_correct = is_correct
+        self.explanation = explanation
+    
+    @classmethod
+    def from_dict(cls, detail):
+        return cls(
+            detail.get('question_number', ''),
+            detail.get('selected_option', 'N/A'),
+            detail.get('correct_option', 'N/A'),
+            bool(detail.get('is_correct', False)),
+            detail.get('explanation', 'Sin explicación')
+        )
+
+class StudentResult:
+    """Resultado compacto de un examen evaluado"""
+    __slots__ = ('student_id', 'filename', 'student_name', 'exam_type', 'total_questions', 'score',
+                 'correct_answers', 'incorrect_answers', 'passing_status', 'details')
+    
+    def __init__(self, student_id, filename, student_name, exam_type, total_questions, score,
+                 correct_answers, incorrect_answers, passing_status, details):
+        self.student_id = student_id
+        self.filename = filename
+        self.student_name = student_name
+        self.exam_type = exam_type
+        self.total_questions = total_questions
+        self.score = score
+        self.correct_answers = correct_answers
+        self.incorrect_answers = incorrect_answers
+        self.passing_status = passing_status
+        self.details = details
+    
+    @property
+    def approved(self):
+        return self.passing_status == 'APROBADO'
+    
+    @classmethod
+    def from_result_item(cls, result_item):
+        data = result_item.get('data', {})
+        student_info = data.get('student_info', {})
+        evaluation = data.get('evaluation', {})
+        try:
+            score = float(evaluation.get('score_percentage', 0) or 0)
+        except (TypeError, ValueError):
+            score = 0.0
+        
+        return cls(
+            result_item.get('student_id'),
+            result_item.get('filename', ''),
+            student_info.get('student_name', result_item.get('student_id', 'Desconocido')),
+            student_info.get('exam_type', 'N/A'),
+            student_info.get('total_questions', 0),
+            score,
+            evaluation.get('correct_answers', 'N/A'),
+            evaluation.get('incorrect_answers', 0),
+            evaluation.get('passing_status', 'N/A'),
+            tuple(QuestionResult.from_dict(detail) for detail in data.get('detailed_results', []))
+        )
+
+class ResultSet:
+    """Resultados del lote parseados una sola vez e indexados por student_id"""
+    
+    def __init__(self, records, failures=None, batch_processing=None):
+        self.records = records
+        self.failures = failures or []
+        self.batch_processing = batch_processing or {}
+        self.index = {}
+        for record in records:
+            self.index.setdefault(record.student_id, record)
+    
+    @classmethod
+    def from_results(cls, results, batch_processing=None):
+        records = []
+        failures = []
+        for result_item in results:
+            if result_item.get('success'):
+                records.append(StudentResult.from_result_item(result_item))
+            else:
+                failures.append({
+                    'student_id': result_item.get('student_id'),
+                    'filename': result_item.get('filename', ''),
+                    'error': result_item.get('error', 'Error desconocido')
+                })
+        return cls(records, failures, batch_processing)
+    
+    @classmethod
+    def from_payload(cls, results_data):
+        """Parsea la respuesta del webhook ({'batch_processing', 'results'})"""
+        if isinstance(results_data, cls):
+            return results_data
+        return cls.from_results(results_data.get('results', []), results_data.get('batch_processing', {}))
+    
+    def get(self, student_id):
+        return self.index.get(student_id)
+    
+    def __len__(self):
+        return len(self.records)
+    
+    def __iter__(self):
+        return iter(self.records)
@@ -0,0 +1,133 @@
+"""Normalización de imágenes de exámenes antes de enviarlas al webhook"""
+import collections
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from .ingest import SpooledImage
+from .transport import buffer_size
+
+IMAGE_FORMATS = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp'
+}
+
+def normalize_exam_image(image_bytes, options):
+    """Normaliza una imagen de examen; se ejecuta en un proceso del pool"""
+    image = Image.open(io.BytesIO(image_bytes))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('L' if options['grayscale'] else 'RGB')
+    
+    if options['crop_margins']:
+        # Recortar márgenes claros alrededor de la hoja de respuestas
+        gray = image if image.mode == 'L' else image.convert('L')
+        content_mask = gray.point(lambda p: 255 if p < options['margin_threshold'] else 0)
+        bbox = content_mask.getbbox()
+        if bbox:
+            padding = options['margin_padding']
+            image = image.crop((
+                max(bbox[0] - padding, 0),
+                max(bbox[1] - padding, 0),
+                min(bbox[2] + padding, image.width),
+                min(bbox[3] + padding, image.height)
+            ))
+    
+    max_dimension = options['max_dimension']
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    
+    output = io.BytesIO()
+    image.save(output, format=options['output_format'], quality=options['quality'], optimize=True)
+    return output.getvalue()
+
+def bounded_submit(executor, function, arguments, window):
+    """Futures de function(*args) en orden, con como mucho window tareas pendientes a la vez
+    
+    A diferencia de executor.map, no lee todos los argumentos de antemano:
+    en un lote de miles de páginas en disco solo hay window imágenes en memoria.
+    """
+    pending = collections.deque()
+    for args in arguments:
+        pending.append(executor.submit(function, *args))
+        if len(pending) >= window:
+            future = pending.popleft()
+            future.exception()
+            yield future
+    while pending:
+        yield pending.popleft()
+
+class ImagePreprocessor:
+    """Reduce las imágenes a escala de grises y tamaño acotado antes de subirlas"""
+    
+    def __init__(self, max_dimension=1600, grayscale=True, crop_margins=True,
+                 output_format='JPEG', quality=80, max_workers=None):
+        if output_format not in IMAGE_FORMATS:
+            raise ValueError(f"Formato de imagen no soportado: {output_format}")
+        self.options = {
+            'max_dimension': int(max_dimension),
+            'grayscale': grayscale,
+            'crop_margins': crop_margins,
+            'margin_threshold': 200,
+            'margin_padding': 20,
+            'output_format': output_format,
+            'quality': int(quality)
+        }
+        self.max_workers = max_workers
+    
+    @property
+    def mime_type(self):
+        return IMAGE_FORMATS[self.options['output_format']]
+    
+    def preprocess_batch(self, files_data, spool_dir=None):
+        """Normaliza todas las imágenes en paralelo y devuelve (files_data, reporte)
+        
+        Con spool_dir, las imágenes que estaban en disco (SpooledImage) se
+        guardan normalizadas en ese directorio temporal; sin él, en memoria.
+        Nunca se escribe junto a los archivos de origen.
+        """
+        processed_files = []
+        failed = []
+        original_bytes = 0
+        processed_bytes = 0
+        
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            window = 2 * (self.max_workers or os.cpu_count() or 1)
+            futures = bounded_submit(executor, normalize_exam_image,
+                                     ((file_data['file'].getvalue(), self.options) for file_data in files_data), window)
+            
+            for file_data, future in zip(files_data, futures):
+                original_size = buffer_size(file_data['file'])
+                original_bytes += original_size
+                try:
+                    normalized = future.result()
+                except Exception as e:
+                    # Si la imagen no se puede procesar se envía tal cual
+                    failed.append({'filename': file_data['filename'], 'error': str(e)})
+                    processed_files.append(file_data)
+                    processed_bytes += original_size
+                    continue
+                
+                processed_bytes += len(normalized)
+                if spool_dir is not None and isinstance(file_data['file'], SpooledImage):
+                    # Las páginas expandidas de un ZIP o PDF siguen en disco tras normalizarlas
+                    normalized_file = SpooledImage.create(spool_dir, normalized)
+                else:
+                    normalized_file = io.BytesIO(normalized)
+                processed_files.append({
+                    **file_data,
+                    'file': normalized_file,
+                    'mime_type': self.mime_type
+                })
+        
+        bytes_saved = original_bytes - processed_bytes
+        report = {
+            'original_bytes': original_bytes,
+            'processed_bytes': processed_bytes,
+            'bytes_saved': bytes_saved,
+            'savings_percentage': (bytes_saved / original_bytes) * 100 if original_bytes else 0,
+            'failed': failed
+        }
+        return processed_files, report
@@ -0,0 +1,761 @@
+"""Reporte PDF del lote, renderizado por fragmentos y escrito directamente a disco"""
+import datetime
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from fpdf import FPDF
+
+from .items import ItemAnalysis
+from .models import ResultSet
+from .preprocess import bounded_submit
+from .stats import BatchStatistics
+
+class ReportCache:
+    """Caché acotada (LRU) de estadísticas y reportes PDF ya renderizados
+    
+    Las entradas se indexan por un hash de (results_data, batch_name,
+    exam_type, ...); al desalojar una entrada se borra su archivo PDF.
+    """
+    
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(results_data, *extra):
+        """Hash de results_data y de extra (p. ej. batch_name, exam_type y las opciones del PDF)"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps(extra, default=str).encode('utf-8'))
+        digest.update(json.dumps(results_data, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._discard(evicted)
+    
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                self._discard(entry)
+            self._entries.clear()
+    
+    @staticmethod
+    def _discard(entry):
+        paths = [entry.get('report_path'), entry.get('bundle_path'), *entry.get('exports', {}).values()]
+        for path in paths:
+            if path and os.path.exists(path):
+                os.remove(path)
+    
+    def __len__(self):
+        return len(self._entries)
+
+class SpoolBuffer:
+    """Sustituye al buffer de texto de FPDF escribiendo directamente en un archivo
+    
+    FPDF solo usa su buffer con '+=' y len() (para los offsets de la tabla
+    xref), así que el documento nunca se acumula en memoria.
+    """
+    
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.length = 0
+    
+    def __iadd__(self, text):
+        data = text.encode('latin-1')
+        self.fileobj.write(data)
+        self.length += len(data)
+        return self
+    
+    def __len__(self):
+        return self.length
+
+class ReleasingPages(dict):
+    """Páginas que se liberan en cuanto FPDF las lee para escribirlas"""
+    
+    def __getitem__(self, page):
+        return self.pop(page)
+
+class PageSpool:
+    """Contenido de las páginas en un archivo temporal, en lugar del dict pages de FPDF
+    
+    Cada página se guarda ya terminada (con su pie) en cuanto llega su
+    fragmento y FPDF la vuelve a leer del archivo al escribir el documento:
+    en memoria solo quedan los offsets.
+    """
+    
+    def __init__(self):
+        self.file = tempfile.TemporaryFile(prefix="eduscan_pages_")
+        self.offsets = {}
+    
+    def __setitem__(self, page, content):
+        data = content.encode('latin-1')
+        self.file.seek(0, io.SEEK_END)
+        self.offsets[page] = (self.file.tell(), len(data))
+        self.file.write(data)
+    
+    def __getitem__(self, page):
+        offset, length = self.offsets[page]
+        self.file.seek(offset)
+        return self.file.read(length).decode('latin-1')
+    
+    def __contains__(self, page):
+        return page in self.offsets
+    
+    def __len__(self):
+        return len(self.offsets)
+    
+    def close(self):
+        self.file.close()
+
+def render_summary_shard(generator, result_set, batch_name, exam_type):
+    """Fragmento de resumen; se ejecuta en un proceso del pool"""
+    pdf = generator._render_summary(result_set, batch_name, exam_type)
+    return [pdf.pages[n] for n in range(1, pdf.page + 1)]
+
+def render_detail_shard(generator, students):
+    """Fragmento de páginas de detalle; se ejecuta en un proceso del pool"""
+    pdf = generator._render_detail_pages(students)
+    return [pdf.pages[n] for n in range(1, pdf.page + 1)]
+
+def render_student_shard(generator, students, batch_name, exam_type):
+    """PDF individual (bytes) de cada estudiante del fragmento; se ejecuta en un proceso del pool"""
+    documents = []
+    for student in students:
+        output = io.BytesIO()
+        generator.write_pdf(generator._render_student_pdf(student, batch_name, exam_type), output)
+        documents.append(output.getvalue())
+    return documents
+
+def student_pdf_names(students):
+    """Nombre de archivo de cada estudiante dentro del ZIP, sin caracteres problemáticos ni repetidos"""
+    names = []
+    used = set()
+    for student in students:
+        parts = [str(student.student_id or "")]
+        if student.student_name and str(student.student_name) != parts[0]:
+            parts.append(str(student.student_name))
+        stem = re.sub(r'[^\w.-]+', '_', "_".join(part for part in parts if part)).strip('._') or "estudiante"
+        name = f"{stem}.pdf"
+        suffix = 1
+        while name in used:
+            suffix += 1
+            name = f"{stem}_{suffix}.pdf"
+        used.add(name)
+        names.append(name)
+    return names
+
+class PDFReportGenerator:
+    def __init__(self, max_workers=None, shard_size=50, parallel_threshold=100, compress=True):
+        # Los lotes con menos estudiantes que parallel_threshold se renderizan en el proceso actual
+        self.max_workers = max_workers
+        self.compress = compress
+        self.shard_size = shard_size
+        self.parallel_threshold = parallel_threshold
+        self.colors = {
+            'primary': (41, 128, 185),
+            'secondary': (52, 152, 219),
+            'success': (39, 174, 96),
+            'warning': (241, 196, 15),
+            'danger': (231, 76, 60),
+            'dark': (44, 62, 80),
+            'light': (236, 240, 241)
+        }
+    
+    def draw_header(self, pdf, title):
+        """Dibuja el encabezado del reporte"""
+        pdf.set_fill_color(*self.colors['primary'])
+        pdf.rect(0, 0, 210, 30, 'F')
+        
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_font("Arial", 'B', 20)
+        pdf.cell(0, 10, title, 0, 1, 'C')
+        pdf.ln(5)
+    
+    def draw_footer(self, pdf):
+        """Dibuja el pie de página"""
+        pdf.set_y(-15)
+        pdf.set_font("Arial", 'I', 8)
+        pdf.set_text_color(128, 128, 128)
+        pdf.cell(0, 10, f"Página {pdf.page_no()} - Generado con EduScan Pro", 0, 0, 'C')
+    
+    def create_metric_box(self, pdf, x, y, width, height, title, value, color):
+        """Crea una caja de métrica con estilo usando métodos estándar de FPDF"""
+        # Dibujar rectángulo de fondo
+        pdf.set_fill_color(*color)
+        pdf.rect(x, y, width, height, 'F')
+        
+        # Dibujar borde
+        pdf.set_draw_color(200, 200, 200)
+        pdf.rect(x, y, width, height)
+        
+        # Texto del título
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_font("Arial", 'B', 10)
+        pdf.set_xy(x + 5, y + 3)
+        pdf.cell(width - 10, 5, title, 0, 1)
+        
+        # Valor
+        pdf.set_font("Arial", 'B', 14)
+        pdf.set_xy(x + 5, y + 9)
+        pdf.cell(width - 10, 8, str(value), 0, 1)
+    
+    def create_student_metric_box(self, pdf, x, y, width, height, title, student_name, score, color):
+        """Crea una caja de métrica especial para estudiantes"""
+        # Dibujar rectángulo de fondo
+        pdf.set_fill_color(*color)
+        pdf.rect(x, y, width, height, 'F')
+        
+        # Dibujar borde
+        pdf.set_draw_color(200, 200, 200)
+        pdf.rect(x, y, width, height)
+        
+        # Texto del título
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_font("Arial", 'B', 10)
+        pdf.set_xy(x + 5, y + 3)
+        pdf.cell(width - 10, 5, title, 0, 1)
+        
+        # Puntaje
+        pdf.set_font("Arial", 'B', 12)
+        pdf.set_xy(x + 5, y + 9)
+        pdf.cell(width - 10, 6, f"{score}%", 0, 1)
+        
+        # Nombre del estudiante
+        pdf.set_font("Arial", '', 8)
+        pdf.set_xy(x + 5, y + 16)
+        # Acortar nombre si es muy largo
+        display_name = student_name[:20] + "..." if len(student_name) > 20 else student_name
+        pdf.cell(width - 10, 5, display_name, 0, 1)
+    
+    def _new_pdf(self):
+        """Crea un documento con las fuentes registradas siempre en el mismo orden
+        
+        FPDF numera las fuentes (/F1, /F2...) según su primer uso; fijar el
+        orden permite unir páginas renderizadas en documentos distintos.
+        """
+        pdf = FPDF()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        for style in ('', 'B', 'I'):
+            pdf.set_font("Arial", style, 10)
+        pdf.font_family = ''
+        return pdf
+    
+    def generate_pdf_report(self, results_data, batch_name, exam_type):
+        """Genera un reporte PDF profesional con los resultados (respuesta del webhook o ResultSet)
+        
+        Las páginas de cada fragmento pasan a un archivo temporal (PageSpool)
+        en cuanto llegan, y en el pool solo hay unos pocos fragmentos
+        pendientes a la vez: la memoria no crece con el número de estudiantes.
+        """
+        result_set = ResultSet.from_payload(results_data)
+        students = result_set.records[1:]
+        shards = [students[i:i + self.shard_size] for i in range(0, len(students), self.shard_size)]
+        
+        if len(result_set) >= self.parallel_threshold and shards:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                window = 2 * (self.max_workers or os.cpu_count() or 1)
+                summary_future = executor.submit(render_summary_shard, self, result_set, batch_name, exam_type)
+                detail_futures = bounded_submit(executor, render_detail_shard,
+                                                ((self, shard) for shard in shards), window)
+                shard_pages = itertools.chain([summary_future.result()],
+                                              (future.result() for future in detail_futures))
+                return self._assemble(shard_pages, PageSpool())
+        
+        shard_pages = itertools.chain([render_summary_shard(self, result_set, batch_name, exam_type)],
+                                      (render_detail_shard(self, shard) for shard in shards))
+        return self._assemble(shard_pages, PageSpool())
+    
+    def _assemble(self, shard_pages, pages=None):
+        """Une las páginas de los fragmentos (se consumen de uno en uno) y numera cada pie de página
+        
+        pages recibe cada página terminada (por defecto, el dict de FPDF).
+        """
+        pdf = self._new_pdf()
+        pdf.open()
+        pages = pdf.pages if pages is None else pages
+        # Pie de página en cada página, con la numeración del documento final
+        pdf.state = 2
+        for shard in shard_pages:
+            for content in shard:
+                pdf.page += 1
+                pdf.pages[pdf.page] = content
+                pdf.in_footer = 1
+                pdf.font_family = ''
+                self.draw_footer(pdf)
+                pdf.in_footer = 0
+                pages[pdf.page] = pdf.pages.pop(pdf.page)
+        pdf.pages = pages
+        return pdf
+    
+    def write_pdf(self, pdf, fileobj, compress=None):
+        """Escribe el PDF en fileobj sin construir el documento completo en memoria"""
+        pdf.set_compression(self.compress if compress is None else compress)
+        pdf.buffer = SpoolBuffer(fileobj)
+        if isinstance(pdf.pages, PageSpool):
+            spool = pdf.pages
+        else:
+            # Sin alias_nb_pages FPDF lee cada página una sola vez al cerrar el documento
+            spool = None
+            pdf.pages = ReleasingPages(pdf.pages)
+        try:
+            pdf.close()
+        finally:
+            if spool is not None:
+                spool.close()
+        return pdf.buffer.length
+    
+    def spool_pdf(self, pdf, compress=None, directory=None):
+        """Guarda el PDF en un archivo temporal y devuelve su ruta"""
+        with tempfile.NamedTemporaryFile(prefix="eduscan_", suffix=".pdf", dir=directory, delete=False) as report_file:
+            self.write_pdf(pdf, report_file, compress=compress)
+        return report_file.name
+    
+    def write_student_bundle(self, results_data, batch_name, exam_type, fileobj):
+        """Escribe en fileobj un ZIP con un PDF por estudiante y devuelve cuántos PDF contiene
+        
+        Los fragmentos se renderizan en el pool (con pocos pendientes a la vez)
+        y cada PDF se agrega al ZIP en cuanto llega su fragmento: la memoria
+        no crece con el número de estudiantes.
+        """
+        students = ResultSet.from_payload(results_data).records
+        names = iter(student_pdf_names(students))
+        shards = [students[i:i + self.shard_size] for i in range(0, len(students), self.shard_size)]
+        # Las páginas ya comprimidas apenas se reducen al volver a comprimirlas
+        compression = zipfile.ZIP_STORED if self.compress else zipfile.ZIP_DEFLATED
+        
+        with zipfile.ZipFile(fileobj, 'w', compression) as bundle:
+            if len(students) >= self.parallel_threshold:
+                with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                    window = 2 * (self.max_workers or os.cpu_count() or 1)
+                    futures = bounded_submit(executor, render_student_shard,
+                                             ((self, shard, batch_name, exam_type) for shard in shards), window)
+                    for future in futures:
+                        for document in future.result():
+                            bundle.writestr(next(names), document)
+            else:
+                for shard in shards:
+                    for document in render_student_shard(self, shard, batch_name, exam_type):
+                        bundle.writestr(next(names), document)
+        return len(students)
+    
+    def spool_student_bundle(self, results_data, batch_name, exam_type, directory=None):
+        """Guarda el ZIP de PDF individuales en un archivo temporal y devuelve su ruta"""
+        with tempfile.NamedTemporaryFile(prefix="eduscan_", suffix=".zip", dir=directory, delete=False) as bundle_file:
+            self.write_student_bundle(results_data, batch_name, exam_type, bundle_file)
+        return bundle_file.name
+    
+    def _render_summary(self, result_set, batch_name, exam_type):
+        """Renderiza la información del lote, estadísticas, ranking y el primer estudiante"""
+        pdf = self._new_pdf()
+        pdf.add_page()
+        
+        # Encabezado
+        self.draw_header(pdf, "REPORTE DE EVALUACIÓN - EDUSCAN PRO")
+        
+        # Información del lote - CORREGIDO: Más espacio después del header
+        pdf.ln(15)  # Aumenté el espacio aquí
+        
+        pdf.set_text_color(0, 0, 0)  # Texto negro
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(0, 10, "INFORMACIÓN DEL LOTE", 0, 1)
+        
+        pdf.set_font("Arial", '', 10)
+        pdf.cell(0, 6, f"Nombre del lote: {batch_name}", 0, 1)
+        pdf.cell(0, 6, f"Tipo de examen: {exam_type}", 0, 1)
+        pdf.cell(0, 6, f"Fecha de generación: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}", 0, 1)
+        pdf.ln(10)
+        
+        if result_set.records:
+            # Calcular estadísticas
+            stats = BatchStatistics(result_set)
+            
+            # Métricas principales
+            pdf.set_font("Arial", 'B', 14)
+            pdf.cell(0, 10, "ESTADÍSTICAS GENERALES", 0, 1)
+            pdf.ln(5)
+            
+            # Crear cuadrícula de métricas mejorada
+            metrics_row1 = [
+                {"title": "PROMEDIO", "value": f"{stats.mean:.1f}%", "color": self.colors['primary']},
+                {"title": "APROBADOS", "value": f"{stats.approved}", "color": self.colors['success']},
+                {"title": "DESAPROBADOS", "value": f"{stats.failed}", "color": self.colors['danger']}
+            ]
+            
+            # Dibujar primera fila de métricas
+            for i, metric in enumerate(metrics_row1):
+                x = 10 + i * 63
+                y = pdf.get_y()
+                self.create_metric_box(pdf, x, y, 60, 20, metric["title"], metric["value"], metric["color"])
+            
+            pdf.ln(25)
+            
+            # Segunda fila con información de estudiantes destacados
+            current_y = pdf.get_y()
+            
+            if stats.top_students:
+                x_max = 10
+                self.create_student_metric_box(
+                    pdf, x_max, current_y, 90, 25, 
+                    "MEJOR NOTA", 
+                    stats.top_students[0], 
+                    stats.format_score(stats.max), 
+                    self.colors['warning']
+                )
+            
+            if stats.bottom_students:
+                x_min = 110
+                self.create_student_metric_box(
+                    pdf, x_min, current_y, 90, 25, 
+                    "NOTA MÁS BAJA", 
+                    stats.bottom_students[0], 
+                    stats.format_score(stats.min), 
+                    self.colors['secondary']
+                )
+            
+            pdf.ln(30)
+            
+            # Dispersión de las notas
+            pdf.set_text_color(0, 0, 0)
+            pdf.set_font("Arial", '', 9)
+            pdf.cell(0, 6, (
+                f"Desviación estándar: {stats.std:.1f}   Mediana: {stats.percentiles[50]:.1f}%   "
+                f"P25: {stats.percentiles[25]:.1f}%   P75: {stats.percentiles[75]:.1f}%   "
+                f"P90: {stats.percentiles[90]:.1f}%"
+            ), 0, 1)
+            
+            pdf.ln(5)
+            
+            # Distribución de notas - CORREGIDO: Texto negro en encabezados
+            pdf.set_text_color(0, 0, 0)  # ✅ TEXTO NEGRO
+            pdf.set_font("Arial", 'B', 14)
+            pdf.cell(0, 10, "DISTRIBUCIÓN DE NOTAS", 0, 1)
+            pdf.ln(5)
+            
+            # Crear tabla de distribución CORREGIDA
+            header_fill = self.colors['light']
+            pdf.set_fill_color(*header_fill)
+            pdf.set_font("Arial", 'B', 10)
+            pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para encabezados
+            
+            # Encabezado de tabla
+            pdf.cell(70, 8, "Rango de Notas", 1, 0, 'C', True)
+            pdf.cell(40, 8, "Cantidad", 1, 0, 'C', True)
+            pdf.cell(40, 8, "Porcentaje", 1, 1, 'C', True)
+            
+            pdf.set_font("Arial", '', 9)
+            pdf.set_fill_color(255, 255, 255)  # Fondo blanco para las filas
+            pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para datos
+            
+            for i, bucket in enumerate(stats.distribution):
+                # Alternar colores de fondo para mejor legibilidad
+                fill = i % 2 == 0
+                if fill:
+                    pdf.set_fill_color(245, 245, 245)  # Gris muy claro
+                else:
+                    pdf.set_fill_color(255, 255, 255)  # Blanco
+                
+                pdf.cell(70, 7, bucket['label'], 1, 0, 'L', fill)
+                pdf.cell(40, 7, str(bucket['count']), 1, 0, 'C', fill)
+                pdf.cell(40, 7, f"{bucket['percentage']:.1f}%", 1, 1, 'C', fill)
+            
+            pdf.ln(10)
+            
+            # Ranking de estudiantes - CORREGIDO: Texto negro en encabezados
+            pdf.set_font("Arial", 'B', 14)
+            pdf.cell(0, 10, "RANKING DE ESTUDIANTES", 0, 1)
+            pdf.ln(5)
+            
+            col_widths = [80, 30, 30, 30]
+            
+            # Encabezado de tabla - CORREGIDO: Texto negro
+            pdf.set_fill_color(*self.colors['light'])
+            pdf.set_font("Arial", 'B', 10)
+            pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para encabezados
+            
+            pdf.cell(col_widths[0], 8, "Estudiante", 1, 0, 'C', True)
+            pdf.cell(col_widths[1], 8, "Nota", 1, 0, 'C', True)
+            pdf.cell(col_widths[2], 8, "Estado", 1, 0, 'C', True)
+            pdf.cell(col_widths[3], 8, "Correctas", 1, 1, 'C', True)
+            
+            pdf.set_font("Arial", '', 9)
+            pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para datos de estudiantes
+            
+            for i, student in enumerate(stats.ranking):
+                # Color según estado - PERO texto negro para nombres y datos
+                if student.approved:
+                    status_color = (39, 174, 96)  # Verde para estado
+                else:
+                    status_color = (231, 76, 60)  # Rojo para estado
+                
+                # Fondo alternado para mejor legibilidad
+                fill = i % 2 == 0
+                if fill:
+                    pdf.set_fill_color(245, 245, 245)  # Gris muy claro
+                else:
+                    pdf.set_fill_color(255, 255, 255)  # Blanco
+                
+                # Resaltar estudiantes con máxima y mínima nota
+                if student.score == stats.max:
+                    pdf.set_fill_color(255, 255, 150)  # Amarillo claro para mejor nota
+                elif student.score == stats.min:
+                    pdf.set_fill_color(255, 200, 200)  # Rojo claro para peor nota
+                
+                # Nombre del estudiante - TEXTO NEGRO
+                pdf.set_text_color(0, 0, 0)
+                pdf.cell(col_widths[0], 7, student.student_name[:25], 1, 0, 'L', True)
+                
+                # Nota - TEXTO NEGRO
+                pdf.cell(col_widths[1], 7, f"{stats.format_score(student.score)}%", 1, 0, 'C', True)
+                
+                # Estado - Color según aprobado/reprobado
+                pdf.set_text_color(*status_color)
+                pdf.cell(col_widths[2], 7, student.passing_status, 1, 0, 'C', True)
+                
+                # Correctas - TEXTO NEGRO
+                pdf.set_text_color(0, 0, 0)
+                pdf.cell(col_widths[3], 7, str(student.correct_answers), 1, 1, 'C', True)
+            
+            pdf.ln(15)
+            
+            self._render_item_analysis(pdf, ItemAnalysis(result_set))
+            
+            # Resultados detallados por estudiante - CORREGIDO: Texto negro
+            pdf.set_font("Arial", 'B', 14)
+            pdf.cell(0, 10, "RESULTADOS DETALLADOS POR ESTUDIANTE", 0, 1)
+            pdf.ln(5)
+            
+            # El primer estudiante continúa en la página del resumen; el resto se
+            # renderiza por fragmentos (en paralelo para lotes grandes)
+            self._render_student_detail(pdf, result_set.records[0])
+        
+        return pdf
+    
+    def _render_item_analysis(self, pdf, items, max_options=5):
+        """Dibuja la tabla de análisis de ítems y los coeficientes de fiabilidad"""
+        if not items.n_questions:
+            return
+        
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(0, 10, "ANÁLISIS DE ÍTEMS", 0, 1)
+        pdf.set_font("Arial", '', 9)
+        pdf.cell(0, 6, (
+            f"KR-20: {items.format_coefficient(items.kr20)}   "
+            f"Alfa de Cronbach: {items.format_coefficient(items.cronbach_alpha)}   "
+            f"Dificultad = proporción de aciertos; Discriminación = grupo superior - inferior (27%)"
+        ), 0, 1)
+        pdf.ln(3)
+        
+        options = list(items.options[:max_options])
+        option_width = 100 / max(len(options), 1)
+        
+        pdf.set_fill_color(*self.colors['light'])
+        pdf.set_font("Arial", 'B', 8)
+        pdf.cell(15, 8, "Preg.", 1, 0, 'C', True)
+        pdf.cell(20, 8, "Correcta", 1, 0, 'C', True)
+        pdf.cell(25, 8, "Dificultad", 1, 0, 'C', True)
+        pdf.cell(30, 8, "Discriminación", 1, 0, 'C', True)
+        for option in options:
+            pdf.cell(option_width, 8, f"% {option}", 1, 0, 'C', True)
+        pdf.ln()
+        
+        pdf.set_font("Arial", '', 8)
+        for i, question in enumerate(items.questions):
+            fill = i % 2 == 0
+            pdf.set_fill_color(*((245, 245, 245) if fill else (255, 255, 255)))
+            pdf.set_text_color(0, 0, 0)
+            pdf.cell(15, 6, str(question), 1, 0, 'C', fill)
+            pdf.cell(20, 6, str(items.answer_key[i]), 1, 0, 'C', fill)
+            pdf.cell(25, 6, f"{items.difficulty[i]:.2f}", 1, 0, 'C', fill)
+            # Discriminación baja o negativa en rojo: pregunta a revisar
+            if items.discrimination[i] < 0.2:
+                pdf.set_text_color(*self.colors['danger'])
+            pdf.cell(30, 6, f"{items.discrimination[i]:.2f}", 1, 0, 'C', fill)
+            pdf.set_text_color(0, 0, 0)
+            for j in range(len(options)):
+                pdf.cell(option_width, 6, f"{items.option_frequency[i, j] * 100:.0f}%", 1, 0, 'C', fill)
+            pdf.ln()
+        
+        pdf.ln(15)
+    
+    def _render_student_detail(self, pdf, student):
+        """Dibuja el bloque de resultados detallados de un estudiante"""
+        # Información del estudiante - CORREGIDO: Texto negro
+        pdf.set_fill_color(*self.colors['light'])
+        pdf.set_font("Arial", 'B', 12)
+        pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO
+        pdf.cell(0, 8, f"ESTUDIANTE: {student.student_name}", 1, 1, 'L', True)
+        
+        pdf.set_font("Arial", '', 10)
+        pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO
+        pdf.cell(0, 6, f"Tipo de examen: {student.exam_type}", 0, 1)
+        pdf.cell(0, 6, f"Total de preguntas: {student.total_questions}", 0, 1)
+        
+        # Resumen de evaluación - CORREGIDO: Texto negro en encabezados
+        col_width = 47.5
+        pdf.ln(5)
+        
+        # Encabezado de resumen - TEXTO NEGRO
+        pdf.set_fill_color(*self.colors['light'])
+        pdf.set_font("Arial", 'B', 10)
+        pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para encabezados
+        pdf.cell(col_width, 8, "Correctas:", 1, 0, 'C', True)
+        pdf.cell(col_width, 8, "Incorrectas:", 1, 0, 'C', True)
+        pdf.cell(col_width, 8, "Puntaje:", 1, 0, 'C', True)
+        pdf.cell(col_width, 8, "Estado:", 1, 1, 'C', True)
+        
+        # Datos del resumen - TEXTO NEGRO para valores
+        pdf.set_font("Arial", '', 10)
+        pdf.set_fill_color(255, 255, 255)  # Fondo blanco
+        
+        # Correctas - TEXTO NEGRO
+        pdf.set_text_color(0, 0, 0)
+        pdf.cell(col_width, 8, str(student.correct_answers), 1, 0, 'C', True)
+        
+        # Incorrectas - TEXTO NEGRO
+        pdf.cell(col_width, 8, str(student.incorrect_answers), 1, 0, 'C', True)
+        
+        # Puntaje - TEXTO NEGRO
+        pdf.cell(col_width, 8, f"{BatchStatistics.format_score(student.score)}%", 1, 0, 'C', True)
+        
+        # Estado - Color según aprobado/reprobado
+        status_color = (39, 174, 96) if student.approved else (231, 76, 60)
+        pdf.set_text_color(*status_color)
+        pdf.cell(col_width, 8, student.passing_status, 1, 1, 'C', True)
+        pdf.set_text_color(0, 0, 0)  # Reset a negro
+        
+        pdf.ln(8)
+        
+        # Resultados detallados
+        if student.details:
+            pdf.set_font("Arial", 'B', 11)
+            pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO
+            pdf.cell(0, 8, "DETALLE DE RESPUESTAS:", 0, 1)
+            pdf.ln(3)
+            
+            # Encabezado de tabla detallada - TEXTO NEGRO
+            header_fill = self.colors['light']
+            pdf.set_fill_color(*header_fill)
+            pdf.set_font("Arial", 'B', 8)
+            pdf.set_text_color(0, 0, 0)  # TEXTO NEGRO para encabezados
+            
+            pdf.cell(15, 8, "Preg.", 1, 0, 'C', True)
+            pdf.cell(20, 8, "Selección", 1, 0, 'C', True)
+            pdf.cell(20, 8, "Correcta", 1, 0, 'C', True)
+            pdf.cell(15, 8, "Estado", 1, 0, 'C', True)
+            pdf.cell(120, 8, "Explicación", 1, 1, 'C', True)
+            
+            pdf.set_font("Arial", '', 7)
+            
+            for j, detail in enumerate(student.details):
+                
+                # Fondo alternado para mejor legibilidad
+                fill = j % 2 == 0
+                if fill:
+                    pdf.set_fill_color(245, 245, 245)  # Gris muy claro
+                else:
+                    pdf.set_fill_color(255, 255, 255)  # Blanco
+                
+                # Pregunta - TEXTO NEGRO
+                pdf.set_text_color(0, 0, 0)
+                pdf.cell(15, 6, str(detail.question_number), 1, 0, 'C', fill)
+                # Selección - TEXTO NEGRO
+                pdf.cell(20, 6, str(detail.selected_option), 1, 0, 'C', fill)
+                # Correcta - TEXTO NEGRO
+                pdf.cell(20, 6, str(detail.correct_option), 1, 0, 'C', fill)
+                
+                # Estado - Color según correcto/incorrecto
+                if detail.is_correct:
+                    pdf.set_text_color(39, 174, 96)
+                    status = "OK"
+                else:
+                    pdf.set_text_color(231, 76, 60)
+                    status = "X"
+                pdf.cell(15, 6, status, 1, 0, 'C', fill)
+                
+                # Explicación - TEXTO NEGRO
+                pdf.set_text_color(0, 0, 0)
+                safe_explanation = self.clean_text(detail.explanation)
+                display_explanation = safe_explanation[:75] + ("..." if len(safe_explanation) > 75 else "")
+                pdf.cell(120, 6, display_explanation, 1, 1, 'L', fill)
+            
+            pdf.ln(10)
+    
+    def _render_student_pdf(self, student, batch_name, exam_type):
+        """Documento de un solo estudiante: encabezado, datos del lote y su bloque de resultados"""
+        pdf = self._new_pdf()
+        pdf.add_page()
+        self.draw_header(pdf, "REPORTE DE EVALUACIÓN - EDUSCAN PRO")
+        pdf.ln(10)
+        
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Arial", '', 10)
+        pdf.cell(0, 6, f"Nombre del lote: {batch_name}", 0, 1)
+        pdf.cell(0, 6, f"Tipo de examen: {exam_type}", 0, 1)
+        pdf.cell(0, 6, f"Fecha de generación: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}", 0, 1)
+        pdf.ln(5)
+        
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(0, 10, "RESULTADOS DETALLADOS", 0, 1)
+        pdf.ln(5)
+        self._render_student_detail(pdf, student)
+        return self._assemble([[pdf.pages[n] for n in range(1, pdf.page + 1)]])
+    
+    def _render_detail_pages(self, students):
+        """Renderiza una página de detalle por estudiante, con su encabezado"""
+        pdf = self._new_pdf()
+        for student in students:
+            pdf.add_page()
+            self.draw_header(pdf, "REPORTE DE EVALUACIÓN - EDUSCAN PRO")
+            pdf.ln(10)
+            self._render_student_detail(pdf, student)
+        return pdf
+    
+    def clean_text(self, text):
+        """Limpia el texto de caracteres Unicode problemáticos"""
+        if not text:
+            return ""
+        
+        # Reemplazar caracteres Unicode problemáticos
+        replacements = {
+            '✓': '(OK)',
+            '✗': '(X)',
+            '✅': '(OK)',
+            '❌': '(X)',
+            '→': '->',
+            '←': '<-',
+            '—': '-',
+            '–': '-',
+            '“': '"',
+            '”': '"',
+            '‘': "'",
+            '’': "'",
+            '…': '...'
+        }
+        
+        cleaned_text = text
+        for char, replacement in replacements.items():
+            cleaned_text = cleaned_text.replace(char, replacement)
+        
+        return cleaned_text
@@ -0,0 +1,163 @@
+"""Re-calificación local de lotes con claves de respuestas versionadas"""
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .config import DATA_DIR
+
+class AnswerKeyRescorer:
+    """Recalcula la evaluación de un lote con una clave de respuestas corregida, sin llamar al webhook"""
+    
+    PASSING_STATUS = 'APROBADO'
+    FAILING_STATUS = 'REPROBADO'
+    
+    def __init__(self, passing_score=60.0):
+        self.passing_score = float(passing_score)
+    
+    @staticmethod
+    def normalize_option(option):
+        return str(option).strip().upper()
+    
+    def rescore(self, results_data, answer_key):
+        """Devuelve una copia de results_data re-calificada con answer_key ({pregunta: opción})
+        
+        Las preguntas que no figuran en la clave conservan su corrección original.
+        """
+        results = results_data.get('results', [])
+        key = {str(question).strip(): self.normalize_option(option) for question, option in answer_key.items()
+               if str(option).strip()}
+        
+        # Aplanar (fila, pregunta, opción elegida, acierto original) una sola vez
+        rows, question_labels, selected, original_flags = [], [], [], []
+        for row, result_item in enumerate(results):
+            if not result_item.get('success'):
+                continue
+            for detail in result_item.get('data', {}).get('detailed_results', []):
+                rows.append(row)
+                question_labels.append(str(detail.get('question_number', '')).strip())
+                selected.append(str(detail.get('selected_option', 'N/A')))
+                original_flags.append(bool(detail.get('is_correct', False)))
+        
+        rows = np.asarray(rows, dtype=int)
+        questions, columns = np.unique(np.array(question_labels, dtype=str), return_inverse=True)
+        # Clave por pregunta distinta ('' si la pregunta no está en la clave)
+        question_keys = np.array([key.get(question, '') for question in questions.tolist()] or [''], dtype=str)
+        detail_keys = question_keys[columns] if len(columns) else np.array([], dtype=str)
+        in_key = detail_keys != ''
+        # Normalizar solo las opciones distintas y expandir por índice
+        options, option_codes = np.unique(np.array(selected, dtype=str), return_inverse=True)
+        normalized = np.array([self.normalize_option(option) for option in options.tolist()] or [''], dtype=str)[option_codes]
+        is_correct = np.where(in_key, normalized == detail_keys, np.asarray(original_flags, dtype=bool))
+        
+        # Aciertos y total de preguntas por examen
+        correct_counts = np.bincount(rows, weights=is_correct, minlength=len(results)).astype(int)
+        totals = np.bincount(rows, minlength=len(results))
+        scores = np.round(np.divide(correct_counts * 100.0, totals, out=np.zeros(len(results)), where=totals > 0), 2)
+        
+        # Reconstruir el payload con los campos recalculados
+        is_correct = is_correct.tolist()
+        detail_keys = detail_keys.tolist()
+        in_key = in_key.tolist()
+        position = 0
+        rescored = []
+        for row, result_item in enumerate(results):
+            data = result_item.get('data', {})
+            if not result_item.get('success') or not totals[row]:
+                rescored.append(result_item)
+                continue
+            details = []
+            for detail in data['detailed_results']:
+                details.append({
+                    **detail,
+                    'correct_option': detail_keys[position] if in_key[position] else detail.get('correct_option', 'N/A'),
+                    'is_correct': is_correct[position]
+                })
+                position += 1
+            score = float(scores[row])
+            rescored.append({
+                **result_item,
+                'data': {
+                    **data,
+                    'evaluation': {
+                        **data.get('evaluation', {}),
+                        'score_percentage': score,
+                        'correct_answers': int(correct_counts[row]),
+                        'incorrect_answers': int(totals[row] - correct_counts[row]),
+                        'passing_status': self.PASSING_STATUS if score >= self.passing_score else self.FAILING_STATUS
+                    },
+                    'detailed_results': details
+                }
+            })
+        
+        return {**results_data, 'results': rescored}
+
+class AnswerKeyStore:
+    """Claves de respuestas versionadas por tipo de examen"""
+    
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DATA_DIR, "answer_keys.db")
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS answer_keys (
+                    exam_type TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    note TEXT,
+                    answers TEXT NOT NULL,
+                    PRIMARY KEY (exam_type, version)
+                )
+            """)
+    
+    @contextlib.contextmanager
+    def _connect(self):
+        """Conexión que confirma (o deshace) la transacción y se cierra al salir del bloque with"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def save(self, exam_type, answers, note=""):
+        """Guarda la clave como nueva versión y devuelve su número"""
+        answers = {str(question): str(option) for question, option in answers.items()}
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM answer_keys WHERE exam_type = ?", (exam_type,)
+            ).fetchone()
+            version = row[0]
+            conn.execute(
+                "INSERT INTO answer_keys (exam_type, version, created_at, note, answers) VALUES (?, ?, ?, ?, ?)",
+                (exam_type, version, time.time(), note, json.dumps(answers))
+            )
+        return version
+    
+    def get(self, exam_type, version=None):
+        """Clave {pregunta: opción} de una versión (la más reciente por defecto) o None"""
+        with self._connect() as conn:
+            if version is None:
+                row = conn.execute(
+                    "SELECT answers FROM answer_keys WHERE exam_type = ? ORDER BY version DESC LIMIT 1", (exam_type,)
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT answers FROM answer_keys WHERE exam_type = ? AND version = ?", (exam_type, version)
+                ).fetchone()
+        return json.loads(row['answers']) if row else None
+    
+    def versions(self, exam_type):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT version, created_at, note FROM answer_keys WHERE exam_type = ? ORDER BY version DESC",
+                (exam_type,)
+            ).fetchall()
+        return [dict(row) for row in rows]
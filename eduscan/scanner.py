@@ -0,0 +1,563 @@
+"""Envío de lotes de exámenes al webhook de evaluación"""
+import copy
+import datetime
+import json
+import mimetypes
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from .client import AdaptiveLimiter, WebhookClient, WebhookError
+from .config import WEBHOOK_URL
+from .metrics import NULL_TIMER
+from .transport import JSONStreamEncoder, MultipartStreamEncoder
+
+class BatchExamScanner:
+    TRANSPORTS = ('json', 'multipart')
+    RESPONSE_MODES = ('json', 'ndjson')
+    
+    def __init__(self, chunk_size=None, max_concurrency=4, transport='json', cache=None, response_mode='json',
+                 webhook_url=None, metrics=None, retry=None, failover_rounds=1):
+        self.n8n_webhook_url = webhook_url or WEBHOOK_URL
+        # metrics=None desactiva la instrumentación por etapas (MetricsRegistry para activarla)
+        self.metrics = metrics
+        # chunk_size=None conserva el modo original: un solo request por lote
+        self.chunk_size = chunk_size
+        self.max_concurrency = max(1, int(max_concurrency))
+        # Sesión con keep-alive y reintentos; la concurrencia real se adapta por debajo de max_concurrency
+        self.client = WebhookClient(
+            self.n8n_webhook_url,
+            retry=retry,
+            limiter=AdaptiveLimiter(initial=self.max_concurrency, maximum=self.max_concurrency)
+        )
+        # Rondas de reenvío de los exámenes que no llegaron a evaluarse (bloque caído, conexión cortada)
+        self.failover_rounds = failover_rounds
+        if transport not in self.TRANSPORTS:
+            raise ValueError(f"Transporte no soportado: {transport}")
+        self.transport = transport
+        if response_mode not in self.RESPONSE_MODES:
+            raise ValueError(f"Modo de respuesta no soportado: {response_mode}")
+        self.response_mode = response_mode
+        self.cache = cache
+    
+    def process_batch(self, files_data, batch_name, exam_type, on_result=None, ticket=None):
+        """Envía el lote completo o dividido en bloques concurrentes
+        
+        on_result, si se indica, se llama con cada resultado individual en
+        cuanto está disponible (aciertos de caché, bloques terminados, etc.).
+        Con instrumentación, el resultado incluye 'timings' con la duración
+        acumulada de cada etapa. Con ticket (de FairScheduler.job) cada
+        request espera su turno en el planificador compartido del proceso.
+        """
+        if ticket is not None:
+            # Copia superficial: comparte sesión HTTP, caché y métricas, pero sus requests pasan por el ticket
+            scanner = copy.copy(self)
+            scanner.client = ticket.bind(self.client)
+            return scanner.process_batch(files_data, batch_name, exam_type, on_result)
+        
+        timer = self.metrics.timer(batch=batch_name, exam_type=exam_type) if self.metrics is not None else NULL_TIMER
+        with timer.stage('total'):
+            if self.cache is not None and self.cache.enabled:
+                result = self._process_with_cache(files_data, batch_name, exam_type, on_result, timer)
+            else:
+                result = self._dispatch(files_data, batch_name, exam_type, on_result, timer)
+        
+        if timer.enabled:
+            timer.count('batches')
+            timer.record_results(result['data'].get('results', []) if result['success'] else files_data)
+            result['timings'] = timer.summary()
+        return result
+    
+    def _dispatch(self, files_data, batch_name, exam_type, on_result=None, timer=NULL_TIMER):
+        """Envía el lote y reenvía solo los exámenes que no llegaron a evaluarse
+        
+        Los exámenes que el webhook evaluó con error no se reenvían. on_result
+        recibe los fallos de envío solo cuando ya no se van a reintentar.
+        """
+        held = []
+        def forward(result_item):
+            if result_item.get('retryable'):
+                held.append(result_item)
+            elif on_result is not None:
+                on_result(result_item)
+        
+        result = self._send(files_data, batch_name, exam_type, forward, timer)
+        unsent = self._unsent(files_data, result)
+        for _ in range(self.failover_rounds):
+            if not result['success']:
+                break
+            results = result['data'].get('results', [])
+            pending = self._pending_exams(files_data, [r for r in results if r.get('retryable')])
+            if not pending:
+                break
+            
+            held.clear()
+            timer.count('resubmitted', len(pending))
+            retry = self._send(pending, batch_name, exam_type, forward, timer)
+            if retry['success']:
+                retried = retry['data'].get('results', [])
+            else:
+                retried = self._failed_results(pending, retry['error'], retry.get('retryable', False))
+            results = [r for r in results if not r.get('retryable')] + retried
+            unsent = (unsent - {self._exam_key(f) for f in pending}) | self._unsent(pending, retry)
+            
+            successful = sum(1 for r in results if r.get('success'))
+            batch_processing = dict(result['data'].get('batch_processing', {}))
+            batch_processing.update({
+                'successful': successful,
+                'failed': len(results) - successful,
+                'resubmitted': batch_processing.get('resubmitted', 0) + len(pending)
+            })
+            if 'failed_chunks' in batch_processing:
+                # Un bloque cuyos exámenes se reenviaron con éxito deja de figurar como fallido
+                batch_processing['failed_chunks'] = [
+                    failed_chunk for failed_chunk in batch_processing['failed_chunks']
+                    if any(self._exam_key(f) in unsent for f in self._chunk(files_data, failed_chunk['chunk']))
+                ]
+            result = {**result, 'data': {'batch_processing': batch_processing, 'results': results}}
+        
+        if result['success']:
+            for result_item in result['data'].get('results', []):
+                result_item.pop('retryable', None)
+        for result_item in held:
+            result_item.pop('retryable', None)
+            if on_result is not None:
+                on_result(result_item)
+        return result
+    
+    @staticmethod
+    def _exam_key(item):
+        return (str(item.get('student_id')), item.get('filename'))
+    
+    def _chunk(self, files_data, index):
+        return files_data[index * self.chunk_size:(index + 1) * self.chunk_size]
+    
+    def _unsent(self, files_data, result):
+        """Claves de los exámenes que un envío no llegó a entregar (bloques fallidos y exámenes reintentables)"""
+        if not result['success']:
+            return {self._exam_key(f) for f in files_data}
+        unsent = {self._exam_key(r) for r in result['data'].get('results', []) if r.get('retryable')}
+        for failed_chunk in result['data'].get('batch_processing', {}).get('failed_chunks', []):
+            unsent.update(self._exam_key(f) for f in self._chunk(files_data, failed_chunk['chunk']))
+        return unsent
+    
+    @staticmethod
+    def _pending_exams(files_data, failed):
+        """Los files_data de los resultados fallidos, en el orden original"""
+        remaining = Counter((str(r.get('student_id')), r.get('filename')) for r in failed)
+        pending = []
+        for file_data in files_data:
+            key = (str(file_data['student_id']), file_data['filename'])
+            if remaining[key] > 0:
+                remaining[key] -= 1
+                pending.append(file_data)
+        return pending
+    
+    def _send(self, files_data, batch_name, exam_type, on_result=None, timer=NULL_TIMER):
+        if self.chunk_size and len(files_data) > self.chunk_size:
+            return self._process_chunked(files_data, batch_name, exam_type, on_result, timer)
+        return self._submit(files_data, batch_name, exam_type, on_result, timer)
+    
+    def _emit(self, on_result, files_data, result):
+        """Notifica los resultados individuales de un envío"""
+        if on_result is None:
+            return
+        if result['success']:
+            results = result['data'].get('results', [])
+        else:
+            results = self._failed_results(files_data, result['error'], result.get('retryable', False))
+        for result_item in results:
+            on_result(result_item)
+    
+    def _process_with_cache(self, files_data, batch_name, exam_type, on_result=None, timer=NULL_TIMER):
+        """Envía solo los exámenes que no están en caché y une los aciertos"""
+        cached_results = []
+        misses = []
+        miss_hashes = {}
+        
+        with timer.stage('cache_lookup'):
+            for file_data in files_data:
+                image_hash = self.cache.content_hash(file_data)
+                data = self.cache.get(image_hash, exam_type)
+                if data is not None:
+                    cached_results.append({
+                        'student_id': file_data['student_id'],
+                        'filename': file_data['filename'],
+                        'success': True,
+                        'cached': True,
+                        'data': data
+                    })
+                else:
+                    misses.append(file_data)
+                    key = self._exam_key(file_data)
+                    # Dos imágenes distintas con la misma clave no se distinguen en la respuesta: no se guardan
+                    miss_hashes[key] = image_hash if miss_hashes.get(key, image_hash) == image_hash else None
+        
+        cache_info = {'hits': len(cached_results), 'misses': len(misses)}
+        if on_result is not None:
+            for result_item in cached_results:
+                on_result(result_item)
+        
+        if not misses:
+            return {
+                'success': True,
+                'data': {
+                    'batch_processing': {
+                        'total_exams': len(files_data),
+                        'successful': len(cached_results),
+                        'failed': 0
+                    },
+                    'results': cached_results
+                },
+                'batch_size': len(files_data),
+                'cache': cache_info
+            }
+        
+        result = self._dispatch(misses, batch_name, exam_type, on_result, timer)
+        
+        if result['success']:
+            with timer.stage('cache_store'):
+                for result_item in result['data'].get('results', []):
+                    image_hash = miss_hashes.get(self._exam_key(result_item))
+                    if result_item.get('success') and image_hash:
+                        self.cache.put(image_hash, exam_type, result_item.get('data', {}))
+                self.cache.evict()
+        elif cached_results:
+            # Si falla el envío, los aciertos de caché siguen siendo válidos
+            result = {
+                'success': True,
+                'data': {'results': self._failed_results(misses, result['error'])}
+            }
+        else:
+            result['cache'] = cache_info
+            return result
+        
+        results = cached_results + result['data'].get('results', [])
+        successful = sum(1 for r in results if r.get('success'))
+        batch_processing = dict(result['data'].get('batch_processing', {}))
+        batch_processing.update({
+            'total_exams': len(files_data),
+            'successful': successful,
+            'failed': len(results) - successful,
+            'cached': len(cached_results)
+        })
+        return {
+            'success': True,
+            'data': {'batch_processing': batch_processing, 'results': results},
+            'batch_size': len(files_data),
+            'cache': cache_info
+        }
+    
+    def _build_json_stream(self, files_data, batch_name, exam_type):
+        """Construye el JSON del lote; las imágenes se codifican en base64 al enviarlas"""
+        fields = {
+            "batch_name": batch_name,
+            "exam_type": exam_type,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "total_exams": len(files_data)
+        }
+        exams = [
+            (file_data['student_id'], file_data['filename'], file_data['file'], self._mime_type(file_data))
+            for file_data in files_data
+        ]
+        return JSONStreamEncoder(fields, exams)
+    
+    @staticmethod
+    def _mime_type(file_data):
+        """Tipo MIME real de la imagen (el del preprocesado o el de la extensión)"""
+        if file_data.get('mime_type'):
+            return file_data['mime_type']
+        return mimetypes.guess_type(file_data['filename'])[0] or 'image/png'
+    
+    def _build_multipart(self, files_data, batch_name, exam_type):
+        """Construye el cuerpo multipart: metadatos en JSON y una parte por imagen"""
+        metadata = {
+            "batch_name": batch_name,
+            "exam_type": exam_type,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "total_exams": len(files_data),
+            "exams": []
+        }
+        files = []
+        
+        for index, file_data in enumerate(files_data):
+            field = f"exam_{index}"
+            content_type = self._mime_type(file_data)
+            metadata["exams"].append({
+                "student_id": file_data['student_id'],
+                "filename": file_data['filename'],
+                "field": field
+            })
+            files.append((field, file_data['filename'], file_data['file'], content_type))
+        
+        fields = [("metadata", json.dumps(metadata).encode('utf-8'), 'application/json')]
+        return MultipartStreamEncoder(fields, files)
+    
+    def _request_kwargs(self, files_data, batch_name, exam_type, timer=NULL_TIMER):
+        """Cuerpo y cabeceras del request según el transporte elegido"""
+        if self.transport == 'multipart':
+            body = self._build_multipart(files_data, batch_name, exam_type)
+        else:
+            body = self._build_json_stream(files_data, batch_name, exam_type)
+        return {
+            'data': timer.body(body),
+            'headers': {'Content-Type': body.content_type}
+        }
+    
+    @staticmethod
+    def _record_remote_time(timer, batch_processing):
+        """Tiempo de evaluación que informa el webhook en batch_processing, si lo hace"""
+        seconds = batch_processing.get('processing_time') if isinstance(batch_processing, dict) else None
+        if isinstance(seconds, (int, float)):
+            timer.add('remote', float(seconds))
+    
+    def _submit(self, files_data, batch_name, exam_type, on_result=None, timer=NULL_TIMER):
+        """Envía un conjunto de exámenes en un solo request"""
+        if self.response_mode == 'ndjson':
+            return self._submit_streaming(files_data, batch_name, exam_type, on_result, timer)
+        
+        try:
+            # Un request por conjunto (timeout de 5 minutos), reintentado si el fallo es transitorio
+            with self.client.request(
+                lambda: self._request_kwargs(files_data, batch_name, exam_type, timer),
+                units=len(files_data),
+                timer=timer
+            ) as response:
+                with timer.stage('parse'):
+                    data = response.json()
+            self._record_remote_time(timer, data.get('batch_processing'))
+            result = {
+                'success': True,
+                'data': data,
+                'batch_size': len(files_data)
+            }
+        
+        except WebhookError as e:
+            result = {
+                'success': False,
+                'error': str(e),
+                'status_code': e.status_code,
+                'retryable': e.retryable
+            }
+        except Exception as e:
+            result = {
+                'success': False,
+                'error': str(e)
+            }
+        
+        self._emit(on_result, files_data, result)
+        return result
+    
+    def stream_results(self, files_data, batch_name, exam_type, summary=None, timer=NULL_TIMER):
+        """Genera los resultados uno a uno a partir de una respuesta NDJSON
+        
+        Cada línea del cuerpo es un examen evaluado; las líneas con
+        'batch_processing' se copian en summary si se indica.
+        """
+        def request_kwargs():
+            kwargs = self._request_kwargs(files_data, batch_name, exam_type, timer)
+            kwargs['headers']['Accept'] = 'application/x-ndjson'
+            return kwargs
+        
+        # 'request' llega hasta las cabeceras de la respuesta; el resto es 'receive'
+        with self.client.request(request_kwargs, units=len(files_data), stream=True, timer=timer) as response:
+            received_at = time.perf_counter()
+            waiting = parsing = 0.0
+            for line in response.iter_lines():
+                if not line.strip():
+                    continue
+                parse_start = time.perf_counter()
+                item = json.loads(line)
+                parsing += time.perf_counter() - parse_start
+                if 'batch_processing' in item and 'student_id' not in item:
+                    if summary is not None:
+                        summary.update(item['batch_processing'])
+                    continue
+                # No contar el tiempo que el consumidor tarda en procesar cada examen
+                pause_start = time.perf_counter()
+                yield item
+                waiting += time.perf_counter() - pause_start
+            timer.add('receive', time.perf_counter() - received_at - waiting - parsing)
+            timer.add('parse', parsing)
+    
+    def _submit_streaming(self, files_data, batch_name, exam_type, on_result=None, timer=NULL_TIMER):
+        """Consume la respuesta NDJSON notificando cada examen en cuanto llega"""
+        batch_processing = {}
+        results = []
+        
+        try:
+            for result_item in self.stream_results(files_data, batch_name, exam_type, summary=batch_processing, timer=timer):
+                results.append(result_item)
+                if on_result is not None:
+                    on_result(result_item)
+        except Exception as e:
+            error = str(e)
+            status_code = e.status_code if isinstance(e, WebhookError) else None
+            retryable = e.retryable if isinstance(e, WebhookError) else isinstance(e, requests.RequestException)
+            if not results:
+                result = {'success': False, 'error': error, 'status_code': status_code, 'retryable': retryable}
+                self._emit(on_result, files_data, result)
+                return result
+            
+            # La conexión se cortó a mitad de la respuesta: conservar lo recibido y reenviar el resto
+            received = {str(r.get('student_id')) for r in results}
+            missing = [f for f in files_data if str(f['student_id']) not in received]
+            for result_item in self._failed_results(missing, error, retryable=True):
+                results.append(result_item)
+                if on_result is not None:
+                    on_result(result_item)
+        
+        self._record_remote_time(timer, batch_processing)
+        return {
+            'success': True,
+            'data': {'batch_processing': batch_processing, 'results': results},
+            'batch_size': len(files_data)
+        }
+    
+    def _process_chunked(self, files_data, batch_name, exam_type, on_result=None, timer=NULL_TIMER):
+        """Divide el lote en bloques y los envía con concurrencia acotada"""
+        chunks = [files_data[i:i + self.chunk_size] for i in range(0, len(files_data), self.chunk_size)]
+        chunk_results = [None] * len(chunks)
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(chunks))) as executor:
+            futures = {
+                executor.submit(self._submit, chunk, batch_name, exam_type, on_result, timer): index
+                for index, chunk in enumerate(chunks)
+            }
+            for future in as_completed(futures):
+                chunk_results[futures[future]] = future.result()
+        
+        return self._merge_chunk_results(chunks, chunk_results, len(files_data))
+    
+    @staticmethod
+    def _failed_results(files_data, error, retryable=False):
+        """Resultados de error individuales para exámenes que no se pudieron enviar
+        
+        retryable marca los que _dispatch puede reenviar; la marca no sale del scanner.
+        """
+        results = [
+            {
+                'student_id': file_data['student_id'],
+                'filename': file_data['filename'],
+                'success': False,
+                'error': error
+            }
+            for file_data in files_data
+        ]
+        if retryable:
+            for result_item in results:
+                result_item['retryable'] = True
+        return results
+    
+    def _merge_chunk_results(self, chunks, chunk_results, total_exams):
+        """Une los resultados de cada bloque en la forma {'batch_processing', 'results'}"""
+        results = []
+        failed_chunks = []
+        
+        for index, (chunk, chunk_result) in enumerate(zip(chunks, chunk_results)):
+            if chunk_result['success']:
+                results.extend(chunk_result['data'].get('results', []))
+            else:
+                # Un bloque fallido no descarta los bloques exitosos
+                failed_chunks.append({'chunk': index, 'error': chunk_result['error']})
+                results.extend(self._failed_results(chunk, chunk_result['error'], chunk_result.get('retryable', False)))
+        
+        if len(failed_chunks) == len(chunks):
+            return {
+                'success': False,
+                'error': f"Fallaron todos los bloques: {failed_chunks[0]['error']}"
+            }
+        
+        successful = sum(1 for r in results if r.get('success'))
+        return {
+            'success': True,
+            'data': {
+                'batch_processing': {
+                    'total_exams': total_exams,
+                    'successful': successful,
+                    'failed': len(results) - successful,
+                    'chunks': len(chunks),
+                    'failed_chunks': failed_chunks
+                },
+                'results': results
+            },
+            'batch_size': total_exams
+        }
+
+class BackgroundBatchRunner:
+    """Ejecuta process_batch en un hilo propio, fuera del ciclo de reruns de Streamlit"""
+    
+    def __init__(self, scanner, files_data, batch_name, exam_type, on_result=None, on_finish=None,
+                 scheduler=None, flow=None):
+        self.scanner = scanner
+        self.files_data = files_data
+        self.batch_name = batch_name
+        self.exam_type = exam_type
+        self.total = len(files_data)
+        self.on_result = on_result
+        self.on_finish = on_finish
+        # Planificador compartido del proceso y clave de reparto (la sesión del usuario)
+        self.scheduler = scheduler
+        self.flow = flow
+        self.ticket = None
+        self.started_at = None
+        self.finished_at = None
+        self._results = []
+        self._result = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"eduscan-batch-{batch_name}", daemon=True)
+    
+    def start(self):
+        self.started_at = time.time()
+        self._thread.start()
+        return self
+    
+    def _collect(self, result_item):
+        with self._lock:
+            self._results.append(result_item)
+        if self.on_result is not None:
+            self.on_result(result_item)
+    
+    def _run(self):
+        try:
+            if self.scheduler is None:
+                result = self.scanner.process_batch(self.files_data, self.batch_name, self.exam_type,
+                                                    on_result=self._collect)
+            else:
+                with self.scheduler.job(self.total, flow=self.flow, name=self.batch_name) as ticket:
+                    self.ticket = ticket
+                    result = self.scanner.process_batch(self.files_data, self.batch_name, self.exam_type,
+                                                        on_result=self._collect, ticket=ticket)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        
+        if self.on_finish is not None:
+            # on_finish puede devolver el resultado a mostrar (p. ej. el del trabajo completo al reanudarlo)
+            result = self.on_finish(result) or result
+        with self._lock:
+            self._result = result
+            self.finished_at = time.time()
+            # Liberar las imágenes en cuanto termina el envío
+            self.files_data = None
+    
+    @property
+    def finished(self):
+        with self._lock:
+            return self._result is not None
+    
+    def snapshot(self):
+        """Copia consistente del progreso para que la UI la consulte"""
+        schedule = self.ticket.status() if self.ticket is not None else None
+        with self._lock:
+            return {
+                'schedule': schedule,
+                'results': list(self._results),
+                'completed': len(self._results),
+                'total': self.total,
+                'finished': self._result is not None,
+                'result': self._result,
+                'elapsed': (self.finished_at or time.time()) - self.started_at
+            }
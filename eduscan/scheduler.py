@@ -0,0 +1,205 @@
+"""Planificador compartido de requests al webhook entre todos los lotes del proceso
+
+Cada lote abre un JobTicket con FairScheduler.job() y cada intento de
+request al webhook espera un hueco del planificador, que sustituye al
+limitador propio del scanner: es el único control de concurrencia de los
+requests planificados y el hueco se devuelve durante las esperas entre
+reintentos. Hay como mucho max_concurrency requests en vuelo en todo el
+proceso y, cuando se libera un hueco, se concede:
+
+1. primero a los lotes pequeños (hasta small_batch exámenes) y a los
+   requests que llevan más de max_wait segundos esperando;
+2. dentro de cada grupo, al flujo (sesión o lote) que menos exámenes ha
+   enviado mientras está activo, así un lote de 500 no acapara el webhook;
+3. a igualdad, al request más antiguo.
+"""
+import contextlib
+import itertools
+import threading
+import time
+
+from .metrics import NULL_TIMER
+
+class JobTicket:
+    """Un lote registrado en el planificador"""
+    
+    def __init__(self, scheduler, job_id, flow, total, name=""):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        # Clave de reparto: los lotes de una misma sesión comparten su parte
+        self.flow = flow
+        self.total = total
+        self.name = name
+        self.remaining = total
+        self.in_flight = 0
+        self.started_at = None
+    
+    @property
+    def small(self):
+        return self.total <= self.scheduler.small_batch
+    
+    def slot(self, units=1, timer=NULL_TIMER):
+        return self.scheduler.slot(self, units, timer)
+    
+    def bind(self, client):
+        """El cliente del webhook con sus requests sujetos a este ticket"""
+        return ScheduledClient(client, self)
+    
+    def status(self):
+        return self.scheduler.status(self)
+
+class TicketLimiter:
+    """Hueco del planificador con la interfaz de AdaptiveLimiter, para un request de units exámenes"""
+    
+    def __init__(self, ticket, units, timer=NULL_TIMER):
+        self.ticket = ticket
+        self.units = units
+        self.timer = timer
+    
+    def acquire(self):
+        return self.ticket.scheduler.acquire(self.ticket, self.units, self.timer)
+    
+    def release(self, started, latency=None, congested=False):
+        # WebhookClient solo informa latency cuando el request terminó bien
+        self.ticket.scheduler.release(self.ticket, self.units, started, completed=latency is not None)
+
+class ScheduledClient:
+    """WebhookClient cuyos requests esperan turno en el planificador en vez de en su limitador"""
+    
+    def __init__(self, client, ticket):
+        self.client = client
+        self.ticket = ticket
+    
+    def request(self, make_kwargs, units=1, stream=False, timer=NULL_TIMER):
+        return self.client.request(make_kwargs, units, stream, timer,
+                                   limiter=TicketLimiter(self.ticket, units, timer))
+    
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+class FairScheduler:
+    """Límite global de requests simultáneos con reparto justo y prioridad para lotes pequeños"""
+    
+    def __init__(self, max_concurrency=8, small_batch=50, max_wait=60.0):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.small_batch = small_batch
+        # Un request que espera más que esto pasa al grupo prioritario aunque su lote sea grande
+        self.max_wait = max_wait
+        self.active = 0
+        # Segundos que un hueco tarda por examen (media móvil), para estimar esperas
+        self.seconds_per_exam = None
+        self._jobs = {}
+        self._served = {}
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+    
+    @contextlib.contextmanager
+    def job(self, total, flow=None, name=""):
+        """Registra un lote de total exámenes mientras dura el bloque with"""
+        with self._condition:
+            job_id = next(self._sequence)
+            ticket = JobTicket(self, job_id, job_id if flow is None else flow, total, name)
+            if ticket.flow not in self._served:
+                # Un flujo nuevo empieza al nivel de los activos: no acumula crédito mientras está inactivo
+                self._served[ticket.flow] = min(self._served.values(), default=0)
+            self._jobs[job_id] = ticket
+        try:
+            yield ticket
+        finally:
+            with self._condition:
+                del self._jobs[job_id]
+                if all(other.flow != ticket.flow for other in self._jobs.values()):
+                    del self._served[ticket.flow]
+                self._condition.notify_all()
+    
+    @contextlib.contextmanager
+    def slot(self, ticket, units=1, timer=NULL_TIMER):
+        """Mantiene ocupado un hueco mientras dura el bloque with"""
+        started = self.acquire(ticket, units, timer)
+        try:
+            yield
+        finally:
+            self.release(ticket, units, started)
+    
+    def acquire(self, ticket, units=1, timer=NULL_TIMER):
+        """Espera turno para un request de units exámenes; devuelve el instante de inicio para release()"""
+        waiter = {'ticket': ticket, 'units': units, 'sequence': next(self._sequence),
+                  'since': time.monotonic(), 'granted': False}
+        with timer.stage('queue'), self._condition:
+            self._waiters.append(waiter)
+            self._grant()
+            while not waiter['granted']:
+                self._condition.wait()
+        return time.monotonic()
+    
+    def release(self, ticket, units, started, completed=True):
+        """Libera el hueco; completed=False (intento fallido) no cuenta los exámenes como hechos"""
+        elapsed = time.monotonic() - started
+        with self._condition:
+            self.active -= 1
+            ticket.in_flight -= 1
+            if completed:
+                # Los reenvíos de exámenes fallidos pueden superar el total del lote
+                ticket.remaining = max(0, ticket.remaining - units)
+                sample = elapsed / max(1, units)
+                if self.seconds_per_exam is None:
+                    self.seconds_per_exam = sample
+                else:
+                    self.seconds_per_exam += (sample - self.seconds_per_exam) * 0.2
+            self._grant()
+    
+    def _priority(self, waiter, now):
+        ticket = waiter['ticket']
+        urgent = ticket.small or now - waiter['since'] > self.max_wait
+        return (not urgent, self._served[ticket.flow], waiter['sequence'])
+    
+    def _grant(self):
+        """Concede los huecos libres a los requests en espera, en orden de prioridad"""
+        now = time.monotonic()
+        granted = False
+        while self.active < self.max_concurrency and self._waiters:
+            waiter = min(self._waiters, key=lambda candidate: self._priority(candidate, now))
+            self._waiters.remove(waiter)
+            ticket = waiter['ticket']
+            ticket.in_flight += 1
+            if ticket.started_at is None:
+                ticket.started_at = time.time()
+            self._served[ticket.flow] += waiter['units']
+            self.active += 1
+            waiter['granted'] = granted = True
+        if granted:
+            self._condition.notify_all()
+    
+    def status(self, ticket):
+        """Posición en la cola y tiempo estimado (s) hasta que termine el lote; eta es None sin mediciones
+        
+        La estimación supone reparto equitativo: mientras el lote avanza,
+        cada lote activo recibe como mucho lo que a este le falta (a un lote
+        pequeño solo le quitan turnos los otros lotes pequeños).
+        """
+        with self._condition:
+            if ticket.job_id not in self._jobs:
+                return {'state': 'done', 'position': 0, 'ahead': 0, 'eta': 0.0,
+                        'active': self.active, 'jobs': len(self._jobs)}
+            key = (not ticket.small, self._served[ticket.flow], ticket.job_id)
+            ahead = [
+                other for other in self._jobs.values()
+                if other is not ticket and other.remaining
+                and (not other.small, self._served[other.flow], other.job_id) < key
+            ]
+            eta = None
+            if self.seconds_per_exam is not None:
+                work = ticket.remaining + sum(
+                    min(other.remaining, ticket.remaining) for other in self._jobs.values()
+                    if other is not ticket and (other.small or not ticket.small)
+                )
+                eta = work * self.seconds_per_exam / self.max_concurrency
+            return {
+                'state': 'running' if ticket.started_at is not None else 'queued',
+                'position': len(ahead) + 1,
+                'ahead': len(ahead),
+                'eta': eta,
+                'active': self.active,
+                'jobs': len(self._jobs)
+            }
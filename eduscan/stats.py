@@ -0,0 +1,74 @@
+"""Estadísticas vectorizadas del lote"""
+import numpy as np
+
+from .models import ResultSet
+
+class BatchStatistics:
+    """Estadísticas del lote calculadas de forma vectorizada sobre una tabla única"""
+    
+    # Rangos de notas como bordes de histograma: [0, 60), [60, 70), ..., [90, 100]
+    BIN_EDGES = np.array([0, 60, 70, 80, 90, 100], dtype=float)
+    RANGE_LABELS = [
+        "0-59% (Insuficiente)",
+        "60-69% (Suficiente)",
+        "70-79% (Bueno)",
+        "80-89% (Muy Bueno)",
+        "90-100% (Excelente)"
+    ]
+    PERCENTILES = (25, 50, 75, 90)
+    
+    def __init__(self, result_set):
+        records = result_set.records
+        scores = np.fromiter((record.score for record in records), dtype=float, count=len(records))
+        approved_mask = np.fromiter((record.approved for record in records), dtype=bool, count=len(records))
+        self._records = records
+        self._scores = scores
+        self._approved_mask = approved_mask
+        
+        self.count = len(scores)
+        self.approved = int(approved_mask.sum())
+        self.failed = self.count - self.approved
+        
+        if self.count:
+            self.mean = float(scores.mean())
+            self.max = float(scores.max())
+            self.min = float(scores.min())
+            self.std = float(scores.std())
+            self.percentiles = dict(zip(self.PERCENTILES, np.percentile(scores, self.PERCENTILES).tolist()))
+        else:
+            self.mean = self.max = self.min = self.std = 0.0
+            self.percentiles = {p: 0.0 for p in self.PERCENTILES}
+        
+        counts, _ = np.histogram(np.clip(scores, 0, 100), bins=self.BIN_EDGES)
+        percentages = counts / self.count * 100 if self.count else np.zeros(len(counts))
+        # De la nota más alta a la más baja, como se muestra en el reporte
+        self.distribution = [
+            {'label': label, 'count': int(count), 'percentage': float(percentage)}
+            for label, count, percentage in zip(self.RANGE_LABELS[::-1], counts[::-1], percentages[::-1])
+        ]
+        
+        order = np.argsort(-scores, kind='stable')
+        self.ranking = [records[i] for i in order]
+        self.top_students = [records[i].student_name for i in np.flatnonzero(scores == self.max)] if self.count else []
+        self.bottom_students = [records[i].student_name for i in np.flatnonzero(scores == self.min)] if self.count else []
+    
+    @property
+    def table(self):
+        """Tabla (student_id, name, score, approved); pandas se importa solo si se pide"""
+        import pandas as pd
+        return pd.DataFrame({
+            'student_id': [record.student_id for record in self._records],
+            'name': [record.student_name for record in self._records],
+            'score': self._scores,
+            'approved': self._approved_mask
+        })
+    
+    @classmethod
+    def from_results(cls, results):
+        """Calcula las estadísticas a partir de resultados crudos del webhook"""
+        return cls(ResultSet.from_results(results))
+    
+    @staticmethod
+    def format_score(score):
+        """Formatea una nota sin decimales innecesarios (85 -> '85', 89.5 -> '89.5')"""
+        return f"{float(score):g}"
@@ -0,0 +1,127 @@
+"""Cuerpos de request que se envían al webhook sin materializarlos en memoria"""
+import base64
+import io
+import json
+import uuid
+
+def buffer_size(buffer):
+    """Tamaño del buffer sin leerlo ni mover su posición"""
+    position = buffer.tell()
+    size = buffer.seek(0, io.SEEK_END)
+    buffer.seek(position)
+    return size
+
+class MultipartStreamEncoder:
+    """Genera un cuerpo multipart/form-data leyendo cada imagen por bloques"""
+    
+    def __init__(self, fields, files, block_size=64 * 1024):
+        # fields: [(nombre, bytes, content_type)]; files: [(nombre, filename, buffer, content_type)]
+        self.boundary = uuid.uuid4().hex
+        self.fields = fields
+        self.files = files
+        self.block_size = block_size
+    
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+    
+    def _part_header(self, name, content_type, filename=None):
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        return (
+            f"--{self.boundary}\r\n"
+            f"Content-Disposition: {disposition}\r\n"
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode('utf-8')
+    
+    def _closing(self):
+        return f"--{self.boundary}--\r\n".encode('utf-8')
+    
+    def __len__(self):
+        """Tamaño exacto del cuerpo, para enviar Content-Length sin materializarlo"""
+        total = len(self._closing())
+        for name, value, content_type in self.fields:
+            total += len(self._part_header(name, content_type)) + len(value) + 2
+        for name, filename, buffer, content_type in self.files:
+            total += len(self._part_header(name, content_type, filename)) + buffer_size(buffer) + 2
+        return total
+    
+    def __iter__(self):
+        for name, value, content_type in self.fields:
+            yield self._part_header(name, content_type)
+            yield value
+            yield b"\r\n"
+        
+        # Las imágenes se leen directamente del buffer subido, sin copias completas
+        for name, filename, buffer, content_type in self.files:
+            yield self._part_header(name, content_type, filename)
+            buffer.seek(0)
+            while True:
+                block = buffer.read(self.block_size)
+                if not block:
+                    break
+                yield block
+            yield b"\r\n"
+        
+        yield self._closing()
+
+class JSONStreamEncoder:
+    """Genera el JSON del lote codificando cada imagen en base64 por bloques
+    
+    Produce los mismos bytes que json.dumps del payload completo, pero cada
+    imagen se lee de su buffer y se codifica justo antes de enviarla.
+    """
+    
+    EXAM_TAIL = b'"}'
+    CLOSING = b']}'
+    
+    def __init__(self, fields, exams, block_size=48 * 1024):
+        # fields: {campo: valor} del encabezado; exams: [(student_id, filename, buffer, content_type)]
+        self.fields = fields
+        self.exams = exams
+        # Bloques múltiplos de 3 para que el base64 de cada bloque se pueda concatenar
+        self.block_size = max(3, block_size - block_size % 3)
+    
+    @property
+    def content_type(self):
+        return "application/json"
+    
+    def _head(self):
+        head = json.dumps(self.fields)[:-1]
+        return f"{head}{', ' if self.fields else ''}\"exams\": [".encode('ascii')
+    
+    @staticmethod
+    def _exam_head(index, student_id, filename, content_type):
+        exam = json.dumps({"student_id": student_id, "filename": filename})[:-1]
+        image_prefix = json.dumps(f"data:{content_type};base64,")[:-1]
+        return f"{', ' if index else ''}{exam}, \"image_data\": {image_prefix}".encode('ascii')
+    
+    def __len__(self):
+        """Tamaño exacto del cuerpo (el base64 ocupa 4 bytes por cada 3 de imagen)"""
+        total = len(self._head()) + len(self.CLOSING)
+        for index, (student_id, filename, buffer, content_type) in enumerate(self.exams):
+            total += len(self._exam_head(index, student_id, filename, content_type))
+            total += 4 * ((buffer_size(buffer) + 2) // 3) + len(self.EXAM_TAIL)
+        return total
+    
+    def __iter__(self):
+        yield self._head()
+        for index, (student_id, filename, buffer, content_type) in enumerate(self.exams):
+            yield self._exam_head(index, student_id, filename, content_type)
+            buffer.seek(0)
+            pending = b""
+            while True:
+                block = buffer.read(self.block_size)
+                if not block:
+                    break
+                # Codificar solo múltiplos de 3 bytes; el resto pasa al siguiente bloque
+                block = pending + block
+                cut = len(block) - len(block) % 3
+                pending = block[cut:]
+                if cut:
+                    yield base64.b64encode(block[:cut])
+            if pending:
+                yield base64.b64encode(pending)
+            yield self.EXAM_TAIL
+        yield self.CLOSING
@@ -0,0 +1,162 @@
+"""Validación previa al envío: archivos ilegibles, páginas en blanco, duplicados y student_id repetidos
+
+Cada imagen se inspecciona en un proceso del pool decodificándola a una
+muestra pequeña en escala de grises (los JPEG se decodifican ya reducidos
+con draft), así que el coste es una fracción del de normalizarla.
+
+Los casi duplicados se buscan con un mapa binario de tinta y no con un
+dHash: todas las hojas comparten la plantilla de burbujas y el dHash de
+dos escaneos de la misma hoja difiere tanto como el de dos alumnos
+distintos. El mapa, comparado con tolerancia de una celda, solo difiere
+donde cambian las respuestas marcadas.
+"""
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+from .preprocess import bounded_submit
+
+# Pillow identifica como MPO los JPEG de muchos móviles (llevan una vista previa adicional)
+ACCEPTED_FORMATS = ('JPEG', 'MPO', 'PNG', 'WEBP')
+
+# Los errores excluyen el archivo por defecto; las advertencias solo se informan
+ERROR = 'error'
+WARNING = 'warning'
+
+def ink_hash(gray, hash_size, contrast):
+    """Mapa de tinta de hash_size x hash_size celdas y el mismo mapa dilatado una celda (bits empaquetados)"""
+    small = np.asarray(gray.resize((hash_size, hash_size), Image.BOX), dtype=np.int16)
+    ink = small < np.median(small) - contrast
+    padded = np.pad(ink, 1)
+    halo = np.zeros_like(ink)
+    for dy in range(3):
+        for dx in range(3):
+            halo |= padded[dy:dy + hash_size, dx:dx + hash_size]
+    return np.packbits(ink).tobytes(), np.packbits(halo).tobytes()
+
+def inspect_exam_image(image_bytes, options):
+    """Cabecera, tamaño, proporción de tinta y hashes de una imagen; se ejecuta en un proceso del pool"""
+    info = {'sha256': hashlib.sha256(image_bytes).hexdigest(), 'bytes': len(image_bytes)}
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        info.update(format=image.format, width=image.width, height=image.height)
+        if image.format not in ACCEPTED_FORMATS:
+            return info
+        sample_size = options['sample_size']
+        image.draft('L', (sample_size, sample_size))
+        # convert() decodifica el archivo entero: detecta también imágenes truncadas
+        gray = image.convert('L')
+        gray.thumbnail((sample_size, sample_size))
+    except UnidentifiedImageError:
+        info['error'] = "formato de imagen no reconocido"
+        return info
+    except Exception as e:
+        info['error'] = str(e)
+        return info
+    
+    pixels = np.asarray(gray, dtype=np.int16)
+    # Tinta: píxeles claramente más oscuros que el fondo (la mediana), sea cual sea el tono del papel
+    info['ink_ratio'] = float(np.mean(pixels < np.median(pixels) - options['ink_contrast']))
+    info['ink_hash'], info['ink_halo'] = ink_hash(gray, options['hash_size'], options['hash_contrast'])
+    return info
+
+class PreflightValidator:
+    """Revisa un lote antes de subirlo y marca los archivos que conviene no enviar"""
+    
+    def __init__(self, min_dimension=400, max_bytes=25 * 1024 * 1024, blank_ink_ratio=0.003,
+                 hash_size=64, near_duplicate_distance=8, max_workers=None):
+        self.min_dimension = int(min_dimension)
+        self.max_bytes = int(max_bytes)
+        self.blank_ink_ratio = blank_ink_ratio
+        self.near_duplicate_distance = near_duplicate_distance
+        self.options = {'sample_size': 256, 'ink_contrast': 60, 'hash_size': int(hash_size), 'hash_contrast': 40}
+        self.max_workers = max_workers
+    
+    def validate(self, files_data):
+        """Inspecciona todas las imágenes en paralelo y devuelve el reporte
+        
+        {'files': [info por archivo], 'issues': [{'index', 'filename', 'code',
+        'severity', 'message'}], 'rejected': [índices con algún error]}
+        """
+        # Las imágenes se leen a medida que el pool las pide: un lote en disco no se carga entero
+        images = ((file_data['file'].getvalue(), self.options) for file_data in files_data)
+        if len(files_data) > 1:
+            workers = self.max_workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                files = [future.result() for future in bounded_submit(executor, inspect_exam_image, images, 2 * workers)]
+        else:
+            files = [inspect_exam_image(*args) for args in images]
+        
+        for index, (file_data, info) in enumerate(zip(files_data, files)):
+            info.update(index=index, filename=file_data['filename'], student_id=str(file_data['student_id']))
+        
+        issues = []
+        def flag(info, code, severity, message):
+            issues.append({'index': info['index'], 'filename': info['filename'], 'code': code,
+                           'severity': severity, 'message': message})
+            if severity == ERROR:
+                info['rejected'] = True
+        
+        for info in files:
+            self._check_file(info, flag)
+        self._check_duplicates(files, flag)
+        self._check_student_ids(files, flag)
+        
+        issues.sort(key=lambda issue: issue['index'])
+        rejected = sorted({issue['index'] for issue in issues if issue['severity'] == ERROR})
+        return {'files': files, 'issues': issues, 'rejected': rejected}
+    
+    def _check_file(self, info, flag):
+        if 'error' in info:
+            flag(info, 'unreadable', ERROR, f"No es una imagen válida: {info['error']}")
+        elif info.get('format') not in ACCEPTED_FORMATS:
+            flag(info, 'unsupported_format', ERROR, f"Formato no admitido: {info.get('format') or 'desconocido'}")
+        elif min(info['width'], info['height']) < self.min_dimension:
+            flag(info, 'too_small', ERROR,
+                 f"Resolución insuficiente ({info['width']}×{info['height']} px, mínimo {self.min_dimension})")
+        elif info['ink_ratio'] < self.blank_ink_ratio:
+            flag(info, 'blank', ERROR, f"Página en blanco ({info['ink_ratio']:.2%} de tinta)")
+        if info['bytes'] > self.max_bytes:
+            flag(info, 'too_large', ERROR, f"Archivo demasiado grande ({info['bytes'] / 1024 / 1024:.1f} MB)")
+    
+    def _check_duplicates(self, files, flag):
+        """Copias exactas (sha256) y casi idénticas (celdas con tinta en una hoja y no cerca de ella en la otra)"""
+        first_by_hash = {}
+        candidates = []
+        for info in files:
+            original = first_by_hash.setdefault(info['sha256'], info)
+            if original is not info:
+                flag(info, 'duplicate', ERROR, f"Idéntico a {original['filename']}")
+            elif not info.get('rejected'):
+                candidates.append(info)
+        
+        if len(candidates) < 2:
+            return
+        def stack(key):
+            return np.frombuffer(b"".join(info[key] for info in candidates), dtype=np.uint8).reshape(len(candidates), -1)
+        ink, halo = stack('ink_hash'), stack('ink_halo')
+        for i, info in enumerate(candidates[:-1]):
+            distances = (np.unpackbits(ink[i + 1:] & ~halo[i], axis=1).sum(axis=1)
+                         + np.unpackbits(ink[i] & ~halo[i + 1:], axis=1).sum(axis=1))
+            for j in np.flatnonzero(distances <= self.near_duplicate_distance):
+                other = candidates[i + 1 + j]
+                flag(other, 'near_duplicate', WARNING,
+                     f"Casi idéntico a {info['filename']} (distancia {int(distances[j])})")
+    
+    @staticmethod
+    def _check_student_ids(files, flag):
+        """Dos archivos distintos que se enviarían con el mismo student_id"""
+        by_student = {}
+        for info in files:
+            if not info.get('rejected'):
+                by_student.setdefault(info['student_id'], []).append(info)
+        for student_id, group in by_student.items():
+            if len(group) < 2:
+                continue
+            for info in group:
+                others = ", ".join(other['filename'] for other in group if other is not info)
+                flag(info, 'student_id_collision', WARNING, f"student_id '{student_id}' repetido en {others}")
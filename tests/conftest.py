@@ -0,0 +1,31 @@
+"""Fixtures comunes: webhook simulado en un puerto libre y exámenes de prueba"""
+import io
+
+import pytest
+
+from benchmarks.mock_webhook import start_server
+
+@pytest.fixture
+def webhook():
+    """Arranca servidores simulados con las opciones indicadas y los detiene al terminar la prueba"""
+    servers = []
+    def start(**options):
+        server = start_server(**options)
+        servers.append(server)
+        return server
+    
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def exams():
+    """files_data de n exámenes con una imagen mínima cada uno"""
+    def make(n):
+        return [
+            {'file': io.BytesIO(b"\xff\xd8\xff" + bytes([i % 256]) * 64), 'student_id': f"alumno_{i:03d}",
+             'filename': f"alumno_{i:03d}.jpg", 'mime_type': 'image/jpeg'}
+            for i in range(n)
+        ]
+    return make
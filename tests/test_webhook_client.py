@@ -0,0 +1,110 @@
+"""Failover, reintentos y concurrencia adaptativa del envío contra benchmarks/mock_webhook.py"""
+import threading
+import time
+
+from eduscan.client import RetryPolicy
+from eduscan.scanner import BatchExamScanner
+from eduscan.scheduler import FairScheduler
+
+def make_scanner(server, **options):
+    options.setdefault('retry', RetryPolicy(max_attempts=1))
+    return BatchExamScanner(webhook_url=server.url, **options)
+
+def test_failover_leaves_failed_chunks_empty(webhook, exams):
+    server = webhook(fail_requests=1)
+    scanner = make_scanner(server, chunk_size=5, max_concurrency=1)
+    
+    result = scanner.process_batch(exams(20), "Lote", "Matemáticas")
+    
+    assert result['success']
+    batch_processing = result['data']['batch_processing']
+    assert batch_processing['failed_chunks'] == []
+    assert batch_processing['resubmitted'] == 5
+    assert batch_processing['successful'] == 20
+    assert all(r['success'] and 'retryable' not in r for r in result['data']['results'])
+    assert server.exams == 20
+
+def test_failed_chunk_is_kept_without_failover(webhook, exams):
+    server = webhook(fail_requests=1)
+    scanner = make_scanner(server, chunk_size=5, max_concurrency=1, failover_rounds=0)
+    
+    result = scanner.process_batch(exams(20), "Lote", "Matemáticas")
+    
+    assert [c['chunk'] for c in result['data']['batch_processing']['failed_chunks']] == [0]
+    assert sum(r['success'] for r in result['data']['results']) == 15
+
+def test_cut_stream_marks_only_missing_exams_retryable(webhook, exams):
+    server = webhook(cut_stream=3)
+    scanner = make_scanner(server, response_mode='ndjson')
+    files_data = exams(5)
+    received = []
+    
+    result = scanner._submit_streaming(files_data, "Lote", "Matemáticas", on_result=received.append)
+    
+    assert result['success']
+    results = result['data']['results']
+    assert [r['student_id'] for r in results] == [f['student_id'] for f in files_data]
+    assert all(r['success'] and 'retryable' not in r for r in results[:3])
+    assert all(not r['success'] and r['retryable'] for r in results[3:])
+    assert received == results
+
+def test_cut_stream_resends_missing_exams(webhook, exams):
+    server = webhook(cut_stream=3)
+    scanner = make_scanner(server, response_mode='ndjson')
+    
+    result = scanner.process_batch(exams(5), "Lote", "Matemáticas")
+    
+    assert result['success']
+    assert result['data']['batch_processing']['resubmitted'] == 2
+    assert all(r['success'] and 'retryable' not in r for r in result['data']['results'])
+    assert server.exams == 5 + 2
+
+def test_limiter_shrinks_on_throttle_and_grows_back(webhook, exams):
+    server = webhook(latency=0.02, max_in_flight=0, retry_after=0)
+    scanner = make_scanner(server, max_concurrency=4, failover_rounds=0)
+    limiter = scanner.client.limiter
+    
+    throttled = scanner.process_batch(exams(1), "Lote", "Matemáticas")
+    assert not throttled['success'] and throttled['status_code'] == 429
+    assert limiter.snapshot()['limit'] == 2
+    
+    server.max_in_flight = None
+    for _ in range(6):
+        assert scanner.process_batch(exams(1), "Lote", "Matemáticas")['success']
+    assert limiter.snapshot()['limit'] > 2
+
+def test_retry_after_is_honoured(webhook, exams):
+    server = webhook(max_in_flight=0, retry_after=1)
+    # Sin Retry-After el reintento sería inmediato (backoff 0)
+    scanner = make_scanner(server, retry=RetryPolicy(max_attempts=2, backoff=0))
+    threading.Timer(0.3, setattr, (server, 'max_in_flight', None)).start()
+    
+    start = time.perf_counter()
+    result = scanner.process_batch(exams(2), "Lote", "Matemáticas")
+    
+    assert result['success']
+    assert time.perf_counter() - start >= 1
+    assert server.throttled == 1
+
+def test_retry_after_beyond_max_wait_is_not_retried(webhook, exams):
+    server = webhook(max_in_flight=0, retry_after=30)
+    scanner = make_scanner(server, retry=RetryPolicy(max_attempts=4, max_wait=5), failover_rounds=0)
+    
+    start = time.perf_counter()
+    result = scanner.process_batch(exams(2), "Lote", "Matemáticas")
+    
+    assert not result['success'] and result['status_code'] == 429
+    assert time.perf_counter() - start < 5
+    assert server.throttled == 1
+
+def test_scheduled_batch_respects_global_limit(webhook, exams):
+    server = webhook(latency=0.01)
+    scanner = make_scanner(server, chunk_size=2, max_concurrency=4)
+    scheduler = FairScheduler(max_concurrency=1)
+    
+    with scheduler.job(8) as ticket:
+        result = scanner.process_batch(exams(8), "Lote", "Matemáticas", ticket=ticket)
+        assert ticket.remaining == 0
+    
+    assert result['data']['batch_processing']['successful'] == 8
+    assert server.peak_in_flight == 1